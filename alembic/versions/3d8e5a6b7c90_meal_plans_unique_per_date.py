@@ -0,0 +1,80 @@
+"""meal_plans one plan per user and date
+
+Revision ID: 3d8e5a6b7c90
+Revises: 9f2b7c1d4e3a
+Create Date: 2026-10-18 12:40:27.905113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d8e5a6b7c90'
+down_revision: Union[str, Sequence[str], None] = '9f2b7c1d4e3a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+# same query as app/planning/compact.py; kept inline so the migration does
+# not depend on application code
+DUPLICATE_IDS = sa.text("""
+    SELECT id FROM (
+        SELECT id,
+               row_number() OVER (
+                   PARTITION BY user_id, plan_date
+                   ORDER BY created_at DESC, id DESC
+               ) AS rn
+        FROM meal_plans
+    ) ranked
+    WHERE rn > 1
+    LIMIT :batch_size
+""")
+
+# a failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which
+# IF NOT EXISTS would then keep; such leftovers are dropped before a rerun
+INVALID_INDEX = sa.text("""
+    SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(CAST(:name AS text))
+""")
+
+
+def _drop_invalid_index(bind, name: str) -> None:
+    if bind.execute(INVALID_INDEX, {"name": name}).scalar():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        while True:
+            ids = bind.execute(DUPLICATE_IDS, {"batch_size": BATCH_SIZE}).scalars().all()
+            if not ids:
+                break
+            bind.execute(sa.text("DELETE FROM meal_plan_items WHERE meal_plan_id = ANY(:ids)"), {"ids": ids})
+            bind.execute(sa.text("DELETE FROM meal_plans WHERE id = ANY(:ids)"), {"ids": ids})
+
+        _drop_invalid_index(bind, "uq_meal_plans_user_id_plan_date")
+        _drop_invalid_index(bind, "ix_meal_plans_user_id_created_at")
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_meal_plans_user_id_plan_date "
+            "ON meal_plans (user_id, plan_date)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_meal_plans_user_id_created_at "
+            "ON meal_plans (user_id, created_at)"
+        )
+
+    op.execute(
+        "ALTER TABLE meal_plans ADD CONSTRAINT uq_meal_plans_user_id_plan_date "
+        "UNIQUE USING INDEX uq_meal_plans_user_id_plan_date"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_meal_plans_user_id_created_at", table_name="meal_plans")
+    op.drop_constraint("uq_meal_plans_user_id_plan_date", "meal_plans", type_="unique")
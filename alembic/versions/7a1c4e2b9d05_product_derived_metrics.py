@@ -0,0 +1,49 @@
+"""products derived metrics: cost_per_kcal, kcal_per_g, protein_per_kzt
+
+Revision ID: 7a1c4e2b9d05
+Revises: 3d8e5a6b7c90
+Create Date: 2026-10-18 14:05:12.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a1c4e2b9d05'
+down_revision: Union[str, Sequence[str], None] = '3d8e5a6b7c90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# keep in sync with Product in app/infrastructure/models.py
+COLUMNS = {
+    "cost_per_kcal": (
+        "CASE WHEN kcal_per_100g > 0"
+        " THEN price_kzt_per_100g::double precision / kcal_per_100g END"
+    ),
+    "kcal_per_g": "kcal_per_100g::double precision / 100",
+    "protein_per_kzt": (
+        "CASE WHEN price_kzt_per_100g > 0"
+        " THEN protein_per_100g::double precision / price_kzt_per_100g::double precision END"
+    ),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # stored generated columns rewrite products once; the table is small
+    for name, expr in COLUMNS.items():
+        op.add_column("products", sa.Column(name, sa.Float(), sa.Computed(expr, persisted=True)))
+
+    with op.get_context().autocommit_block():
+        for name in COLUMNS:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_{name} ON products ({name})")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in COLUMNS:
+        op.drop_index(f"ix_products_{name}", table_name="products")
+        op.drop_column("products", name)
@@ -0,0 +1,73 @@
+"""meal_plans denormalized totals
+
+Revision ID: 9f2b7c1d4e3a
+Revises: 5c7720c3e61f
+Create Date: 2026-10-18 10:12:03.418220
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9f2b7c1d4e3a'
+down_revision: Union[str, Sequence[str], None] = '5c7720c3e61f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+BACKFILL_BATCH = sa.text("""
+    WITH batch AS (
+        SELECT id FROM meal_plans
+        WHERE total_kcal IS NULL
+        LIMIT :batch_size
+    ),
+    sums AS (
+        SELECT
+            b.id AS meal_plan_id,
+            COALESCE(SUM(i.kcal), 0) AS kcal,
+            COALESCE(SUM(i.grams * p.protein_per_100g / 100), 0) AS protein,
+            COALESCE(SUM(i.grams * p.fat_per_100g / 100), 0) AS fat,
+            COALESCE(SUM(i.grams * p.carbs_per_100g / 100), 0) AS carbs
+        FROM batch b
+        LEFT JOIN meal_plan_items i ON i.meal_plan_id = b.id
+        LEFT JOIN products p ON p.id = i.product_id
+        GROUP BY b.id
+    )
+    UPDATE meal_plans mp
+    SET total_kcal = s.kcal,
+        total_protein_g = ROUND(s.protein, 2),
+        total_fat_g = ROUND(s.fat, 2),
+        total_carbs_g = ROUND(s.carbs, 2)
+    FROM sums s
+    WHERE mp.id = s.meal_plan_id
+""")
+
+COLUMNS = ("total_kcal", "total_protein_g", "total_fat_g", "total_carbs_g")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("meal_plans", sa.Column("total_kcal", sa.Integer(), nullable=True))
+    op.add_column("meal_plans", sa.Column("total_protein_g", sa.Numeric(10, 2), nullable=True))
+    op.add_column("meal_plans", sa.Column("total_fat_g", sa.Numeric(10, 2), nullable=True))
+    op.add_column("meal_plans", sa.Column("total_carbs_g", sa.Numeric(10, 2), nullable=True))
+
+    # backfill outside the migration transaction, one commit per batch,
+    # so a large table is never locked as a whole
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        while bind.execute(BACKFILL_BATCH, {"batch_size": BATCH_SIZE}).rowcount:
+            pass
+
+    for col in COLUMNS:
+        op.alter_column("meal_plans", col, server_default="0", nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for col in reversed(COLUMNS):
+        op.drop_column("meal_plans", col)
@@ -0,0 +1,42 @@
+"""products protein_per_kzt keyset index ascending, like the others
+
+Revision ID: b8d4f2a6c1e3
+Revises: f3a9c2d7e4b1
+Create Date: 2026-10-18 23:05:12.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d4f2a6c1e3'
+down_revision: Union[str, Sequence[str], None] = 'f3a9c2d7e4b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# GET /products now sorts name and id in the same direction as the value,
+# so an ascending (value, name, id) index serves both orders; the
+# descending one from c4e9a7f1b2d6 matched neither. Built under a temporary
+# name so the old index keeps serving until the new one is ready.
+NEW = "ix_products_protein_per_kzt_name_id_new"
+NAME = "ix_products_protein_per_kzt_name_id"
+
+
+def _swap(columns: str) -> None:
+    with op.get_context().autocommit_block():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {NEW}")
+        op.execute(f"CREATE INDEX CONCURRENTLY {NEW} ON products ({columns})")
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {NAME}")
+        op.execute(f"ALTER INDEX {NEW} RENAME TO {NAME}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _swap("protein_per_kzt, name, id")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _swap("protein_per_kzt DESC NULLS LAST, name, id")
@@ -0,0 +1,46 @@
+"""products keyset pagination and range filter indexes
+
+Revision ID: c4e9a7f1b2d6
+Revises: 7a1c4e2b9d05
+Create Date: 2026-10-18 16:20:41.733905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e9a7f1b2d6'
+down_revision: Union[str, Sequence[str], None] = '7a1c4e2b9d05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# keep in sync with Product in app/infrastructure/models.py
+INDEXES = {
+    "ix_products_name_id": "name, id",
+    "ix_products_cost_per_kcal_name_id": "cost_per_kcal, name, id",
+    "ix_products_kcal_per_g_name_id": "kcal_per_g, name, id",
+    "ix_products_protein_per_kzt_name_id": "protein_per_kzt DESC NULLS LAST, name, id",
+    "ix_products_kcal_per_100g": "kcal_per_100g",
+    "ix_products_price_kzt_per_100g": "price_kzt_per_100g",
+}
+# single column indexes from 7a1c4e2b9d05, covered by the composite ones
+REPLACED = ("cost_per_kcal", "kcal_per_g", "protein_per_kzt")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON products ({columns})")
+        for column in REPLACED:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_products_{column}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in REPLACED:
+        op.create_index(f"ix_products_{column}", "products", [column])
+    for name in INDEXES:
+        op.drop_index(name, table_name="products")
@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from app.infrastructure.async_session import get_async_db
+from app.infrastructure.models import User
+from app.schemas.auth import RegisterIn, LoginIn, TokenOut, MeOut, RefreshIn, LogoutIn
+
+from app.auth.security import get_password_hash, verify_password, create_access_token
+from app.auth.deps import get_current_user_async
+
+from app.auth.refresh_store import (
+    issue_refresh_token,
+    rotate_refresh_token,
+    revoke_refresh_token,
+)
+
+router = APIRouter(prefix="/auth", tags=["auth"])
+
+
+@router.post("/register", response_model=TokenOut, status_code=201)
+async def register(payload: RegisterIn, db: AsyncSession = Depends(get_async_db)):
+    email = payload.email.lower().strip()
+
+    exists = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
+    if exists:
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    # password hashing is CPU-bound, keep it off the event loop
+    password_hash = await run_in_threadpool(get_password_hash, payload.password)
+    user = User(email=email, password_hash=password_hash)
+    db.add(user)
+    await db.commit()
+
+    access = create_access_token(str(user.id))
+    refresh = await db.run_sync(issue_refresh_token, user.id)
+
+    return TokenOut(access_token=access, refresh_token=refresh, user_id=str(user.id))
+
+
+@router.post("/login", response_model=TokenOut)
+async def login(payload: LoginIn, db: AsyncSession = Depends(get_async_db)):
+    email = payload.email.lower().strip()
+
+    user = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
+    if not user or not user.password_hash:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+
+    if not await run_in_threadpool(verify_password, payload.password, user.password_hash):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+
+    access = create_access_token(str(user.id))
+    refresh = await db.run_sync(issue_refresh_token, user.id)
+
+    return TokenOut(access_token=access, refresh_token=refresh, user_id=str(user.id))
+
+
+@router.post("/refresh", response_model=TokenOut)
+async def refresh(payload: RefreshIn, db: AsyncSession = Depends(get_async_db)):
+    try:
+        user_id, new_refresh = await db.run_sync(rotate_refresh_token, payload.refresh_token)
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+    access = create_access_token(str(user_id))
+    return TokenOut(access_token=access, refresh_token=new_refresh, user_id=str(user_id))
+
+
+@router.post("/logout")
+async def logout(payload: LogoutIn, db: AsyncSession = Depends(get_async_db)):
+    await db.run_sync(revoke_refresh_token, payload.refresh_token)
+    return {"detail": "ok"}
+
+
+@router.get("/me", response_model=MeOut)
+async def me(current_user: User = Depends(get_current_user_async)):
+    return MeOut(user_id=str(current_user.id), email=current_user.email)
@@ -1,174 +1,100 @@
 import datetime as dt
+import itertools
+import logging
+import subprocess
+import threading
+from typing import Iterator
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import select, desc
+from sqlalchemy import select, desc, func
 
+from app.infrastructure.db import SessionLocal
+from app.infrastructure.offload import run_cpu_bound
 from app.infrastructure.session import get_db
 from app.infrastructure.models import User, Profile, Product, MealPlan, MealPlanItem
-from app.auth.deps import get_current_user
+from app.auth.deps import get_current_user, require_admin
+from app.catalog.neighbors import K_MAX, get_neighbors
+from app.catalog.snapshot import get_catalog
+from app.planning import batch
+from app.planning.builder import PlanBuildError, build_items, calc_target_kcal, cost_for, kcal_for, plan_from_items
+from app.planning.cache import plan_cache
+from app.planning.compact import compact_duplicate_plans
+from app.planning.jobs import Job, JobRejected, plan_jobs
+from app.planning.singleflight import SingleFlight
+from app.planning.store import lock_plan_date, upsert_plans
 from app.schemas.meal_plans import (
     MealPlanGenerateIn,
     MealPlanOut,
     MealPlanItemOut,
     MealPlanWeekGenerateIn,
     MealPlanWeekOut,
+    MealPlanStreamSummaryOut,
+    MealPlanSummaryOut,
     ShoppingItemOut,
+    ShoppingListOut,
+    SubstituteOut,
+    ItemSubstitutesOut,
+    PregenerateIn,
+    PregenerateOut,
+    PlanJobOut,
 )
 
 router = APIRouter(prefix="/meal-plans", tags=["meal-plans"])
+logger = logging.getLogger(__name__)
+
+MAX_RANGE_DAYS = 366
+MAX_STREAM_DAYS = 90
+STREAM_CHUNK_DAYS = 7
+
+generation_flight = SingleFlight()
 
 # -------------------------
 # helpers
 # -------------------------
-def kcal_for(product: Product, grams: int) -> int:
-    return int(round((grams / 100.0) * float(product.kcal_per_100g)))
-
-def cost_for(product: Product, grams: int) -> float:
-    return round((grams / 100.0) * float(product.price_kzt_per_100g), 2)
-
-def totals(items: list[dict]) -> tuple[int, float]:
-    kcal = sum(kcal_for(x["product"], x["grams"]) for x in items)
-    cost = round(sum(cost_for(x["product"], x["grams"]) for x in items), 2)
-    return kcal, cost
-
-def cost_per_kcal(prod: Product) -> float:
-    kcal100 = float(prod.kcal_per_100g)
-    if kcal100 <= 0:
-        return 10**9
-    return float(prod.price_kzt_per_100g) / kcal100
-
-def scale_to_target(items: list[dict], target_kcal: int) -> None:
-    total_kcal, _ = totals(items)
-    if total_kcal <= 0:
-        return
-    scale = target_kcal / total_kcal
-    scale = max(0.6, min(1.8, scale))
-    for x in items:
-        x["grams"] = max(20, int(round(x["grams"] * scale / 10)) * 10)
-
-def reduce_cost(items: list[dict], budget_kzt: int) -> None:
-    cheapest = min((x["product"] for x in items), key=cost_per_kcal)
-
-    for _ in range(50):
-        _, total_cost = totals(items)
-        if total_cost <= budget_kzt:
-            break
-
-        most_exp = max((x["product"] for x in items), key=cost_per_kcal)
-        exp_item = next((x for x in items if x["product"].id == most_exp.id), None)
-        cheap_item = next((x for x in items if x["product"].id == cheapest.id), None)
-
-        if not exp_item:
-            break
-
-        if not cheap_item:
-            cheap_item = {"meal_type": "dinner", "product": cheapest, "grams": 0}
-            items.append(cheap_item)
-
-        if exp_item["grams"] <= 50:
-            break
-
-        old_kcal = kcal_for(exp_item["product"], exp_item["grams"])
-        exp_item["grams"] = max(50, exp_item["grams"] - 20)
-        new_kcal = kcal_for(exp_item["product"], exp_item["grams"])
-        removed_kcal = max(0, old_kcal - new_kcal)
-
-        kcal_per_g = float(cheapest.kcal_per_100g) / 100.0
-        if kcal_per_g > 0 and removed_kcal > 0:
-            add_g = int(round((removed_kcal / kcal_per_g) / 10)) * 10
-            cheap_item["grams"] += max(10, add_g)
-
-def top_up_to_target(items: list[dict], target_kcal: int, budget_kzt: int) -> None:
-    cheapest = min((x["product"] for x in items), key=cost_per_kcal)
-
-    for _ in range(20):
-        total_kcal, total_cost = totals(items)
-        if total_kcal >= int(target_kcal * 0.95):
-            break
-        if total_cost >= budget_kzt:
-            break
-
-        cheap_item = next((x for x in items if x["product"].id == cheapest.id), None)
-        if not cheap_item:
-            cheap_item = {"meal_type": "dinner", "product": cheapest, "grams": 0}
-            items.append(cheap_item)
-        cheap_item["grams"] += 10
-
-def fit_plan(items: list[dict], target_kcal: int, budget_kzt: int) -> list[dict]:
-    if not items:
-        return items
-
-    scale_to_target(items, target_kcal)
-    reduce_cost(items, budget_kzt)
-    top_up_to_target(items, target_kcal, budget_kzt)
-    return items
-
-def calc_target_kcal(profile: Profile) -> int:
-    w = float(profile.weight_kg)
-    h = float(profile.height_cm)
-    a = int(profile.age)
-
-    sex = (profile.sex or "").lower()
-    if sex == "male":
-        bmr = 10 * w + 6.25 * h - 5 * a + 5
-    else:
-        bmr = 10 * w + 6.25 * h - 5 * a - 161
-
-    activity = (profile.activity_level or "medium").lower()
-    mult = {"low": 1.2, "medium": 1.55, "high": 1.725}.get(activity, 1.55)
-
-    tdee = bmr * mult
-
-    goal = (profile.goal or "maintain").lower()
-    if goal == "lose_fat":
-        target = tdee - 400
-    elif goal == "gain":
-        target = tdee + 250
-    else:
-        target = tdee
-
-    target = max(1400, min(3200, target))
-    return int(round(target))
-
 def get_product_by_name(db: Session, name: str) -> Product | None:
     return db.execute(select(Product).where(Product.name == name)).scalar_one_or_none()
 
 
+def _plan_totals(mp: MealPlan) -> dict:
+    return {
+        "total_kcal": int(mp.total_kcal or 0),
+        "total_cost_kzt": float(mp.total_cost_kzt),
+        "total_protein_g": float(mp.total_protein_g or 0),
+        "total_fat_g": float(mp.total_fat_g or 0),
+        "total_carbs_g": float(mp.total_carbs_g or 0),
+    }
+
+
 def _plan_out_from_meal_plan(db: Session, mp: MealPlan) -> MealPlanOut:
     rows = db.execute(
-        select(MealPlanItem, Product)
+        select(MealPlanItem, Product.name)
         .join(Product, MealPlanItem.product_id == Product.id)
         .where(MealPlanItem.meal_plan_id == mp.id)
     ).all()
 
-    items_out: list[MealPlanItemOut] = []
-    total_kcal = 0
-    total_cost = 0.0
-
-    for it, prod in rows:
-        items_out.append(
-            MealPlanItemOut(
-                meal_type=it.meal_type,
-                product_id=it.product_id,
-                name=prod.name,
-                grams=it.grams,
-                kcal=it.kcal,
-                cost_kzt=float(it.cost_kzt),
-            )
+    items_out = [
+        MealPlanItemOut(
+            id=it.id,
+            meal_type=it.meal_type,
+            product_id=it.product_id,
+            name=name,
+            grams=it.grams,
+            kcal=it.kcal,
+            cost_kzt=float(it.cost_kzt),
         )
-        total_kcal += int(it.kcal)
-        total_cost = round(total_cost + float(it.cost_kzt), 2)
+        for it, name in rows
+    ]
 
     return MealPlanOut(
         id=mp.id,
         user_id=mp.user_id,
         plan_date=mp.plan_date,
         target_kcal=mp.target_kcal,
-        total_kcal=total_kcal,
-        total_cost_kzt=float(mp.total_cost_kzt),
         items=items_out,
+        **_plan_totals(mp),
     )
 
 
@@ -176,8 +102,6 @@ def _plan_out_from_db(db: Session, user_id: UUID, date: dt.date) -> MealPlanOut
     mp = db.execute(
         select(MealPlan)
         .where(MealPlan.user_id == user_id, MealPlan.plan_date == date)
-        .order_by(desc(MealPlan.created_at))
-        .limit(1)
     ).scalar_one_or_none()
 
     if not mp:
@@ -186,15 +110,76 @@ def _plan_out_from_db(db: Session, user_id: UUID, date: dt.date) -> MealPlanOut
     return _plan_out_from_meal_plan(db, mp)
 
 
-def _shopping_from_plans(plans: list[MealPlanOut]) -> tuple[list[ShoppingItemOut], int, float]:
-    agg: dict[str, dict] = {}
-    total_kcal = 0
-    total_cost = 0.0
+def _plan_dates(db: Session, user_id: UUID, start: dt.date, end: dt.date) -> set[dt.date]:
+    """Dates in [start, end] with a stored plan (the filter of _plans_out_for_range)."""
+    return set(
+        db.execute(
+            select(MealPlan.plan_date)
+            .where(MealPlan.user_id == user_id, MealPlan.plan_date.between(start, end))
+        ).scalars()
+    )
 
-    for p in plans:
+
+def _plans_out_for_range(
+    db: Session, user_id: UUID, start: dt.date, end: dt.date
+) -> dict[dt.date, MealPlanOut]:
+    """Plan per date in [start, end] plus all its items: two queries
+    regardless of the number of days."""
+    mps = db.execute(
+        select(MealPlan)
+        .where(MealPlan.user_id == user_id, MealPlan.plan_date.between(start, end))
+        .order_by(MealPlan.plan_date)
+    ).scalars().all()
+
+    if not mps:
+        return {}
+
+    rows = db.execute(
+        select(MealPlanItem, Product.name)
+        .join(Product, MealPlanItem.product_id == Product.id)
+        .where(MealPlanItem.meal_plan_id.in_([mp.id for mp in mps]))
+    ).all()
+
+    items_by_plan: dict[UUID, list[MealPlanItemOut]] = {mp.id: [] for mp in mps}
+    for it, name in rows:
+        items_by_plan[it.meal_plan_id].append(
+            MealPlanItemOut(
+                id=it.id,
+                meal_type=it.meal_type,
+                product_id=it.product_id,
+                name=name,
+                grams=it.grams,
+                kcal=it.kcal,
+                cost_kzt=float(it.cost_kzt),
+            )
+        )
+
+    return {
+        mp.plan_date: MealPlanOut(
+            id=mp.id,
+            user_id=mp.user_id,
+            plan_date=mp.plan_date,
+            target_kcal=mp.target_kcal,
+            items=items_by_plan[mp.id],
+            **_plan_totals(mp),
+        )
+        for mp in mps
+    }
+
+
+class _ShoppingAccumulator:
+    """Running shopping list; memory grows with distinct products, not days."""
+
+    def __init__(self):
+        self.agg: dict[str, dict] = {}
+        self.total_kcal = 0
+        self.total_cost = 0.0
+
+    def add(self, p: MealPlanOut) -> None:
+        agg = self.agg
         for it in p.items:
-            total_kcal += int(it.kcal)
-            total_cost = round(total_cost + float(it.cost_kzt), 2)
+            self.total_kcal += int(it.kcal)
+            self.total_cost = round(self.total_cost + float(it.cost_kzt), 2)
 
             key = str(it.product_id)
             if key not in agg:
@@ -209,111 +194,404 @@ def _shopping_from_plans(plans: list[MealPlanOut]) -> tuple[list[ShoppingItemOut
             agg[key]["total_kcal"] += int(it.kcal)
             agg[key]["total_cost_kzt"] = round(agg[key]["total_cost_kzt"] + float(it.cost_kzt), 2)
 
+    def shopping_list(self) -> list[ShoppingItemOut]:
+        return [
+            ShoppingItemOut(**v)
+            for v in sorted(self.agg.values(), key=lambda x: (-x["total_cost_kzt"], x["name"], x["product_id"]))
+        ]
+
+
+def _shopping_from_plans(plans: list[MealPlanOut]) -> tuple[list[ShoppingItemOut], int, float]:
+    acc = _ShoppingAccumulator()
+    for p in plans:
+        acc.add(p)
+    return acc.shopping_list(), acc.total_kcal, acc.total_cost
+
+
+def _shopping_for_range(
+    db: Session, user_id: UUID, start: dt.date, end: dt.date
+) -> tuple[list[ShoppingItemOut], int, float]:
+    """Same result as _shopping_from_plans(plans in range), computed by a
+    single GROUP BY in the database."""
+    plan_ids = select(MealPlan.id).where(
+        MealPlan.user_id == user_id, MealPlan.plan_date.between(start, end)
+    )
+    total_cost = func.sum(MealPlanItem.cost_kzt)
+
+    rows = db.execute(
+        select(
+            MealPlanItem.product_id,
+            Product.name,
+            func.sum(MealPlanItem.grams),
+            func.sum(MealPlanItem.kcal),
+            total_cost,
+        )
+        .join(Product, MealPlanItem.product_id == Product.id)
+        .where(MealPlanItem.meal_plan_id.in_(plan_ids))
+        .group_by(MealPlanItem.product_id, Product.name)
+        # name and id break cost ties, so equal-cost rows keep a stable order
+        .order_by(desc(total_cost), Product.name, MealPlanItem.product_id)
+    ).all()
+
     shopping = [
-        ShoppingItemOut(**v) for v in sorted(agg.values(), key=lambda x: x["total_cost_kzt"], reverse=True)
+        ShoppingItemOut(
+            product_id=product_id,
+            name=name,
+            total_grams=int(grams),
+            total_kcal=int(kcal),
+            total_cost_kzt=float(cost),
+        )
+        for product_id, name, grams, kcal, cost in rows
     ]
+    total_kcal = sum(x.total_kcal for x in shopping)
+    total_cost = float(sum(cost for *_, cost in rows))
     return shopping, total_kcal, total_cost
 
 
 # -------------------------
-# core generator (user_id + date)
+# plan building
 # -------------------------
-def _generate_for_user_and_date(db: Session, user_id: UUID, plan_date: dt.date) -> MealPlanOut:
+def _load_profile(db: Session, user_id: UUID) -> Profile:
     profile = db.execute(
         select(Profile).where(Profile.user_id == user_id)
     ).scalar_one_or_none()
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found for this user")
+    return profile
 
-    any_product = db.execute(select(Product).limit(1)).scalar_one_or_none()
-    if not any_product:
-        raise HTTPException(status_code=400, detail="No products in database. Add products first.")
 
-    target_kcal = calc_target_kcal(profile)
-    budget_kzt = int(getattr(profile, "budget_kzt_per_day", 10**9) or 10**9)
+# -------------------------
+# core generator (user_id + date)
+# -------------------------
+def _generate_one(
+    db: Session,
+    user_id: UUID,
+    plan_date: dt.date,
+    engine: str = "greedy",
+    selection: str = "template",
+    started: dt.datetime | None = None,
+) -> MealPlanOut:
+    """Generate under the (user, date) advisory lock. If another worker wrote
+    the plan after this request started (started, naive UTC like
+    MealPlan.created_at), return that plan instead of generating again."""
+    lock_plan_date(db, user_id, plan_date)
+    if started is not None:
+        mp = db.execute(
+            select(MealPlan).where(
+                MealPlan.user_id == user_id,
+                MealPlan.plan_date == plan_date,
+                MealPlan.created_at >= started,
+            )
+        ).scalar_one_or_none()
+        if mp:
+            return _plan_out_from_meal_plan(db, mp)
+
+    return _generate_week(
+        db, user_id, plan_date, days=1, reuse_existing=False, engine=engine, selection=selection
+    )[0]
+
+
+def _generate_for_user_and_date(
+    db: Session, user_id: UUID, plan_date: dt.date, engine: str = "greedy", selection: str = "template"
+) -> MealPlanOut:
+    """Concurrent calls for the same user, date and options in this process
+    share one generation (double clicks, client retries)."""
+    started = dt.datetime.utcnow()
+    return generation_flight.do(
+        (user_id, plan_date, engine, selection),
+        lambda: _generate_one(db, user_id, plan_date, engine, selection, started),
+    )
 
-    plan_template = [
-        ("breakfast", [("Oats", 80), ("Banana", 120), ("Kefir 2.5%", 250)]),
-        ("lunch",     [("Chicken breast (raw)", 200), ("Rice (dry)", 90)]),
-        ("snack",     [("Cottage cheese 5%", 200), ("Apple", 200)]),
-        ("dinner",    [("Lentils (dry)", 80), ("Buckwheat (dry)", 80)]),
-    ]
 
-    raw_items: list[dict] = []
-    for meal_type, parts in plan_template:
-        for prod_name, grams in parts:
-            prod = get_product_by_name(db, prod_name)
-            if prod:
-                raw_items.append({"meal_type": meal_type, "product": prod, "grams": grams})
+def _generate_week(
+    db: Session,
+    user_id: UUID,
+    start: dt.date,
+    days: int,
+    reuse_existing: bool,
+    engine: str = "greedy",
+    selection: str = "template",
+) -> list[MealPlanOut]:
+    """Profile and catalog are loaded once, the plan is fitted once (inputs are
+    the same for every day) and all new rows are written in one transaction."""
+    return list(_iter_plans(db, user_id, start, days, reuse_existing, engine, selection))
+
+
+def _iter_plans(
+    db: Session,
+    user_id: UUID,
+    start: dt.date,
+    days: int,
+    reuse_existing: bool,
+    engine: str = "greedy",
+    selection: str = "template",
+    chunk_days: int | None = None,
+) -> Iterator[MealPlanOut]:
+    """Yields plans in date order. Days are processed chunk_days at a time
+    (default: all at once), with one read and one write transaction per chunk.
+    Profile and catalog are only loaded once a day has to be generated, so
+    reusing stored plans works without a profile."""
+    chunk_days = chunk_days or days
+    raw_items: list[dict] | None = None
+    target_kcal = 0
+
+    for offset in range(0, days, chunk_days):
+        chunk_start = start + dt.timedelta(days=offset)
+        n = min(chunk_days, days - offset)
+
+        existing: dict[dt.date, MealPlanOut] = {}
+        if reuse_existing:
+            existing = _plans_out_for_range(db, user_id, chunk_start, chunk_start + dt.timedelta(days=n - 1))
+
+        plan_rows: list[dict] = []
+        item_rows: list[dict] = []
+        plans: list[MealPlanOut] = []
+
+        for i in range(n):
+            d = chunk_start + dt.timedelta(days=i)
+
+            if d in existing:
+                plans.append(existing[d])
+                continue
 
-    if not raw_items:
-        raise HTTPException(status_code=400, detail="Could not build plan: required products not found.")
+            if raw_items is None:
+                profile = _load_profile(db, user_id)
+                target_kcal = calc_target_kcal(profile)
+                budget_kzt = int(getattr(profile, "budget_kzt_per_day", 10**9) or 10**9)
+                try:
+                    raw_items = run_cpu_bound(
+                        build_items, get_catalog(db), target_kcal, budget_kzt, engine, selection
+                    )
+                except PlanBuildError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
 
-    raw_items = fit_plan(raw_items, target_kcal=target_kcal, budget_kzt=budget_kzt)
+            plan_row, rows, plan_out = plan_from_items(user_id, d, target_kcal, raw_items)
+            plan_rows.append(plan_row)
+            item_rows.extend(rows)
+            plans.append(plan_out)
 
-    items_to_save: list[MealPlanItem] = []
-    items_out: list[MealPlanItemOut] = []
-    total_kcal = 0
-    total_cost = 0.0
+        if plan_rows:
+            remap = upsert_plans(db, plan_rows, item_rows)
+            db.commit()
+            for p in plans:
+                p.id = remap.get(p.id, p.id)
 
-    for x in raw_items:
-        prod: Product = x["product"]
-        grams: int = int(x["grams"])
-        meal_type: str = x["meal_type"]
+        yield from plans
 
-        kcal = kcal_for(prod, grams)
-        cost = cost_for(prod, grams)
 
-        items_to_save.append(
-            MealPlanItem(
-                meal_type=meal_type,
-                product_id=prod.id,
-                grams=grams,
-                kcal=kcal,
-                cost_kzt=cost,
-            )
-        )
-        items_out.append(
-            MealPlanItemOut(
-                meal_type=meal_type,
+def _latest_plan_out(db: Session, user_id: UUID) -> MealPlanOut:
+    mp = db.execute(
+        select(MealPlan)
+        .where(MealPlan.user_id == user_id)
+        .order_by(desc(MealPlan.created_at))
+        .limit(1)
+    ).scalar_one_or_none()
+
+    if not mp:
+        raise HTTPException(status_code=404, detail="No meal plans for this user")
+
+    return _plan_out_from_meal_plan(db, mp)
+
+
+def _substitutes_out(db: Session, user_id: UUID, item_id: UUID, k: int) -> ItemSubstitutesOut:
+    item = db.execute(
+        select(MealPlanItem)
+        .join(MealPlan, MealPlanItem.meal_plan_id == MealPlan.id)
+        .where(MealPlanItem.id == item_id, MealPlan.user_id == user_id)
+    ).scalar_one_or_none()
+    if not item:
+        raise HTTPException(status_code=404, detail="Meal plan item not found")
+
+    catalog = get_catalog(db)
+    current = catalog.get_by_id(item.product_id)
+    if not current:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    item_cost = float(item.cost_kzt)
+    subs: list[SubstituteOut] = []
+    neighbors = run_cpu_bound(lambda: get_neighbors(catalog).cheaper_neighbors(item.product_id, k))
+    for i, distance in neighbors:
+        prod = catalog.product(i)
+        # same kcal as the item, rounded to 10 g like the fitter
+        grams = max(10, int(round(item.kcal / float(prod.kcal_per_100g) * 10)) * 10)
+        cost = cost_for(prod, grams)
+        subs.append(
+            SubstituteOut(
                 product_id=prod.id,
                 name=prod.name,
                 grams=grams,
-                kcal=kcal,
+                kcal=kcal_for(prod, grams),
                 cost_kzt=cost,
+                saving_kzt=round(item_cost - cost, 2),
+                distance=round(distance, 4),
             )
         )
 
-        total_kcal += kcal
-        total_cost = round(total_cost + cost, 2)
+    return ItemSubstitutesOut(
+        item_id=item.id,
+        product_id=item.product_id,
+        name=current.name,
+        grams=item.grams,
+        kcal=item.kcal,
+        cost_kzt=item_cost,
+        substitutes=subs,
+    )
+
+
+def _check_range(start: dt.date, end: dt.date) -> None:
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_RANGE_DAYS} days")
+
 
-    meal_plan = MealPlan(
+def _range_out(db: Session, user_id: UUID, start: dt.date, end: dt.date) -> list[MealPlanOut]:
+    by_date = _plans_out_for_range(db, user_id, start, end)
+    return [by_date[d] for d in sorted(by_date)]
+
+
+def _summaries_out(db: Session, user_id: UUID, start: dt.date, end: dt.date) -> list[MealPlanSummaryOut]:
+    mps = db.execute(
+        select(MealPlan)
+        .where(MealPlan.user_id == user_id, MealPlan.plan_date.between(start, end))
+        .order_by(MealPlan.plan_date)
+    ).scalars().all()
+    return [
+        MealPlanSummaryOut(id=mp.id, plan_date=mp.plan_date, target_kcal=mp.target_kcal, **_plan_totals(mp))
+        for mp in mps
+    ]
+
+
+def _shopping_list_out(db: Session, user_id: UUID, start: dt.date, end: dt.date) -> ShoppingListOut:
+    items, total_kcal, total_cost = _shopping_for_range(db, user_id, start, end)
+    return ShoppingListOut(
         user_id=user_id,
-        plan_date=plan_date,
-        target_kcal=target_kcal,
+        start_date=start,
+        end_date=end,
+        total_kcal=total_kcal,
         total_cost_kzt=total_cost,
+        items=items,
     )
-    db.add(meal_plan)
-    db.flush()
 
-    for it in items_to_save:
-        it.meal_plan_id = meal_plan.id
-        db.add(it)
 
-    db.commit()
-    db.refresh(meal_plan)
+def _week_out(db: Session, user_id: UUID, payload: MealPlanWeekGenerateIn) -> MealPlanWeekOut:
+    start = payload.start_date or dt.date.today()
+    days = max(1, min(14, int(payload.days or 7)))
 
-    return MealPlanOut(
-        id=meal_plan.id,
-        user_id=meal_plan.user_id,
-        plan_date=meal_plan.plan_date,
-        target_kcal=meal_plan.target_kcal,
-        total_kcal=total_kcal,
-        total_cost_kzt=float(meal_plan.total_cost_kzt),
-        items=items_out,
+    plans = _generate_week(
+        db,
+        user_id=user_id,
+        start=start,
+        days=days,
+        reuse_existing=getattr(payload, "reuse_existing", False),
+        engine=payload.engine,
+        selection=payload.selection,
+    )
+
+    shopping_list, total_week_kcal, total_week_cost = _shopping_from_plans(plans)
+
+    return MealPlanWeekOut(
+        user_id=user_id,
+        start_date=start,
+        end_date=start + dt.timedelta(days=days - 1),
+        total_week_kcal=total_week_kcal,
+        total_week_cost_kzt=float(total_week_cost),
+        plans=plans,
+        shopping_list=shopping_list,
+    )
+
+
+def _stream_week_response(user_id: UUID, payload: MealPlanWeekGenerateIn) -> StreamingResponse:
+    """NDJSON: one MealPlanOut per line as soon as its chunk is written, then a
+    MealPlanStreamSummaryOut line with totals and the shopping list."""
+    start = payload.start_date or dt.date.today()
+    days = max(1, min(MAX_STREAM_DAYS, int(payload.days or 7)))
+
+    # own session: the response body outlives the request's dependencies
+    db = SessionLocal()
+    try:
+        # _iter_plans loads the profile only once a day needs generating,
+        # which may be a later chunk; a 404 then would cut the stream. So
+        # check it up front, unless every day is served from stored plans.
+        reuse_existing = getattr(payload, "reuse_existing", False)
+        end = start + dt.timedelta(days=days - 1)
+        if not reuse_existing or len(_plan_dates(db, user_id, start, end)) < days:
+            _load_profile(db, user_id)
+        plans = _iter_plans(
+            db,
+            user_id=user_id,
+            start=start,
+            days=days,
+            reuse_existing=reuse_existing,
+            engine=payload.engine,
+            selection=payload.selection,
+            chunk_days=STREAM_CHUNK_DAYS,
+        )
+        # surface 404/400 before the 200 status line goes out
+        first = next(plans)
+    except BaseException:
+        db.close()
+        raise
+
+    def body() -> Iterator[str]:
+        acc = _ShoppingAccumulator()
+        try:
+            for p in itertools.chain([first], plans):
+                acc.add(p)
+                yield p.model_dump_json() + "\n"
+        finally:
+            db.close()
+
+        summary = MealPlanStreamSummaryOut(
+            user_id=user_id,
+            start_date=start,
+            end_date=start + dt.timedelta(days=days - 1),
+            total_kcal=acc.total_kcal,
+            total_cost_kzt=float(acc.total_cost),
+            shopping_list=acc.shopping_list(),
+        )
+        yield summary.model_dump_json() + "\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+def _run_week_job(user_id: UUID, payload: MealPlanWeekGenerateIn) -> MealPlanWeekOut:
+    # runs on a job worker thread, outside any request
+    db = SessionLocal()
+    try:
+        return _week_out(db, user_id, payload)
+    finally:
+        db.close()
+
+
+def _job_out(job: Job) -> PlanJobOut:
+    return PlanJobOut(
+        id=job.id,
+        status=job.status,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        result=job.result,
+        error=job.error,
+        status_code=job.status_code,
     )
 
 
+def _submit_week_job(user_id: UUID, payload: MealPlanWeekGenerateIn) -> PlanJobOut:
+    try:
+        job = plan_jobs.submit(user_id, lambda: _run_week_job(user_id, payload))
+    except JobRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    return _job_out(job)
+
+
+def _my_job_out(user_id: UUID, job_id: UUID) -> PlanJobOut:
+    job = plan_jobs.get(job_id)
+    if not job or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_out(job)
+
+
 # -------------------------
 # NEW: me-based endpoints (no user_id from client)
 # -------------------------
@@ -324,7 +602,9 @@ def generate_my_meal_plan(
     current_user: User = Depends(get_current_user),
 ):
     plan_date = payload.plan_date or dt.date.today()
-    return _generate_for_user_and_date(db, user_id=current_user.id, plan_date=plan_date)
+    return _generate_for_user_and_date(
+        db, user_id=current_user.id, plan_date=plan_date, engine=payload.engine, selection=payload.selection
+    )
 
 
 @router.get("/me", response_model=MealPlanOut)
@@ -344,17 +624,50 @@ def latest_my_meal_plan(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    mp = db.execute(
-        select(MealPlan)
-        .where(MealPlan.user_id == current_user.id)
-        .order_by(desc(MealPlan.created_at))
-        .limit(1)
-    ).scalar_one_or_none()
+    return _latest_plan_out(db, current_user.id)
 
-    if not mp:
-        raise HTTPException(status_code=404, detail="No meal plans for this user")
 
-    return _plan_out_from_meal_plan(db, mp)
+@router.get("/me/range", response_model=list[MealPlanOut])
+def get_my_meal_plans_range(
+    start: dt.date = Query(...),
+    end: dt.date = Query(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    _check_range(start, end)
+    return _range_out(db, current_user.id, start, end)
+
+
+@router.get("/me/summaries", response_model=list[MealPlanSummaryOut])
+def get_my_meal_plan_summaries(
+    start: dt.date = Query(...),
+    end: dt.date = Query(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    _check_range(start, end)
+    return _summaries_out(db, current_user.id, start, end)
+
+
+@router.get("/me/shopping-list", response_model=ShoppingListOut)
+def get_my_shopping_list(
+    start: dt.date = Query(...),
+    end: dt.date = Query(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    _check_range(start, end)
+    return _shopping_list_out(db, current_user.id, start, end)
+
+
+@router.get("/me/items/{item_id}/substitutes", response_model=ItemSubstitutesOut)
+def get_item_substitutes(
+    item_id: UUID,
+    k: int = Query(5, ge=1, le=K_MAX),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    return _substitutes_out(db, current_user.id, item_id, k)
 
 
 @router.post("/me/generate-week", response_model=MealPlanWeekOut)
@@ -363,33 +676,87 @@ def generate_my_week(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
+    return _week_out(db, current_user.id, payload)
+
+
+@router.post("/me/generate-week/stream")
+def stream_my_week(
+    payload: MealPlanWeekGenerateIn,
+    current_user: User = Depends(get_current_user),
+):
+    return _stream_week_response(current_user.id, payload)
+
+
+@router.post("/me/generate-week/jobs", response_model=PlanJobOut, status_code=202)
+def submit_my_week_job(
+    payload: MealPlanWeekGenerateIn,
+    current_user: User = Depends(get_current_user),
+):
+    """Queue week generation and return at once; poll GET /jobs/{id}."""
+    return _submit_week_job(current_user.id, payload)
+
+
+@router.get("/jobs/{job_id}", response_model=PlanJobOut)
+def get_my_job(job_id: UUID, current_user: User = Depends(get_current_user)):
+    return _my_job_out(current_user.id, job_id)
+
+
+# -------------------------
+# admin
+# -------------------------
+_pregenerate_lock = threading.Lock()
+_pregenerate_run: subprocess.Popen | None = None
+
+
+@router.post(
+    "/admin/pregenerate",
+    response_model=PregenerateOut,
+    status_code=202,
+    dependencies=[Depends(require_admin)],
+)
+def pregenerate_meal_plans(payload: PregenerateIn):
+    # the batch CLI in its own process, one run at a time; poll() also
+    # reaps the previous one
+    global _pregenerate_run
     start = payload.start_date or dt.date.today()
-    days = max(1, min(14, int(payload.days or 7)))
+    with _pregenerate_lock:
+        if _pregenerate_run is not None and _pregenerate_run.poll() is None:
+            raise HTTPException(status_code=409, detail="A pregenerate run is already in progress")
+        _pregenerate_run = batch.spawn(
+            start,
+            days=payload.days,
+            workers=payload.workers,
+            chunk_size=payload.chunk_size,
+            engine=payload.engine,
+            selection=payload.selection,
+            skip_existing=not payload.overwrite,
+        )
+    return PregenerateOut(status="accepted", start_date=start, days=payload.days)
 
-    plans: list[MealPlanOut] = []
-    for i in range(days):
-        d = start + dt.timedelta(days=i)
 
-        if getattr(payload, "reuse_existing", False):
-            existing = _plan_out_from_db(db, current_user.id, d)
-            if existing:
-                plans.append(existing)
-                continue
+def _run_compact() -> None:
+    db = SessionLocal()
+    try:
+        plans, items = compact_duplicate_plans(db)
+    finally:
+        db.close()
+    logger.info("compact done: %s plans, %s items removed", plans, items)
 
-        created = _generate_for_user_and_date(db, user_id=current_user.id, plan_date=d)
-        plans.append(created)
 
-    shopping_list, total_week_kcal, total_week_cost = _shopping_from_plans(plans)
+@router.post("/admin/compact", status_code=202, dependencies=[Depends(require_admin)])
+def compact_meal_plans(background_tasks: BackgroundTasks):
+    background_tasks.add_task(_run_compact)
+    return {"status": "accepted"}
 
-    return MealPlanWeekOut(
-        user_id=current_user.id,
-        start_date=start,
-        end_date=start + dt.timedelta(days=days - 1),
-        total_week_kcal=total_week_kcal,
-        total_week_cost_kzt=float(total_week_cost),
-        plans=plans,
-        shopping_list=shopping_list,
-    )
+
+@router.get("/admin/cache", dependencies=[Depends(require_admin)])
+def plan_cache_stats():
+    return plan_cache.stats()
+
+
+@router.get("/admin/jobs", dependencies=[Depends(require_admin)])
+def plan_job_stats():
+    return plan_jobs.stats()
 
 
 # -------------------------
@@ -398,7 +765,9 @@ def generate_my_week(
 @router.post("/generate", response_model=MealPlanOut)
 def generate_meal_plan(payload: MealPlanGenerateIn, db: Session = Depends(get_db)):
     plan_date = payload.plan_date or dt.date.today()
-    return _generate_for_user_and_date(db, user_id=payload.user_id, plan_date=plan_date)
+    return _generate_for_user_and_date(
+        db, user_id=payload.user_id, plan_date=plan_date, engine=payload.engine, selection=payload.selection
+    )
 
 
 @router.get("", response_model=MealPlanOut)
@@ -411,30 +780,4 @@ def get_meal_plan(user_id: UUID = Query(...), date: dt.date = Query(...), db: Se
 
 @router.post("/generate-week", response_model=MealPlanWeekOut)
 def generate_week(payload: MealPlanWeekGenerateIn, db: Session = Depends(get_db)):
-    start = payload.start_date or dt.date.today()
-    days = max(1, min(14, int(payload.days or 7)))
-
-    plans: list[MealPlanOut] = []
-    for i in range(days):
-        d = start + dt.timedelta(days=i)
-
-        if getattr(payload, "reuse_existing", False):
-            existing = _plan_out_from_db(db, payload.user_id, d)
-            if existing:
-                plans.append(existing)
-                continue
-
-        created = _generate_for_user_and_date(db, user_id=payload.user_id, plan_date=d)
-        plans.append(created)
-
-    shopping_list, total_week_kcal, total_week_cost = _shopping_from_plans(plans)
-
-    return MealPlanWeekOut(
-        user_id=payload.user_id,
-        start_date=start,
-        end_date=start + dt.timedelta(days=days - 1),
-        total_week_kcal=total_week_kcal,
-        total_week_cost_kzt=float(total_week_cost),
-        plans=plans,
-        shopping_list=shopping_list,
-    )
+    return _week_out(db, payload.user_id, payload)
@@ -0,0 +1,195 @@
+import datetime as dt
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.catalog.neighbors import K_MAX
+from app.infrastructure.async_db import AsyncSessionLocal
+from app.infrastructure.async_session import get_async_db
+from app.infrastructure.models import User
+from app.auth.deps import get_current_user_async, require_admin
+from app.planning.singleflight import AsyncSingleFlight
+from app.schemas.meal_plans import (
+    MealPlanGenerateIn,
+    MealPlanOut,
+    MealPlanSummaryOut,
+    MealPlanWeekGenerateIn,
+    MealPlanWeekOut,
+    ShoppingListOut,
+    ItemSubstitutesOut,
+    PregenerateOut,
+    PlanJobOut,
+)
+from app.api.v1.endpoints.meal_plans import (
+    _check_range,
+    _generate_one,
+    _latest_plan_out,
+    _my_job_out,
+    _plan_out_from_db,
+    _range_out,
+    _shopping_list_out,
+    _submit_week_job,
+    _substitutes_out,
+    _summaries_out,
+    _week_out,
+    compact_meal_plans,
+    plan_cache_stats,
+    plan_job_stats,
+    pregenerate_meal_plans,
+    stream_my_week,
+)
+
+# Async twin of meal_plans.py: the plan helpers run through AsyncSession.run_sync;
+# their CPU-bound steps (fit, solve, snapshot and neighbor builds) go through
+# run_cpu_bound, which moves them to a worker thread there.
+router = APIRouter(prefix="/meal-plans", tags=["meal-plans"])
+
+generation_flight = AsyncSingleFlight()
+
+
+async def _generate_shared(
+    user_id: UUID, plan_date: dt.date, engine: str, selection: str, started: dt.datetime
+) -> MealPlanOut:
+    # own session: the shared run outlives a leader request that goes away
+    async with AsyncSessionLocal() as db:
+        return await db.run_sync(_generate_one, user_id, plan_date, engine, selection, started)
+
+
+async def _generate_coalesced(user_id: UUID, plan_date: dt.date, payload: MealPlanGenerateIn) -> MealPlanOut:
+    # same as _generate_for_user_and_date, but waiters await instead of
+    # blocking the event loop thread
+    started = dt.datetime.utcnow()
+    return await generation_flight.do(
+        (user_id, plan_date, payload.engine, payload.selection),
+        lambda: _generate_shared(user_id, plan_date, payload.engine, payload.selection, started),
+    )
+
+
+@router.post("/me/generate", response_model=MealPlanOut)
+async def generate_my_meal_plan(
+    payload: MealPlanGenerateIn,
+    current_user: User = Depends(get_current_user_async),
+):
+    plan_date = payload.plan_date or dt.date.today()
+    return await _generate_coalesced(current_user.id, plan_date, payload)
+
+
+@router.get("/me", response_model=MealPlanOut)
+async def get_my_meal_plan(
+    date: dt.date = Query(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    mp = await db.run_sync(_plan_out_from_db, user_id=current_user.id, date=date)
+    if not mp:
+        raise HTTPException(status_code=404, detail="Meal plan not found for this date")
+    return mp
+
+
+@router.get("/me/latest", response_model=MealPlanOut)
+async def latest_my_meal_plan(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    return await db.run_sync(_latest_plan_out, current_user.id)
+
+
+@router.get("/me/range", response_model=list[MealPlanOut])
+async def get_my_meal_plans_range(
+    start: dt.date = Query(...),
+    end: dt.date = Query(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    _check_range(start, end)
+    return await db.run_sync(_range_out, current_user.id, start, end)
+
+
+@router.get("/me/summaries", response_model=list[MealPlanSummaryOut])
+async def get_my_meal_plan_summaries(
+    start: dt.date = Query(...),
+    end: dt.date = Query(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    _check_range(start, end)
+    return await db.run_sync(_summaries_out, current_user.id, start, end)
+
+
+@router.get("/me/shopping-list", response_model=ShoppingListOut)
+async def get_my_shopping_list(
+    start: dt.date = Query(...),
+    end: dt.date = Query(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    _check_range(start, end)
+    return await db.run_sync(_shopping_list_out, current_user.id, start, end)
+
+
+@router.get("/me/items/{item_id}/substitutes", response_model=ItemSubstitutesOut)
+async def get_item_substitutes(
+    item_id: UUID,
+    k: int = Query(5, ge=1, le=K_MAX),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    return await db.run_sync(_substitutes_out, current_user.id, item_id, k)
+
+
+@router.post("/me/generate-week", response_model=MealPlanWeekOut)
+async def generate_my_week(
+    payload: MealPlanWeekGenerateIn,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    return await db.run_sync(_week_out, current_user.id, payload)
+
+
+# the job queue is in memory and never blocks, so these are called directly
+@router.post("/me/generate-week/jobs", response_model=PlanJobOut, status_code=202)
+async def submit_my_week_job(
+    payload: MealPlanWeekGenerateIn,
+    current_user: User = Depends(get_current_user_async),
+):
+    return _submit_week_job(current_user.id, payload)
+
+
+@router.get("/jobs/{job_id}", response_model=PlanJobOut)
+async def get_my_job(job_id: UUID, current_user: User = Depends(get_current_user_async)):
+    return _my_job_out(current_user.id, job_id)
+
+
+# sync handlers that open their own sessions or none, reuse them as is
+router.post("/me/generate-week/stream")(stream_my_week)
+router.post(
+    "/admin/pregenerate",
+    response_model=PregenerateOut,
+    status_code=202,
+    dependencies=[Depends(require_admin)],
+)(pregenerate_meal_plans)
+router.post("/admin/compact", status_code=202, dependencies=[Depends(require_admin)])(compact_meal_plans)
+router.get("/admin/cache", dependencies=[Depends(require_admin)])(plan_cache_stats)
+router.get("/admin/jobs", dependencies=[Depends(require_admin)])(plan_job_stats)
+
+
+@router.post("/generate", response_model=MealPlanOut)
+async def generate_meal_plan(payload: MealPlanGenerateIn):
+    plan_date = payload.plan_date or dt.date.today()
+    return await _generate_coalesced(payload.user_id, plan_date, payload)
+
+
+@router.get("", response_model=MealPlanOut)
+async def get_meal_plan(
+    user_id: UUID = Query(...), date: dt.date = Query(...), db: AsyncSession = Depends(get_async_db)
+):
+    mp = await db.run_sync(_plan_out_from_db, user_id=user_id, date=date)
+    if not mp:
+        raise HTTPException(status_code=404, detail="Meal plan not found for this date")
+    return mp
+
+
+@router.post("/generate-week", response_model=MealPlanWeekOut)
+async def generate_week(payload: MealPlanWeekGenerateIn, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(_week_out, payload.user_id, payload)
@@ -1,19 +1,66 @@
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+import datetime as dt
+import json
+import logging
+import uuid
+from dataclasses import dataclass, replace
+from email.utils import format_datetime, parsedate_to_datetime
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from typing import List
+from sqlalchemy import literal_column, or_, select, text, tuple_
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.dialects.postgresql import insert
+from typing import Iterator, List, Literal, Optional
 from pydantic import BaseModel
 
+from app.infrastructure.offload import run_cpu_bound
 from app.infrastructure.session import get_db
 from app.infrastructure.models import Product
-from app.schemas.products import ProductCreate, ProductOut
+from app.schemas.products import ProductCreate, ProductOut, ProductSearchHit
+from app.catalog.importer import BATCH_SIZE, ImportFormat, import_products
+from app.catalog.search import MAX_RESULTS, MIN_SCORE, get_search_index, patch_search_index
+from app.catalog.snapshot import (
+    CatalogVersion,
+    bump_catalog_version,
+    catalog_version,
+    get_catalog,
+    invalidate_catalog,
+)
 
 router = APIRouter(prefix="/products", tags=["products"])
+logger = logging.getLogger(__name__)
+
+ProductSort = Literal["name", "cost_per_kcal", "kcal_per_g", "protein_per_kzt"]
+PRODUCT_FIELDS = tuple(ProductOut.model_fields)
+PAGE_DEFAULT = 100
+PAGE_MAX = 1000
+# rows per INSERT ... ON CONFLICT statement; 7 parameters a row stays far
+# below the 65535 bind parameter limit
+UPSERT_CHUNK = 1000
+# columns the client sends; id and the derived metrics come from the database
+PAYLOAD_FIELDS = tuple(ProductCreate.model_fields)
 
 class SeedResult(BaseModel):
     total: int
     inserted: int
     skipped: int
+    updated: int = 0
+
+
+class ImportResult(BaseModel):
+    rows: int
+    invalid: int
+    inserted: int
+    updated: int
+    skipped: int
+    batches: int
+    elapsed_s: float
+    rows_per_sec: float
+    errors: List[str]  # first MAX_ERRORS only
 
 
 def build_seed_products() -> List[ProductCreate]:
@@ -98,93 +145,401 @@ def build_seed_products() -> List[ProductCreate]:
     return items[:100]
 
 
-@router.post("", response_model=ProductOut)
-def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
+def _create_product(db: Session, payload: ProductCreate) -> Product:
     existing = db.execute(select(Product).where(Product.name == payload.name)).scalar_one_or_none()
     if existing:
         raise HTTPException(status_code=409, detail="Product with this name already exists")
 
     obj = Product(**payload.model_dump())
     db.add(obj)
+    version = bump_catalog_version(db)
     db.commit()
+    invalidate_catalog(version)
     db.refresh(obj)
+    run_cpu_bound(patch_search_index, version, [(obj.id, obj.name)])
     return obj
 
 
-@router.post("/bulk", response_model=List[ProductOut])
-def create_products_bulk(payload: List[ProductCreate], db: Session = Depends(get_db)):
-    created = []
+def _upsert_products(db: Session, payload: List[ProductCreate], update: bool = False) -> tuple[List[dict], SeedResult]:
+    """Insert products by name in UPSERT_CHUNK sized INSERT ... ON CONFLICT
+    (name) statements and commit once.
+
+    Existing names are skipped, or with update=True overwritten when any value
+    differs (identical rows still count as skipped). A name repeated within
+    the payload is taken once, first occurrence wins. Returns the inserted and
+    updated rows (RETURNING, so nothing is refreshed) and the counts.
+    """
+    by_name: dict[str, ProductCreate] = {}
     for item in payload:
-        existing = db.execute(select(Product).where(Product.name == item.name)).scalar_one_or_none()
-        if existing:
-            continue
+        by_name.setdefault(item.name, item)
+    unique = list(by_name.values())
 
-        obj = Product(**item.model_dump())
-        db.add(obj)
-        created.append(obj)
+    stmt = insert(Product)
+    if update:
+        changed = [getattr(Product, f) for f in PAYLOAD_FIELDS if f != "name"]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Product.name],
+            set_={c.key: stmt.excluded[c.key] for c in changed},
+            where=or_(*(c.is_distinct_from(stmt.excluded[c.key]) for c in changed)),
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[Product.name])
+    # xmax is 0 only for a row version this statement inserted
+    stmt = stmt.returning(*Product.__table__.c, literal_column("xmax = 0").label("inserted"))
 
+    rows: List[dict] = []
+    for start in range(0, len(unique), UPSERT_CHUNK):
+        chunk = [item.model_dump() for item in unique[start:start + UPSERT_CHUNK]]
+        rows.extend(dict(r) for r in db.execute(stmt, chunk).mappings())
+    version = bump_catalog_version(db) if rows else None
     db.commit()
-    for obj in created:
-        db.refresh(obj)
-    return created
+    created = [r for r in rows if r.pop("inserted")]
+    if version:
+        invalidate_catalog(version)
+        run_cpu_bound(patch_search_index, version, [(r["id"], r["name"]) for r in created])
 
+    inserted = len(created)
+    updated = len(rows) - inserted
+    order = {item.name: i for i, item in enumerate(unique)}
+    rows.sort(key=lambda r: order[r["name"]])
+    return rows, SeedResult(total=len(payload), inserted=inserted, updated=updated, skipped=len(payload) - len(rows))
 
-@router.post("/seed", response_model=SeedResult)
-def seed_products(db: Session = Depends(get_db)):
-    items = build_seed_products()
-    inserted = 0
-    skipped = 0
-
-    for item in items:
-        existing = db.execute(select(Product).where(Product.name == item.name)).scalar_one_or_none()
-        if existing:
-            skipped += 1
+
+def _create_products_bulk(db: Session, payload: List[ProductCreate]) -> List[dict]:
+    # created rows only, existing names are skipped
+    return _upsert_products(db, payload)[0]
+
+
+def _seed_products(db: Session) -> SeedResult:
+    return _upsert_products(db, build_seed_products())[1]
+
+
+@dataclass
+class ProductQuery:
+    """Query parameters of GET /products (shared by the async twin)."""
+
+    order_by: ProductSort = "name"
+    order: Literal["asc", "desc"] = "asc"
+    max_cost_per_kcal: Optional[float] = Query(None, ge=0)
+    min_protein_per_kzt: Optional[float] = Query(None, ge=0)
+    min_kcal_per_g: Optional[float] = Query(None, ge=0)
+    max_kcal_per_g: Optional[float] = Query(None, ge=0)
+    min_kcal: Optional[int] = Query(None, ge=0, description="kcal per 100 g")
+    max_kcal: Optional[int] = Query(None, ge=0, description="kcal per 100 g")
+    min_price: Optional[float] = Query(None, ge=0, description="KZT per 100 g")
+    max_price: Optional[float] = Query(None, ge=0, description="KZT per 100 g")
+    limit: Optional[int] = Query(
+        None, ge=1, le=PAGE_MAX, description=f"page size; default {PAGE_DEFAULT} with a cursor, all rows without either"
+    )
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page")
+    fields: Optional[str] = Query(None, description="comma separated ProductOut fields; id is always included")
+
+
+def _encode_cursor(q: ProductQuery, row) -> str:
+    key = [row[q.order_by], row["name"], str(row["id"])] if q.order_by != "name" else [row["name"], str(row["id"])]
+    raw = json.dumps([q.order_by, q.order, *key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(q: ProductQuery) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(q.cursor + "=" * (-len(q.cursor) % 4))
+        order_by, order, *key = json.loads(raw)
+        key[-1] = uuid.UUID(key[-1])
+    except (ValueError, TypeError, IndexError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if (order_by, order) != (q.order_by, q.order) or len(key) != (2 if order_by == "name" else 3):
+        raise HTTPException(status_code=400, detail="Cursor does not match order_by/order")
+    # the values go into a row comparison as they are: a number (or NULL)
+    # for the metric, a string for the name
+    *value, name = key[:-1]
+    if not isinstance(name, str) or any(
+        v is not None and (isinstance(v, bool) or not isinstance(v, (int, float))) for v in value
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+
+def _fetch_size(q: ProductQuery) -> Optional[int]:
+    # one extra row tells whether there is a next page; None reads them all
+    return None if q.limit is None else q.limit + 1
+
+
+def _page_by_name(db: Session, stmt, q: ProductQuery, key: Optional[list]) -> list:
+    name_id = tuple_(Product.name, Product.id)
+    if q.order == "desc":
+        if key:
+            stmt = stmt.where(name_id < tuple_(*key))
+        stmt = stmt.order_by(Product.name.desc(), Product.id.desc())
+    else:
+        if key:
+            stmt = stmt.where(name_id > tuple_(*key))
+        stmt = stmt.order_by(Product.name, Product.id)
+    return db.execute(stmt.limit(_fetch_size(q))).mappings().all()
+
+
+def _page_by_metric(db: Session, stmt, q: ProductQuery, key: Optional[list]) -> list:
+    # order: value, then name, then id, all in the requested direction, so a
+    # (value, name, id) index serves asc and, read backwards, desc. NULL
+    # values (zero kcal / zero price) come last either way; the non-NULL and
+    # NULL parts are read separately: an OR across them would turn the index
+    # range into a filter.
+    col = getattr(Product, q.order_by)
+    desc = q.order == "desc"
+
+    def past(cols, cursor):
+        return cols < cursor if desc else cols > cursor
+
+    def ordered(*cols):
+        return [c.desc() if desc else c for c in cols]
+
+    fetch = _fetch_size(q)
+    rows = []
+    if not key or key[0] is not None:
+        head = stmt.where(col.is_not(None))
+        if key:
+            head = head.where(past(tuple_(col, Product.name, Product.id), tuple_(*key)))
+        rows = db.execute(head.order_by(*ordered(col, Product.name, Product.id)).limit(fetch)).mappings().all()
+        if fetch is not None and len(rows) == fetch:
+            return rows
+
+    tail_stmt = stmt.where(col.is_(None))
+    if key and key[0] is None:
+        tail_stmt = tail_stmt.where(past(tuple_(Product.name, Product.id), tuple_(key[1], key[2])))
+    tail_stmt = tail_stmt.order_by(*ordered(Product.name, Product.id))
+    tail_stmt = tail_stmt.limit(None if fetch is None else fetch - len(rows))
+    return [*rows, *db.execute(tail_stmt).mappings().all()]
+
+
+def _list_products(db: Session, q: ProductQuery) -> tuple[List[dict], Optional[str]]:
+    """One page of products as dicts and the cursor of the next page (None on
+    the last one). Pages are read by keyset on (sort column, name, id), so a
+    page costs the same at any depth. A request with neither limit nor cursor
+    gets every matching product, as before paging existed."""
+    fields = list(PRODUCT_FIELDS)
+    if q.fields:
+        wanted = {f.strip() for f in q.fields.split(",") if f.strip()}
+        unknown = wanted.difference(PRODUCT_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        fields = [f for f in PRODUCT_FIELDS if f in wanted or f == "id"]
+    # the cursor needs the sort key even when it is not projected
+    columns = dict.fromkeys([*fields, q.order_by, "name", "id"])
+
+    stmt = select(*(getattr(Product, c) for c in columns))
+    if q.max_cost_per_kcal is not None:
+        stmt = stmt.where(Product.cost_per_kcal <= q.max_cost_per_kcal)
+    if q.min_protein_per_kzt is not None:
+        stmt = stmt.where(Product.protein_per_kzt >= q.min_protein_per_kzt)
+    if q.min_kcal_per_g is not None:
+        stmt = stmt.where(Product.kcal_per_g >= q.min_kcal_per_g)
+    if q.max_kcal_per_g is not None:
+        stmt = stmt.where(Product.kcal_per_g <= q.max_kcal_per_g)
+    if q.min_kcal is not None:
+        stmt = stmt.where(Product.kcal_per_100g >= q.min_kcal)
+    if q.max_kcal is not None:
+        stmt = stmt.where(Product.kcal_per_100g <= q.max_kcal)
+    if q.min_price is not None:
+        stmt = stmt.where(Product.price_kzt_per_100g >= q.min_price)
+    if q.max_price is not None:
+        stmt = stmt.where(Product.price_kzt_per_100g <= q.max_price)
+
+    key = None
+    if q.cursor:
+        key = _decode_cursor(q)
+        q = replace(q, limit=q.limit or PAGE_DEFAULT)
+    page = _page_by_name if q.order_by == "name" else _page_by_metric
+    rows = page(db, stmt, q, key)
+    next_cursor = _encode_cursor(q, rows[q.limit - 1]) if q.limit and len(rows) > q.limit else None
+    return [{f: r[f] for f in fields} for r in rows[: q.limit]], next_cursor
+
+
+# pg mode: pg_trgm word similarity, the typeahead flavour (query vs. any
+# part of the name); served by ix_products_name_trgm
+PG_SEARCH_SQL = text("""
+    SELECT id, name, kcal_per_100g, protein_per_100g, fat_per_100g, carbs_per_100g,
+           price_kzt_per_100g, word_similarity(:q, name) AS score
+    FROM products
+    WHERE :q <% name
+    ORDER BY score DESC, name
+    LIMIT :limit
+""")
+
+
+def _search_products(
+    db: Session, q: str, limit: int = 10, mode: Literal["memory", "pg"] = "memory", min_score: float = MIN_SCORE
+) -> List[ProductSearchHit]:
+    if mode == "pg":
+        try:
+            db.execute(
+                text("SELECT set_config('pg_trgm.word_similarity_threshold', :t, true)"), {"t": str(min_score)}
+            )
+            rows = db.execute(PG_SEARCH_SQL, {"q": q, "limit": limit}).mappings().all()
+        except ProgrammingError:
+            db.rollback()
+            raise HTTPException(status_code=501, detail="pg_trgm is not installed, use mode=memory")
+        return [ProductSearchHit(**r) for r in rows]
+
+    catalog = get_catalog(db)
+    index = run_cpu_bound(get_search_index, catalog)
+    if index is None:
+        raise HTTPException(status_code=503, detail="Search index is being built", headers={"Retry-After": "5"})
+    hits = run_cpu_bound(index.search, q, limit=limit, min_score=min_score)
+    out = []
+    for pid, score in hits:
+        # the index can be a version ahead of or behind this snapshot
+        p = catalog.get_by_id(pid)
+        if p is None:
             continue
-        db.add(Product(**item.model_dump()))
-        inserted += 1
+        out.append(ProductSearchHit(score=score, **{f: getattr(p, f) for f in ProductSearchHit.model_fields if f != "score"}))
+    return out
 
-    db.commit()
-    return SeedResult(total=len(items), inserted=inserted, skipped=skipped)
 
+def _catalog_validators(version: CatalogVersion) -> dict:
+    # every product response of one catalog version is built from the same
+    # data, so the version is a strong validator for all of them; no-cache
+    # makes clients revalidate instead of guessing a freshness lifetime
+    headers = {"ETag": f'"{version.version}"', "Cache-Control": "no-cache"}
+    if version.updated_at is not None:
+        headers["Last-Modified"] = format_datetime(version.updated_at.astimezone(dt.timezone.utc), usegmt=True)
+    return headers
 
-@router.get("", response_model=List[ProductOut])
-def list_products(db: Session = Depends(get_db)):
-    rows = db.execute(select(Product).order_by(Product.name)).scalars().all()
+
+def _not_modified(request: Request, version: CatalogVersion) -> Optional[Response]:
+    """304 when the client's copy is of this catalog version (If-None-Match,
+    else If-Modified-Since), None when the response has to be built."""
+    headers = _catalog_validators(version)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        fresh = "*" in tags or headers["ETag"] in tags
+    else:
+        try:
+            since = parsedate_to_datetime(request.headers.get("if-modified-since", ""))
+        except (TypeError, ValueError):
+            since = None
+        fresh = (
+            since is not None
+            and since.tzinfo is not None
+            and version.updated_at is not None
+            and version.updated_at.replace(microsecond=0) <= since
+        )
+    return Response(status_code=304, headers=headers) if fresh else None
+
+
+def _get_product(db: Session, product_id: uuid.UUID) -> dict:
+    p = get_catalog(db).get_by_id(product_id)
+    if p is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return p._asdict()
+
+
+def _products_page(
+    q: ProductQuery, rows: List[dict], next_cursor: Optional[str], response: Response, headers: dict
+):
+    headers = {**headers, "X-Next-Cursor": next_cursor} if next_cursor else headers
+    if q.fields:
+        # partial objects don't fit ProductOut, skip response_model validation
+        return JSONResponse(jsonable_encoder(rows), headers=headers)
+    response.headers.update(headers)
     return rows
 
+
 @router.post("", response_model=ProductOut)
 def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
-    # простая защита от дублей по имени
-    existing = db.execute(select(Product).where(Product.name == payload.name)).scalar_one_or_none()
-    if existing:
-        raise HTTPException(status_code=409, detail="Product with this name already exists")
-
-    obj = Product(**payload.model_dump())
-    db.add(obj)
-    db.commit()
-    db.refresh(obj)
-    return obj
+    return _create_product(db, payload)
 
 
 @router.post("/bulk", response_model=List[ProductOut])
 def create_products_bulk(payload: List[ProductCreate], db: Session = Depends(get_db)):
-    created = []
-    for item in payload:
-        existing = db.execute(select(Product).where(Product.name == item.name)).scalar_one_or_none()
-        if existing:
-            continue  # пропускаем дубли
+    return _create_products_bulk(db, payload)
 
-        obj = Product(**item.model_dump())
-        db.add(obj)
-        created.append(obj)
 
-    db.commit()
-    for obj in created:
-        db.refresh(obj)
-    return created
+@router.post("/upsert", response_model=SeedResult)
+def upsert_products(
+    payload: List[ProductCreate],
+    on_conflict: Literal["skip", "update"] = "skip",
+    db: Session = Depends(get_db),
+):
+    return _upsert_products(db, payload, update=on_conflict == "update")[1]
+
+
+def _request_chunks(request: Request) -> Iterator[bytes]:
+    # runs in a worker thread: pull the body from the event loop chunk by chunk
+    stream = request.stream()
+
+    async def next_chunk():
+        return await anext(stream, None)
+
+    while (chunk := anyio.from_thread.run(next_chunk)) is not None:
+        if chunk:
+            yield chunk
+
+
+def _run_import(request: Request, fmt: ImportFormat, update: bool, batch_size: int) -> ImportResult:
+    stats = import_products(
+        _request_chunks(request),
+        fmt,
+        update=update,
+        batch_size=batch_size,
+        progress=lambda s: logger.info("product import progress: %s", s.as_dict()),
+    )
+    logger.info("product import done: %s", stats.as_dict())
+    return ImportResult(**stats.as_dict())
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_products_stream(
+    request: Request,
+    format: Optional[ImportFormat] = Query(None, description="default: from Content-Type, else csv"),
+    on_conflict: Literal["skip", "update"] = "skip",
+    batch_size: int = Query(BATCH_SIZE, ge=100, le=100_000),
+):
+    """Raw CSV / NDJSON request body, streamed: the body is never held in
+    memory as a whole (see app/catalog/importer.py)."""
+    # async so the body can be streamed; the import itself runs in a thread
+    fmt = format or ("ndjson" if "ndjson" in request.headers.get("content-type", "") else "csv")
+    return await anyio.to_thread.run_sync(_run_import, request, fmt, on_conflict == "update", batch_size)
+
+
+@router.post("/seed", response_model=SeedResult)
+def seed_products(db: Session = Depends(get_db)):
+    return _seed_products(db)
 
 
 @router.get("", response_model=List[ProductOut])
-def list_products(db: Session = Depends(get_db)):
-    rows = db.execute(select(Product).order_by(Product.name)).scalars().all()
-    return rows
+def list_products(request: Request, response: Response, q: ProductQuery = Depends(), db: Session = Depends(get_db)):
+    # revalidation is answered from the cached catalog version; the session
+    # only connects once a query runs
+    version = catalog_version(db)
+    if (not_modified := _not_modified(request, version)) is not None:
+        return not_modified
+    rows, next_cursor = _list_products(db, q)
+    return _products_page(q, rows, next_cursor, response, _catalog_validators(version))
+
+
+@router.get("/search", response_model=List[ProductSearchHit])
+def search_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=MAX_RESULTS),
+    mode: Literal["memory", "pg"] = "memory",
+    min_score: float = Query(MIN_SCORE, gt=0, le=1),
+    db: Session = Depends(get_db),
+):
+    """Fuzzy name search for typeahead, best match first."""
+    return _search_products(db, q, limit, mode, min_score)
+
+
+# declared last, so /search and other literal paths match first
+@router.get("/{product_id}", response_model=ProductOut)
+def get_product(product_id: uuid.UUID, request: Request, response: Response, db: Session = Depends(get_db)):
+    # a 304 costs no query while the cached version is fresh
+    # (CATALOG_VERSION_TTL_SECONDS); after that one catalog_meta read, plus
+    # a snapshot reload if the version moved. Existence is checked first
+    # against the cached snapshot, so a gone id can't get a 304.
+    version = catalog_version(db)
+    product = _get_product(db, product_id)
+    if (not_modified := _not_modified(request, version)) is not None:
+        return not_modified
+    response.headers.update(_catalog_validators(version))
+    return product
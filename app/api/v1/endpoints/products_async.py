@@ -0,0 +1,95 @@
+import uuid
+from typing import List, Literal
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.infrastructure.async_session import get_async_db
+from app.catalog.search import MAX_RESULTS, MIN_SCORE
+from app.catalog.snapshot import catalog_version, peek_catalog_version
+from app.schemas.products import ProductCreate, ProductOut, ProductSearchHit
+from app.api.v1.endpoints.products import (
+    ImportResult,
+    ProductQuery,
+    SeedResult,
+    _catalog_validators,
+    _create_product,
+    _create_products_bulk,
+    _get_product,
+    _list_products,
+    _not_modified,
+    _products_page,
+    _search_products,
+    _seed_products,
+    _upsert_products,
+    import_products_stream,
+)
+
+# Same handlers as products.py; the sync helpers run on the AsyncSession's
+# connection through run_sync, so no threadpool thread is held while they
+# wait on the database. Snapshot and search index work inside them goes
+# through run_cpu_bound and leaves the event loop.
+router = APIRouter(prefix="/products", tags=["products"])
+
+
+@router.post("", response_model=ProductOut)
+async def create_product(payload: ProductCreate, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(_create_product, payload)
+
+
+@router.post("/bulk", response_model=List[ProductOut])
+async def create_products_bulk(payload: List[ProductCreate], db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(_create_products_bulk, payload)
+
+
+@router.post("/upsert", response_model=SeedResult)
+async def upsert_products(
+    payload: List[ProductCreate],
+    on_conflict: Literal["skip", "update"] = "skip",
+    db: AsyncSession = Depends(get_async_db),
+):
+    result = await db.run_sync(_upsert_products, payload, on_conflict == "update")
+    return result[1]
+
+
+@router.post("/seed", response_model=SeedResult)
+async def seed_products(db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(_seed_products)
+
+
+@router.get("", response_model=List[ProductOut])
+async def list_products(
+    request: Request, response: Response, q: ProductQuery = Depends(), db: AsyncSession = Depends(get_async_db)
+):
+    version = peek_catalog_version() or await db.run_sync(catalog_version)
+    if (not_modified := _not_modified(request, version)) is not None:
+        return not_modified
+    rows, next_cursor = await db.run_sync(_list_products, q)
+    return _products_page(q, rows, next_cursor, response, _catalog_validators(version))
+
+
+@router.get("/search", response_model=List[ProductSearchHit])
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=MAX_RESULTS),
+    mode: Literal["memory", "pg"] = "memory",
+    min_score: float = Query(MIN_SCORE, gt=0, le=1),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await db.run_sync(_search_products, q, limit, mode, min_score)
+
+
+# already async: streams the body and runs the import in a worker thread
+router.post("/import", response_model=ImportResult)(import_products_stream)
+
+
+@router.get("/{product_id}", response_model=ProductOut)
+async def get_product(
+    product_id: uuid.UUID, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)
+):
+    version = peek_catalog_version() or await db.run_sync(catalog_version)
+    product = await db.run_sync(_get_product, product_id)
+    if (not_modified := _not_modified(request, version)) is not None:
+        return not_modified
+    response.headers.update(_catalog_validators(version))
+    return product
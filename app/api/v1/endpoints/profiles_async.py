@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from app.infrastructure.async_session import get_async_db
+from app.infrastructure.models import Profile, User
+from app.schemas.profiles import ProfileCreate, ProfileOut, ProfileUpdate
+from app.auth.deps import get_current_user_async
+
+router = APIRouter(prefix="/profiles", tags=["profiles"])
+
+
+async def _get_profile(db: AsyncSession, user_id) -> Profile | None:
+    return (await db.execute(select(Profile).where(Profile.user_id == user_id))).scalar_one_or_none()
+
+
+@router.get("/me", response_model=ProfileOut)
+async def get_my_profile(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    profile = await _get_profile(db, current_user.id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    return profile
+
+
+@router.post("/me", response_model=ProfileOut, status_code=201)
+async def create_my_profile(
+    payload: ProfileCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    if await _get_profile(db, current_user.id):
+        raise HTTPException(status_code=409, detail="Profile already exists")
+
+    profile = Profile(user_id=current_user.id, **payload.model_dump())
+    db.add(profile)
+    await db.commit()
+    await db.refresh(profile)
+    return profile
+
+
+@router.put("/me", response_model=ProfileOut)
+async def update_my_profile(
+    payload: ProfileUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    profile = await _get_profile(db, current_user.id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    data = payload.model_dump(exclude_unset=True)
+    for k, v in data.items():
+        setattr(profile, k, v)
+
+    await db.commit()
+    await db.refresh(profile)
+    return profile
@@ -1,14 +1,20 @@
+import os
+import secrets
+
 from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.security import APIKeyHeader, HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from jose import JWTError
 
 from app.infrastructure.session import get_db
+from app.infrastructure.async_session import get_async_db
 from app.infrastructure.models import User
 from app.auth.security import decode_access_token
 
 bearer = HTTPBearer(auto_error=False)
+admin_key = APIKeyHeader(name="X-Admin-Key", auto_error=False)
 
 def get_current_user(
     cred: HTTPAuthorizationCredentials | None = Depends(bearer),
@@ -28,3 +34,28 @@ def get_current_user(
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
 
     return user
+
+
+async def get_current_user_async(
+    cred: HTTPAuthorizationCredentials | None = Depends(bearer),
+    db: AsyncSession = Depends(get_async_db),
+) -> User:
+    if cred is None or not cred.credentials:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+
+    try:
+        user_id = decode_access_token(cred.credentials)
+    except JWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    user = (await db.execute(select(User).where(User.id == user_id))).scalar_one_or_none()
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+
+    return user
+
+
+def require_admin(key: str | None = Depends(admin_key)) -> None:
+    expected = os.getenv("ADMIN_API_KEY")
+    if not expected or not key or not secrets.compare_digest(key, expected):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin key required")
@@ -0,0 +1,285 @@
+"""Streaming product import from CSV or NDJSON.
+
+    python -m app.catalog.importer prices.csv
+    python -m app.catalog.importer prices.ndjson --update --batch-size 20000
+    zcat prices.csv.gz | python -m app.catalog.importer - --format csv
+
+The input is read as a stream of byte chunks and parsed lazily; every
+batch_size records are validated against ProductCreate, COPY'd into a
+temporary staging table and merged into products with one
+INSERT ... SELECT ... ON CONFLICT (name). Each batch commits on its own, so
+memory stays at one batch whatever the file size and a failed import can
+simply be re-run. CSV needs a header row with the ProductCreate field names;
+other columns are ignored.
+"""
+import argparse
+import codecs
+import csv
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Literal
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import Engine
+
+from app.catalog.search import patch_search_index
+from app.catalog.snapshot import BUMP_VERSION_SQL, CatalogVersion, invalidate_catalog
+from app.infrastructure.db import engine
+from app.schemas.products import ProductCreate
+
+ImportFormat = Literal["csv", "ndjson"]
+
+BATCH_SIZE = 5000
+READ_SIZE = 1 << 16
+MAX_ERRORS = 20  # error messages kept for the report; all are counted
+
+COLUMNS = tuple(ProductCreate.model_fields)
+_validator = TypeAdapter(list[ProductCreate])
+
+# numeric(10, 2) like products, so unchanged prices compare equal on merge
+STAGING_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS product_import (
+        seq bigint,
+        name varchar(255),
+        kcal_per_100g integer,
+        protein_per_100g numeric(10, 2),
+        fat_per_100g numeric(10, 2),
+        carbs_per_100g numeric(10, 2),
+        price_kzt_per_100g numeric(10, 2)
+    ) ON COMMIT DELETE ROWS
+"""
+_cols = ", ".join(COLUMNS)
+_changed = [c for c in COLUMNS if c != "name"]
+# a name repeated in one batch is taken once: first row when skipping,
+# last row when updating (later prices win)
+MERGE_SQL = """
+    WITH src AS (
+        SELECT DISTINCT ON (name) {cols} FROM product_import ORDER BY name, seq {seq_order}
+    ), merged AS (
+        INSERT INTO products (id, {cols})
+        SELECT gen_random_uuid(), {cols} FROM src
+        ON CONFLICT (name) {action}
+        RETURNING id, name, xmax = 0 AS inserted
+    )
+    SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted),
+           array_agg(id) FILTER (WHERE inserted), array_agg(name) FILTER (WHERE inserted)
+    FROM merged
+"""
+SKIP_SQL = MERGE_SQL.format(cols=_cols, seq_order="", action="DO NOTHING")
+UPDATE_SQL = MERGE_SQL.format(
+    cols=_cols,
+    seq_order="DESC",
+    action="DO UPDATE SET {set} WHERE ({old}) IS DISTINCT FROM ({new})".format(
+        set=", ".join(f"{c} = EXCLUDED.{c}" for c in _changed),
+        old=", ".join(f"products.{c}" for c in _changed),
+        new=", ".join(f"EXCLUDED.{c}" for c in _changed),
+    ),
+)
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    invalid: int = 0
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    batches: int = 0
+    errors: list[str] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def error(self, line: int, message: str) -> None:
+        self.invalid += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"line {line}: {message}")
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "invalid": self.invalid,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "batches": self.batches,
+            "elapsed_s": round(self.elapsed, 3),
+            "rows_per_sec": round(self.rows_per_sec, 1),
+            "errors": list(self.errors),
+        }
+
+
+# -------------------------
+# parsing
+# -------------------------
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """UTF-8 lines (with their line endings) from arbitrary byte chunks.
+
+    Lines end at LF only, like a file opened with newline="": a CR stays
+    with its line (csv and json both accept it), also when a CRLF pair is
+    split across chunks, and the other characters str.splitlines() breaks
+    on (form feed, U+2028, ...) stay inside their field.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+    for chunk in chunks:
+        text = tail + decoder.decode(chunk)
+        # the piece after the last \n may be an incomplete line
+        end = text.rfind("\n") + 1
+        tail = text[end:]
+        if end:
+            for line in text[: end - 1].split("\n"):
+                yield line + "\n"
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_records(lines: Iterable[str], fmt: ImportFormat, stats: ImportStats) -> Iterator[tuple[int, dict]]:
+    """(line number, raw record) pairs; unparsable lines are counted as invalid."""
+    if fmt == "ndjson":
+        for n, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            stats.rows += 1
+            try:
+                rec = json.loads(line)
+            except ValueError as e:
+                stats.error(n, f"invalid JSON ({e})")
+                continue
+            if not isinstance(rec, dict):
+                stats.error(n, "expected a JSON object")
+                continue
+            yield n, rec
+        return
+
+    reader = csv.DictReader(lines)
+    for rec in reader:
+        stats.rows += 1
+        # empty cells are missing values, not empty strings
+        yield reader.line_num, {k: v for k, v in rec.items() if k in COLUMNS and v not in ("", None)}
+
+
+def iter_batches(records: Iterable[tuple[int, dict]], size: int, stats: ImportStats) -> Iterator[list[ProductCreate]]:
+    """Validated ProductCreate batches of up to size items."""
+
+    def validate(batch: list[tuple[int, dict]]) -> list[ProductCreate]:
+        try:
+            return _validator.validate_python([rec for _, rec in batch])
+        except ValidationError as e:
+            bad: dict[int, str] = {}
+            for err in e.errors():
+                i, *loc = err["loc"]
+                bad.setdefault(i, f"{'.'.join(map(str, loc)) or 'row'}: {err['msg']}")
+            for i, msg in sorted(bad.items()):
+                stats.error(batch[i][0], msg)
+            return _validator.validate_python([rec for i, (_, rec) in enumerate(batch) if i not in bad])
+
+    batch: list[tuple[int, dict]] = []
+    for item in records:
+        batch.append(item)
+        if len(batch) >= size:
+            yield validate(batch)
+            batch = []
+    if batch:
+        yield validate(batch)
+
+
+# -------------------------
+# loading
+# -------------------------
+def import_products(
+    chunks: Iterable[bytes],
+    fmt: ImportFormat = "csv",
+    update: bool = False,
+    batch_size: int = BATCH_SIZE,
+    progress=None,
+    bind: Engine = engine,
+) -> ImportStats:
+    """Stream chunks into products; see the module docstring."""
+    stats = ImportStats()
+    merge = UPDATE_SQL if update else SKIP_SQL
+    batches = iter_batches(iter_records(iter_lines(chunks), fmt, stats), batch_size, stats)
+
+    raw = bind.raw_connection()
+    try:
+        with raw.cursor() as cur:
+            cur.execute(STAGING_DDL)
+            seq = 0
+            for batch in batches:
+                inserted = updated = 0
+                new_ids = new_names = None
+                if batch:
+                    with cur.copy(f"COPY product_import (seq, {_cols}) FROM STDIN") as copy:
+                        for item in batch:
+                            seq += 1
+                            copy.write_row((seq, *(getattr(item, c) for c in COLUMNS)))
+                    inserted, updated, new_ids, new_names = cur.execute(merge).fetchone()
+                    stats.inserted += inserted
+                    stats.updated += updated
+                    stats.skipped += len(batch) - inserted - updated
+                version = CatalogVersion(*cur.execute(BUMP_VERSION_SQL).fetchone()) if inserted or updated else None
+                raw.commit()  # also empties product_import
+                stats.batches += 1
+                if version:
+                    invalidate_catalog(version)
+                    patch_search_index(version, zip(new_ids or (), new_names or ()))
+                if progress:
+                    progress(stats)
+            cur.execute("DROP TABLE IF EXISTS product_import")
+        raw.commit()
+    finally:
+        raw.close()
+    return stats
+
+
+def read_chunks(f, size: int = READ_SIZE) -> Iterator[bytes]:
+    return iter(lambda: f.read(size), b"")
+
+
+def _print_progress(stats: ImportStats) -> None:
+    s = stats.as_dict()
+    print(
+        f"rows={s['rows']} inserted={s['inserted']} updated={s['updated']} skipped={s['skipped']} "
+        f"invalid={s['invalid']} elapsed={s['elapsed_s']}s ({s['rows_per_sec']} rows/s)",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import products from CSV or NDJSON")
+    parser.add_argument("path", help="file to import, - for stdin")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default=None, help="default: from the file extension")
+    parser.add_argument("--update", action="store_true", help="overwrite products that already exist")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    f = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    try:
+        stats = import_products(
+            read_chunks(f), fmt, update=args.update, batch_size=max(1, args.batch_size), progress=_print_progress
+        )
+    finally:
+        f.close()
+
+    s = stats.as_dict()
+    print(
+        f"done: {s['rows']} rows, {s['inserted']} inserted, {s['updated']} updated, "
+        f"{s['skipped']} skipped, {s['invalid']} invalid in {s['elapsed_s']}s ({s['rows_per_sec']} rows/s)"
+    )
+    for e in s["errors"]:
+        print(e)
+
+
+if __name__ == "__main__":
+    main()
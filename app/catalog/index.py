@@ -0,0 +1,119 @@
+import re
+from functools import cached_property
+from typing import Iterable
+
+import numpy as np
+
+# macro kcal shares (4/9/4 kcal per gram) that put a product into a meal role;
+# first matching rule wins, everything else is "other"
+ROLES = ("protein", "fat", "starch", "produce", "light", "other")
+PROTEIN_SHARE = 0.40
+FAT_SHARE = 0.60
+STARCH_CARB_SHARE = 0.60
+STARCH_MIN_PROTEIN_SHARE = 0.05  # keeps sugar / honey out of the grains
+STARCH_MIN_KCAL = 200
+PRODUCE_MAX_KCAL = 120
+PRODUCE_CARB_SHARE = 0.45
+LIGHT_MAX_KCAL = 120
+LIGHT_PROTEIN_SHARE = 0.15
+
+# protein slots are ranked by grams of protein per tenge, the rest by kcal per tenge
+ROLE_ORDER = {"protein": "protein"}
+
+_NAME_NOISE = re.compile(r"\([^)]*\)|\d+([.,]\d+)?\s*%")
+
+
+def base_name(name: str) -> str:
+    """'Kefir 2.5%' -> 'kefir', 'Oats (dry)' -> 'oats'."""
+    return " ".join(_NAME_NOISE.sub(" ", name).lower().split())
+
+
+def assign_roles(kcal, protein, fat, carbs) -> np.ndarray:
+    kcal = np.asarray(kcal, dtype=np.float64)
+    p = np.asarray(protein, dtype=np.float64) * 4.0
+    f = np.asarray(fat, dtype=np.float64) * 9.0
+    c = np.asarray(carbs, dtype=np.float64) * 4.0
+    macro_kcal = p + f + c
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ps = np.where(macro_kcal > 0, p / macro_kcal, 0.0)
+        fs = np.where(macro_kcal > 0, f / macro_kcal, 0.0)
+        cs = np.where(macro_kcal > 0, c / macro_kcal, 0.0)
+
+    conditions = [
+        ps >= PROTEIN_SHARE,
+        fs >= FAT_SHARE,
+        (cs >= STARCH_CARB_SHARE) & (ps >= STARCH_MIN_PROTEIN_SHARE) & (kcal >= STARCH_MIN_KCAL),
+        (cs >= PRODUCE_CARB_SHARE) & (kcal < PRODUCE_MAX_KCAL),
+        (ps >= LIGHT_PROTEIN_SHARE) & (kcal < LIGHT_MAX_KCAL),
+    ]
+    codes = np.select(conditions, np.arange(len(conditions)), default=len(ROLES) - 1)
+    codes[macro_kcal <= 0] = len(ROLES) - 1
+    return codes.astype(np.int8)
+
+
+class CandidateIndex:
+    """Products bucketed by meal role, each bucket pre-sorted.
+
+    For every role two orders of catalog positions are kept: by cost per kcal
+    (cheapest first, with the sorted values alongside for bisect) and by
+    protein per tenge (best first). Lookups walk a prefix of one order, so a
+    slot is filled in O(k + excluded) regardless of catalog size.
+    """
+
+    def __init__(self, catalog):
+        # catalog: CatalogSnapshot (not imported, it builds this index)
+        self.cost_per_kcal = catalog.cost_per_kcal
+        self.protein_per_kzt = catalog.protein_per_kzt
+        self.roles = assign_roles(catalog.kcal, catalog.protein, catalog.fat, catalog.carbs)
+
+        self.by_cost: dict[str, np.ndarray] = {}
+        self.cost_sorted: dict[str, np.ndarray] = {}
+        self.by_protein: dict[str, np.ndarray] = {}
+        for code, role in enumerate(ROLES):
+            pos = np.flatnonzero(self.roles == code)
+            cost_order = pos[np.argsort(self.cost_per_kcal[pos], kind="stable")]
+            self.by_cost[role] = cost_order
+            self.cost_sorted[role] = self.cost_per_kcal[cost_order]
+            self.by_protein[role] = pos[np.argsort(-self.protein_per_kzt[pos], kind="stable")]
+
+        self._names = catalog.names
+
+    @cached_property
+    def by_base_name(self) -> dict[str, list[int]]:
+        # only needed when a template name is missing, so built on first use
+        out: dict[str, list[int]] = {}
+        for i, name in enumerate(self._names):
+            out.setdefault(base_name(name), []).append(i)
+        return out
+
+    def role_of(self, i: int) -> str:
+        return ROLES[self.roles[i]]
+
+    def top(self, role: str, k: int = 1, exclude: Iterable[int] = (), order: str | None = None) -> list[int]:
+        order = order or ROLE_ORDER.get(role, "cost")
+        ranked = self.by_protein[role] if order == "protein" else self.by_cost[role]
+        skip = set(exclude)
+        out: list[int] = []
+        for i in ranked:
+            i = int(i)
+            if i in skip:
+                continue
+            out.append(i)
+            if len(out) == k:
+                break
+        return out
+
+    def cheaper_than(self, role: str, cost_per_kcal: float) -> np.ndarray:
+        """Positions in role with a strictly lower cost per kcal, cheapest first."""
+        cut = int(np.searchsorted(self.cost_sorted[role], cost_per_kcal, side="left"))
+        return self.by_cost[role][:cut]
+
+    def match_name(self, name: str, role: str | None = None, exclude: Iterable[int] = ()) -> int | None:
+        """Cheapest product whose base name equals name's, preferring role."""
+        skip = set(exclude)
+        hits = [i for i in self.by_base_name.get(base_name(name), ()) if i not in skip]
+        if not hits:
+            return None
+        if role is not None:
+            hits = [i for i in hits if self.role_of(i) == role] or hits
+        return min(hits, key=lambda i: self.cost_per_kcal[i])
@@ -0,0 +1,151 @@
+import logging
+import threading
+import uuid
+
+import numpy as np
+
+from app.catalog.snapshot import CatalogSnapshot, get_catalog
+from app.infrastructure.db import SessionLocal
+
+# fixed per-100g scale so distances do not depend on what else is in the
+# catalog; that is what lets cached neighbour lists survive catalog changes
+SCALE = np.array([900.0, 100.0, 100.0, 100.0], dtype=np.float32)
+K_MAX = 20
+BLOCK = 65536
+# above this many changed products the cache is dropped instead of patched
+MAX_PATCH = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class NutrientNeighbors:
+    """Nearest cheaper products in (kcal, protein, fat, carbs) space.
+
+    Rows are kept sorted by cost per kcal, so "cheaper than product i" is a
+    prefix of the matrix; the first query for a product scans that prefix in
+    BLOCK-row chunks and keeps the K_MAX closest. Results are cached per
+    product id and carried over to the next catalog version (_carry_over).
+
+    Cold costs: a new catalog version sorts the whole catalog on its first
+    lookup (get_neighbors), and each product without a carried-over entry
+    (new, changed, or next to a changed one) pays one O(N) scan. The first
+    build runs at startup (warm_neighbors); scans stay per product, since
+    precomputing every list would be O(N^2).
+    """
+
+    def __init__(self, catalog: CatalogSnapshot, previous: "NutrientNeighbors | None" = None):
+        self.version = catalog.version
+        cpk = catalog.cost_per_kcal
+        self.order = np.argsort(cpk, kind="stable")  # sorted row -> catalog position
+        self.cpk = cpk[self.order]
+        # kcal, protein, fat, carbs, price per 100 g in sorted order
+        self.raw = np.column_stack(
+            [catalog.kcal, catalog.protein, catalog.fat, catalog.carbs, catalog.price]
+        ).astype(np.float64)[self.order]
+        self.vectors = self.raw[:, :4].astype(np.float32) / SCALE
+        self.ids = [catalog.ids[i] for i in self.order]
+        self.row_by_id = {pid: r for r, pid in enumerate(self.ids)}
+
+        self._cache: dict[uuid.UUID, list[tuple[uuid.UUID, float]]] = {}
+        self._lock = threading.Lock()
+        if previous is not None:
+            self._carry_over(previous)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _scan(self, row: int) -> list[tuple[uuid.UUID, float]]:
+        # strictly cheaper rows form the prefix [0, cut)
+        cut = int(np.searchsorted(self.cpk, self.cpk[row], side="left"))
+        q = self.vectors[row]
+        best_d = np.empty(0, dtype=np.float32)
+        best_r = np.empty(0, dtype=np.int64)
+        for start in range(0, cut, BLOCK):
+            diff = self.vectors[start:min(cut, start + BLOCK)] - q
+            d = np.einsum("ij,ij->i", diff, diff)
+            best_d = np.concatenate([best_d, d])
+            best_r = np.concatenate([best_r, np.arange(start, start + len(diff))])
+            if len(best_d) > K_MAX:
+                keep = np.argpartition(best_d, K_MAX - 1)[:K_MAX]
+                best_d, best_r = best_d[keep], best_r[keep]
+        order = np.lexsort((best_r, best_d))
+        return [(self.ids[int(best_r[j])], float(np.sqrt(best_d[j]))) for j in order]
+
+    def cheaper_neighbors(self, product_id: uuid.UUID, k: int = 5) -> list[tuple[int, float]]:
+        """Up to k (catalog position, distance) pairs, closest first, all with
+        a lower cost per kcal than product_id."""
+        row = self.row_by_id.get(product_id)
+        if row is None:
+            return []
+        hits = self._cache.get(product_id)
+        if hits is None:
+            hits = self._scan(row)
+            with self._lock:
+                self._cache[product_id] = hits
+        return [(int(self.order[self.row_by_id[pid]]), d) for pid, d in hits[:k]]
+
+    def _carry_over(self, old: "NutrientNeighbors") -> None:
+        if not old._cache:
+            return
+        old_rows = np.array([old.row_by_id.get(pid, -1) for pid in self.ids], dtype=np.int64)
+        differs = (old_rows < 0) | np.any(self.raw != old.raw[old_rows], axis=1)
+        changed = {self.ids[r] for r in np.flatnonzero(differs)}
+        removed = old.row_by_id.keys() - self.row_by_id.keys()
+        if len(changed) + len(removed) > MAX_PATCH:
+            return
+
+        gone = changed | removed
+        kept = {
+            qid: hits
+            for qid, hits in old._cache.items()
+            if qid not in gone and not any(pid in gone for pid, _ in hits)
+        }
+        if not kept or not changed:
+            self._cache = kept
+            return
+
+        # a changed or new product may now belong in a cached list
+        cand = np.array([self.row_by_id[pid] for pid in changed])
+        for qid, hits in kept.items():
+            row = self.row_by_id[qid]
+            ok = cand[self.cpk[cand] < self.cpk[row]]
+            if not len(ok):
+                continue
+            d = np.sqrt(((self.vectors[ok] - self.vectors[row]) ** 2).sum(axis=1))
+            limit = hits[-1][1] if len(hits) >= K_MAX else np.inf
+            extra = [(self.ids[int(r)], float(x)) for r, x in zip(ok, d) if x < limit]
+            if extra:
+                kept[qid] = sorted(hits + extra, key=lambda h: (h[1], self.row_by_id[h[0]]))[:K_MAX]
+        self._cache = kept
+
+
+_lock = threading.Lock()
+_current: NutrientNeighbors | None = None
+
+
+def get_neighbors(catalog: CatalogSnapshot) -> NutrientNeighbors:
+    global _current
+    cur = _current
+    if cur is not None and cur.version == catalog.version:
+        return cur
+
+    with _lock:
+        if _current is not None and _current.version > catalog.version:
+            # a request still holding an older snapshot; don't replace the newer one
+            return NutrientNeighbors(catalog)
+        if _current is None or _current.version != catalog.version:
+            _current = NutrientNeighbors(catalog, _current)
+        return _current
+
+
+def warm_neighbors() -> None:
+    """Build the current instance in the background from a fresh catalog (at startup)."""
+    threading.Thread(target=_warm, name="neighbors", daemon=True).start()
+
+
+def _warm() -> None:
+    try:
+        with SessionLocal() as db:
+            get_neighbors(get_catalog(db))
+    except Exception:
+        logger.exception("nutrient neighbors build failed")
@@ -0,0 +1,307 @@
+import bisect
+import copy
+import logging
+import os
+import re
+import threading
+import uuid
+from typing import Iterable
+
+import numpy as np
+
+from app.catalog.snapshot import CatalogSnapshot, CatalogVersion, get_catalog
+from app.infrastructure.db import SessionLocal
+
+# a hit must share at least this share of the query's trigrams (pg_trgm's
+# default similarity threshold)
+MIN_SCORE = 0.3
+MAX_RESULTS = 50
+# once this share of the docs are dead (deleted or renamed) the next search
+# schedules a rebuild
+MAX_DEAD_SHARE = 0.25
+# how long a search waits for the first index build before answering 503
+SEARCH_INDEX_WAIT_SECONDS = float(os.getenv("SEARCH_INDEX_WAIT_SECONDS", "2"))
+# queries whose rare posting lists hold more than 1/SPARSE_SHARE of the
+# docs are counted with one dense bincount instead
+SPARSE_SHARE = 8
+# trigrams in at least 1/BITSET_SHARE of the docs also get a bitset, for
+# O(1) membership tests while counting sparse candidates
+BITSET_SHARE = 64
+
+_WORD = re.compile(r"\w+")
+
+logger = logging.getLogger(__name__)
+
+
+def trigrams(text: str, prefix: bool = False) -> set[str]:
+    """pg_trgm style trigrams: lower-cased words padded with two spaces in
+    front and one behind. With prefix=True the last word is treated as
+    unfinished (typeahead) and gets no trailing pad."""
+    words = _WORD.findall(text.lower())
+    out: set[str] = set()
+    for n, w in enumerate(words):
+        padded = "  " + w if prefix and n == len(words) - 1 else "  " + w + " "
+        out.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return out
+
+
+class TrigramIndex:
+    """Inverted index trigram -> sorted doc numbers over product names.
+
+    Docs are numbered in insertion order and never renumbered, so writes
+    after the build are patched in (patched()) instead of rebuilding: new or
+    renamed products are appended, deleted ones only marked dead. patched()
+    returns a new index; posting arrays are replaced, never mutated, so
+    requests still reading the previous index are unaffected.
+    """
+
+    def __init__(self, catalog: CatalogSnapshot):
+        self.version = catalog.version
+        self.ids: list[uuid.UUID] = list(catalog.ids)
+        self.names: list[str] = list(catalog.names)
+        self.doc_of: dict[uuid.UUID, int] = {pid: d for d, pid in enumerate(self.ids)}
+        self.dead = np.empty(0, dtype=np.int64)  # docs of deleted / renamed products
+        self.sizes = np.zeros(len(self.ids), dtype=np.int32)
+        postings: dict[str, list[int]] = {}
+        for d, name in enumerate(self.names):
+            grams = trigrams(name)
+            self.sizes[d] = len(grams)
+            for t in grams:
+                postings.setdefault(t, []).append(d)
+        self.postings = {t: np.array(docs, dtype=np.int32) for t, docs in postings.items()}
+        self.bits = {t: self._bitset(p) for t, p in self.postings.items() if self._wants_bitset(p)}
+        # docs by name, and doc -> rank in that order, for ties
+        self.order = np.array(sorted(range(len(self.names)), key=self.names.__getitem__), dtype=np.int64)
+        self.pos = self._ranks(self.order)
+
+    def __len__(self) -> int:
+        return len(self.doc_of)
+
+    @staticmethod
+    def _ranks(order: np.ndarray) -> np.ndarray:
+        pos = np.empty(len(order), dtype=np.int64)
+        pos[order] = np.arange(len(order))
+        return pos
+
+    def patched(
+        self,
+        version: int,
+        upserted: Iterable[tuple[uuid.UUID, str]] = (),
+        removed: Iterable[uuid.UUID] = (),
+    ) -> "TrigramIndex":
+        """A copy at `version` with the upserted (id, name) pairs indexed and
+        the removed ids dropped. Costs the changed names' trigrams plus a few
+        array copies, not a diff of the catalog. Products indexed under the
+        same name are left alone."""
+        new = copy.copy(self)
+        new.version = version
+        upserted = dict(upserted)
+        added = [
+            (pid, name)
+            for pid, name in upserted.items()
+            if (d := self.doc_of.get(pid)) is None or self.names[d] != name
+        ]
+        gone = [pid for pid, _ in added if pid in self.doc_of]
+        gone += [pid for pid in set(removed) if pid in self.doc_of and pid not in upserted]
+        if not added and not gone:
+            return new
+
+        new.doc_of = dict(self.doc_of)
+        if gone:
+            new.dead = np.concatenate([self.dead, np.array([new.doc_of.pop(pid) for pid in gone], dtype=np.int64)])
+        if not added:
+            return new
+
+        start = len(self.ids)
+        new.ids = self.ids + [pid for pid, _ in added]
+        new.names = self.names + [name for _, name in added]
+        new.sizes = np.concatenate([self.sizes, np.zeros(len(added), dtype=np.int32)])
+
+        extra: dict[str, list[int]] = {}
+        for d, (pid, name) in enumerate(added, start=start):
+            new.doc_of[pid] = d
+            grams = trigrams(name)
+            new.sizes[d] = len(grams)
+            for t in grams:
+                extra.setdefault(t, []).append(d)
+        new.postings = dict(self.postings)
+        new.bits = dict(self.bits)
+        for t, docs in extra.items():
+            prev = new.postings.get(t)
+            arr = np.array(docs, dtype=np.int32)
+            new.postings[t] = arr if prev is None else np.concatenate([prev, arr])
+            if t in new.bits or new._wants_bitset(new.postings[t]):
+                new.bits[t] = new._bitset(new.postings[t])
+
+        # slot the new docs into the name order
+        docs = sorted(range(start, len(new.ids)), key=new.names.__getitem__)
+        at = [bisect.bisect_left(self.order, new.names[d], key=self.names.__getitem__) for d in docs]
+        new.order = np.insert(self.order, at, docs)
+        new.pos = self._ranks(new.order)
+        return new
+
+    def _wants_bitset(self, docs: np.ndarray) -> bool:
+        return len(docs) >= max(64, len(self.ids) // BITSET_SHARE)
+
+    def _bitset(self, docs: np.ndarray) -> np.ndarray:
+        flags = np.zeros(len(self.ids), dtype=bool)
+        flags[docs] = True
+        return np.packbits(flags, bitorder="little")
+
+    def _contains(self, t: str, docs: np.ndarray) -> np.ndarray:
+        """Which of the (sorted) docs have trigram t."""
+        bits = self.bits.get(t)
+        if bits is None:
+            common = self.postings[t]
+            at = np.searchsorted(common, docs).clip(max=len(common) - 1)
+            return common[at] == docs
+        # docs past the end of the bitset were appended later without t
+        # (appending one with t rebuilds it)
+        out = np.zeros(len(docs), dtype=bool)
+        inside = docs < len(bits) * 8
+        d = docs[inside]
+        out[inside] = (bits[d >> 3] >> (d & 7)) & 1
+        return out
+
+    def search(self, q: str, limit: int = 10, min_score: float = MIN_SCORE) -> list[tuple[uuid.UUID, float]]:
+        """(product id, score) best first. score is the share of the query's
+        trigrams found in the name; ties go to the name with fewer trigrams
+        (higher trigram similarity), then to name order."""
+        grams = trigrams(q, prefix=True)
+        found_grams = sorted((t for t in grams if t in self.postings), key=lambda t: len(self.postings[t]))
+        if not found_grams:
+            return []
+        m = len(grams)
+        need = max(1, int(np.ceil(min_score * m - 1e-9)))
+
+        found = self._count_sparse(found_grams, need, limit)
+        if found is None:
+            lists = [self.postings[t] for t in found_grams]
+            shared = np.bincount(np.concatenate(lists), minlength=len(self.ids))
+            shared[self.dead] = 0
+            cand = np.flatnonzero(shared >= need)
+            found = cand, shared[cand]
+        cand, s = found
+        if not len(cand):
+            return []
+
+        key = (m - s) * 65536 + self.sizes[cand]  # ascending is best first
+        if len(cand) > limit:
+            kth = np.partition(key, limit - 1)[limit - 1]
+            better = np.flatnonzero(key < kth)
+            ties = np.flatnonzero(key == kth)
+            rest = limit - len(better)
+            if len(ties) > rest:
+                ties = ties[np.argpartition(self.pos[cand[ties]], rest - 1)[:rest]]
+            keep = np.concatenate([better, ties])
+            cand, s, key = cand[keep], s[keep], key[keep]
+        order = np.lexsort((self.pos[cand], key))
+        return [(self.ids[cand[j]], round(float(s[j]) / m, 4)) for j in order]
+
+    def _count_sparse(self, grams: list[str], need: int, limit: int):
+        """(docs, shared trigrams) for every doc that can make the result,
+        touching only the rarest posting lists in full.
+
+        A doc in none of the r rarest lists shares at most len(lists) - r
+        trigrams. Docs from those r lists are counted exactly (the common
+        lists by bitset or binary search); once `limit` of them beat that bound, or it
+        drops below need, no other doc can rank. None when the rare lists
+        are too long for this to beat one dense bincount."""
+        lists = [self.postings[t] for t in grams]
+        budget = len(self.ids) // SPARSE_SHARE
+        total = 0
+        for r in range(1, len(lists) - need + 2):
+            total += len(lists[r - 1])
+            if total > budget:
+                return None
+            docs, s = np.unique(np.concatenate(lists[:r]), return_counts=True)
+            for t in grams[r:]:
+                s += self._contains(t, docs)
+            if len(self.dead):
+                s[np.isin(docs, self.dead)] = 0
+            bound = len(lists) - r
+            if bound < need or np.count_nonzero(s > bound) >= limit:
+                keep = s >= max(need, bound + 1)
+                return docs[keep], s[keep]
+        return None
+
+
+_lock = threading.Lock()
+_current: TrigramIndex | None = None
+_building = False
+_ready = threading.Event()
+
+
+def get_search_index(catalog: CatalogSnapshot, wait: float = SEARCH_INDEX_WAIT_SECONDS) -> TrigramIndex | None:
+    """The current index; None if none has been built yet within `wait`
+    seconds.
+
+    Builds take long on a large catalog and never run on the request path:
+    a missing or outdated index (writes made by another process) is rebuilt
+    in a background thread while searches keep using the current one. The
+    index may therefore be older or newer than `catalog`; look the hits up
+    there and skip ids it doesn't have.
+    """
+    cur = _current
+    if cur is None or cur.version < catalog.version:
+        _start_build(catalog)
+    if cur is None and _ready.wait(wait):
+        cur = _current
+    return cur
+
+
+def warm_search_index() -> None:
+    """Build the index in the background from a fresh catalog (at startup)."""
+    _start_build(None)
+
+
+def patch_search_index(
+    version: CatalogVersion,
+    upserted: Iterable[tuple[uuid.UUID, str]] = (),
+    removed: Iterable[uuid.UUID] = (),
+) -> None:
+    """Call after a committed write to products with its bumped version, the
+    (id, name) pairs it created or renamed and the ids it deleted.
+
+    When another write's version is missing in between (made by another
+    process, or a concurrent one not patched in yet), or too many docs are
+    dead, the write is patched in but the index keeps its version, so the
+    next search schedules a rebuild.
+    """
+    global _current
+    with _lock:
+        cur = _current
+        if cur is None or cur.version >= version.version:
+            return  # the build in progress or done already reads this write
+        new = cur.patched(version.version, upserted, removed)
+        if cur.version != version.version - 1 or len(new.dead) > MAX_DEAD_SHARE * len(new.ids):
+            new.version = cur.version
+        _current = new
+
+
+def _start_build(catalog: CatalogSnapshot | None) -> None:
+    global _building
+    with _lock:
+        # one build at a time; a search after it finishes starts the next
+        if _building or (_current is not None and catalog is not None and _current.version >= catalog.version):
+            return
+        _building = True
+    threading.Thread(target=_build, args=(catalog,), name="search-index", daemon=True).start()
+
+
+def _build(catalog: CatalogSnapshot | None) -> None:
+    global _current, _building
+    try:
+        if catalog is None:
+            with SessionLocal() as db:
+                catalog = get_catalog(db)
+        index = TrigramIndex(catalog)
+        with _lock:
+            if _current is None or _current.version < index.version:
+                _current = index
+        _ready.set()
+    except Exception:
+        logger.exception("search index build failed")
+    finally:
+        with _lock:
+            _building = False
@@ -0,0 +1,200 @@
+import datetime as dt
+import os
+import threading
+import time
+import uuid
+from functools import cached_property
+from typing import NamedTuple
+
+import numpy as np
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from app.catalog.index import CandidateIndex
+from app.infrastructure.models import CatalogMeta, Product
+from app.infrastructure.offload import run_cpu_bound
+
+# how long a process trusts its last known catalog version before reading it
+# again, i.e. how late it sees writes made by other processes
+CATALOG_VERSION_TTL_SECONDS = float(os.getenv("CATALOG_VERSION_TTL_SECONDS", "1"))
+
+# upsert, so a database created with create_all (no migration row) works too
+BUMP_VERSION_SQL = """
+    INSERT INTO catalog_meta (id, version, updated_at) VALUES (1, 1, now())
+    ON CONFLICT (id) DO UPDATE SET version = catalog_meta.version + 1, updated_at = now()
+    RETURNING version, updated_at
+"""
+
+
+class CatalogVersion(NamedTuple):
+    version: int
+    updated_at: dt.datetime | None  # None before the first write
+
+
+class CatalogProduct(NamedTuple):
+    id: uuid.UUID
+    name: str
+    kcal_per_100g: int
+    protein_per_100g: float
+    fat_per_100g: float
+    carbs_per_100g: float
+    price_kzt_per_100g: float
+    cost_per_kcal: float | None = None
+    kcal_per_g: float | None = None
+    protein_per_kzt: float | None = None
+
+
+# cost_per_kcal for products without kcal (NULL in the database), same as the fitter
+NO_KCAL_COST = 10**9
+
+
+def _derived_or(rows, col: int, computed: np.ndarray, null) -> np.ndarray:
+    # derived columns come from the database when the rows carry them
+    # (_load); hand-built rows (batch workers, benchmarks) get them computed
+    if not rows or len(rows[0]) <= col:
+        return computed
+    return np.array([null if r[col] is None else float(r[col]) for r in rows], dtype=np.float64)
+
+
+class CatalogSnapshot:
+    """Read-only copy of the products table.
+
+    Nutrients and prices are stored column-wise in NumPy arrays; rows are
+    addressed by position and looked up by id or name through dicts.
+    """
+
+    def __init__(self, version: int, rows):
+        self.version = version
+        self.ids: list[uuid.UUID] = [r[0] for r in rows]
+        self.names: list[str] = [r[1] for r in rows]
+        self.kcal = np.array([r[2] or 0 for r in rows], dtype=np.int64)
+        self.protein = np.array([float(r[3] or 0) for r in rows], dtype=np.float64)
+        self.fat = np.array([float(r[4] or 0) for r in rows], dtype=np.float64)
+        self.carbs = np.array([float(r[5] or 0) for r in rows], dtype=np.float64)
+        self.price = np.array([float(r[6] or 0) for r in rows], dtype=np.float64)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.cost_per_kcal = _derived_or(
+                rows, 7, np.where(self.kcal > 0, self.price / self.kcal, NO_KCAL_COST), NO_KCAL_COST
+            )
+            self.kcal_per_g = _derived_or(rows, 8, self.kcal / 100, 0.0)
+            self.protein_per_kzt = _derived_or(
+                rows, 9, np.where(self.price > 0, self.protein / self.price, 0.0), 0.0
+            )
+
+        self.by_id: dict[uuid.UUID, int] = {pid: i for i, pid in enumerate(self.ids)}
+        self.by_name: dict[str, int] = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @cached_property
+    def index(self) -> CandidateIndex:
+        # built on first use; a new catalog version gets a new snapshot
+        return CandidateIndex(self)
+
+    def product(self, i: int) -> CatalogProduct:
+        return CatalogProduct(
+            id=self.ids[i],
+            name=self.names[i],
+            kcal_per_100g=int(self.kcal[i]),
+            protein_per_100g=float(self.protein[i]),
+            fat_per_100g=float(self.fat[i]),
+            carbs_per_100g=float(self.carbs[i]),
+            price_kzt_per_100g=float(self.price[i]),
+            cost_per_kcal=float(self.cost_per_kcal[i]),
+            kcal_per_g=float(self.kcal_per_g[i]),
+            protein_per_kzt=float(self.protein_per_kzt[i]),
+        )
+
+    def get_by_name(self, name: str) -> CatalogProduct | None:
+        i = self.by_name.get(name)
+        return None if i is None else self.product(i)
+
+    def get_by_id(self, product_id: uuid.UUID) -> CatalogProduct | None:
+        i = self.by_id.get(product_id)
+        return None if i is None else self.product(i)
+
+
+_lock = threading.Lock()
+_version_lock = threading.Lock()
+_version: CatalogVersion | None = None
+_version_expires = 0.0
+_snapshot: CatalogSnapshot | None = None
+
+
+def _observe(current: CatalogVersion) -> CatalogVersion:
+    global _version, _version_expires, _snapshot
+    with _version_lock:
+        # never go back: a slow reader may bring an older version
+        if _version is None or current.version >= _version.version:
+            if _version is not None and current.version != _version.version:
+                _snapshot = None
+            _version = current
+            _version_expires = time.monotonic() + CATALOG_VERSION_TTL_SECONDS
+        return _version
+
+
+def peek_catalog_version() -> CatalogVersion | None:
+    """The cached catalog version if still fresh, without touching the database."""
+    cur = _version
+    if cur is not None and time.monotonic() < _version_expires:
+        return cur
+    return None
+
+
+def catalog_version(db: Session) -> CatalogVersion:
+    cur = peek_catalog_version()
+    if cur is not None:
+        return cur
+    row = db.execute(select(CatalogMeta.version, CatalogMeta.updated_at).where(CatalogMeta.id == 1)).first()
+    return _observe(CatalogVersion(*row) if row else CatalogVersion(0, None))
+
+
+def bump_catalog_version(db: Session) -> CatalogVersion:
+    """Increment the version in the caller's transaction, right before it
+    commits its write to products (the row lock is held until then). Pass
+    the result to invalidate_catalog once committed."""
+    return CatalogVersion(*db.execute(text(BUMP_VERSION_SQL)).one())
+
+
+def invalidate_catalog(current: CatalogVersion) -> None:
+    """Call after a committed write to products, with its bumped version."""
+    _observe(current)
+
+
+def _load(db: Session, version: int) -> CatalogSnapshot:
+    rows = db.execute(
+        select(
+            Product.id,
+            Product.name,
+            Product.kcal_per_100g,
+            Product.protein_per_100g,
+            Product.fat_per_100g,
+            Product.carbs_per_100g,
+            Product.price_kzt_per_100g,
+            Product.cost_per_kcal,
+            Product.kcal_per_g,
+            Product.protein_per_kzt,
+        ).order_by(Product.name)
+    ).all()
+    return run_cpu_bound(CatalogSnapshot, version, rows)
+
+
+def get_catalog(db: Session) -> CatalogSnapshot:
+    global _snapshot
+    version = catalog_version(db).version
+    snap = _snapshot
+    if snap is not None and snap.version >= version:
+        return snap
+
+    # never wait for another loader: async routes run this in greenlets that
+    # share the event loop thread, so blocking here would stall the loader too
+    if not _lock.acquire(blocking=False):
+        return _load(db, version)
+    try:
+        if _snapshot is None or _snapshot.version < version:
+            _snapshot = _load(db, version)
+        return _snapshot
+    finally:
+        _lock.release()
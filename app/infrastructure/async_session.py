@@ -0,0 +1,5 @@
+from app.infrastructure.async_db import AsyncSessionLocal
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
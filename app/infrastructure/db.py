@@ -9,6 +9,9 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL is not set in .env")
 
+# "sync" (threadpool + Session) or "async" (AsyncSession routers), see app/main.py
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
@@ -1,7 +1,8 @@
 import uuid
 import datetime as dt
 
-from sqlalchemy import String, Integer, Numeric, ForeignKey, Date, DateTime
+from sqlalchemy import String, Integer, Numeric, Float, ForeignKey, Date, DateTime, Index, UniqueConstraint, Computed
+from sqlalchemy import BigInteger, CheckConstraint, SmallInteger, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.infrastructure.db import Base
@@ -65,6 +66,16 @@ class Profile(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # keyset pagination of GET /products: (sort column, name, id), read
+        # forwards for asc and backwards for desc
+        Index("ix_products_name_id", "name", "id"),
+        Index("ix_products_cost_per_kcal_name_id", "cost_per_kcal", "name", "id"),
+        Index("ix_products_kcal_per_g_name_id", "kcal_per_g", "name", "id"),
+        Index("ix_products_protein_per_kzt_name_id", "protein_per_kzt", "name", "id"),
+        Index("ix_products_kcal_per_100g", "kcal_per_100g"),
+        Index("ix_products_price_kzt_per_100g", "price_kzt_per_100g"),
+    )
 
     id: Mapped[uuid.UUID] = uuid_pk()
     name: Mapped[str] = mapped_column(String(255), unique=True, index=True)
@@ -76,9 +87,46 @@ class Product(Base):
 
     price_kzt_per_100g: Mapped[float] = mapped_column(Numeric(10, 2), default=0)
 
+    # generated by Postgres; double precision division, same as float(a) / float(b) in Python
+    cost_per_kcal: Mapped[float | None] = mapped_column(
+        Float,
+        Computed(
+            "CASE WHEN kcal_per_100g > 0"
+            " THEN price_kzt_per_100g::double precision / kcal_per_100g END",
+            persisted=True,
+        ),
+    )
+    kcal_per_g: Mapped[float] = mapped_column(
+        Float, Computed("kcal_per_100g::double precision / 100", persisted=True)
+    )
+    protein_per_kzt: Mapped[float | None] = mapped_column(
+        Float,
+        Computed(
+            "CASE WHEN price_kzt_per_100g > 0"
+            " THEN protein_per_100g::double precision / price_kzt_per_100g::double precision END",
+            persisted=True,
+        ),
+    )
+
+
+class CatalogMeta(Base):
+    """Single row (id 1): products catalog version, bumped in the same
+    transaction as every write to products (app/catalog/snapshot.py)."""
+
+    __tablename__ = "catalog_meta"
+    __table_args__ = (CheckConstraint("id = 1", name="ck_catalog_meta_single_row"),)
+
+    id: Mapped[int] = mapped_column(SmallInteger, primary_key=True, autoincrement=False, default=1)
+    version: Mapped[int] = mapped_column(BigInteger, default=1)
+    updated_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
 
 class MealPlan(Base):
     __tablename__ = "meal_plans"
+    __table_args__ = (
+        UniqueConstraint("user_id", "plan_date", name="uq_meal_plans_user_id_plan_date"),
+        Index("ix_meal_plans_user_id_created_at", "user_id", "created_at"),
+    )
 
     id: Mapped[uuid.UUID] = uuid_pk()
     user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id"), index=True)
@@ -89,6 +137,12 @@ class MealPlan(Base):
     total_cost_kzt: Mapped[float] = mapped_column(Numeric(10, 2), default=0)
     created_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
 
+    # denormalized from items at generation time
+    total_kcal: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    total_protein_g: Mapped[float] = mapped_column(Numeric(10, 2), default=0, server_default="0")
+    total_fat_g: Mapped[float] = mapped_column(Numeric(10, 2), default=0, server_default="0")
+    total_carbs_g: Mapped[float] = mapped_column(Numeric(10, 2), default=0, server_default="0")
+
     items: Mapped[list["MealPlanItem"]] = relationship(
         "MealPlanItem",
         back_populates="meal_plan",
@@ -0,0 +1,21 @@
+import functools
+from typing import Any, Callable
+
+import anyio
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+
+def run_cpu_bound(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """fn(*args, **kwargs) without holding the event loop.
+
+    The sync helpers are shared by both transports. Async routes run them
+    inside AsyncSession.run_sync, i.e. in a greenlet on the event loop
+    thread, where a fit, a solve or an index build would stall every other
+    connection. There the greenlet is suspended while fn runs on a worker
+    thread. Sync routes already run in the threadpool and call fn directly.
+    fn must not use the session.
+    """
+    call = functools.partial(fn, *args, **kwargs)
+    if in_greenlet():
+        return await_only(anyio.to_thread.run_sync(call))
+    return call()
@@ -1,14 +1,25 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from sqlalchemy import text
 
-from app.infrastructure.db import engine
+from app.catalog.neighbors import warm_neighbors
+from app.catalog.search import warm_search_index
+from app.infrastructure.db import engine, DB_MODE
 
-from app.api.v1.endpoints.profiles import router as profiles_router
-from app.api.v1.endpoints.products import router as products_router
-from app.api.v1.endpoints.meal_plans import router as meal_plans_router
 from app.api.v1.endpoints.users import router as users_router
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1.endpoints.auth import router as auth_router
+
+if DB_MODE == "async":
+    from app.api.v1.endpoints.profiles_async import router as profiles_router
+    from app.api.v1.endpoints.products_async import router as products_router
+    from app.api.v1.endpoints.meal_plans_async import router as meal_plans_router
+    from app.api.v1.endpoints.auth_async import router as auth_router
+else:
+    from app.api.v1.endpoints.profiles import router as profiles_router
+    from app.api.v1.endpoints.products import router as products_router
+    from app.api.v1.endpoints.meal_plans import router as meal_plans_router
+    from app.api.v1.endpoints.auth import router as auth_router
 
 app = FastAPI(title="MealMind API", version="0.1.0")
 
@@ -21,12 +32,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
 API_PREFIX = "/api/v1"
 
-app = FastAPI(title="MealMind API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the in-memory product search index and substitute lookup take a while
+    # to build on a large catalog, do it in the background before the first
+    # request asks for them
+    warm_search_index()
+    warm_neighbors()
+    yield
+
+
+app = FastAPI(title="MealMind API", version="0.1.0", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -36,6 +59,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(users_router, prefix=API_PREFIX)
@@ -47,7 +71,7 @@ app.include_router(auth_router, prefix=API_PREFIX)
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "db_mode": DB_MODE}
 
 @app.get("/health/db")
 def health_db():
@@ -0,0 +1,295 @@
+"""Pre-generate meal plans for every profile.
+
+    python -m app.planning.batch --date 2026-01-01 --days 7 --workers 8
+
+Profiles are streamed from the database in chunks; each chunk is fitted in
+a process pool and written back with one bulk insert + commit per chunk.
+The API starts this CLI as a separate process (spawn()), never the pool
+itself.
+"""
+import argparse
+import datetime as dt
+import logging
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import SimpleNamespace
+
+from sqlalchemy import select
+
+from app.catalog.snapshot import CatalogSnapshot, get_catalog
+from app.infrastructure.db import SessionLocal
+from app.infrastructure.models import MealPlan, Profile
+from app.planning.builder import PlanBuildError, build_items, calc_target_kcal, plan_from_items
+from app.planning.store import upsert_plans
+
+PROFILE_COLUMNS = (
+    Profile.user_id,
+    Profile.sex,
+    Profile.age,
+    Profile.height_cm,
+    Profile.weight_kg,
+    Profile.goal,
+    Profile.activity_level,
+    Profile.budget_kzt_per_day,
+)
+MAX_ERRORS = 20  # error messages kept for the report; all are counted
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchStats:
+    users: int = 0
+    plans: int = 0
+    skipped: int = 0
+    failed: int = 0
+    fit_seconds: float = 0.0
+    write_seconds: float = 0.0
+    errors: list[str] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def users_per_sec(self) -> float:
+        return self.users / self.elapsed if self.elapsed > 0 else 0.0
+
+    def fail(self, user_id, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"user {user_id}: {message}")
+
+    def as_dict(self) -> dict:
+        return {
+            "users": self.users,
+            "plans": self.plans,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "elapsed_s": round(self.elapsed, 3),
+            "fit_s": round(self.fit_seconds, 3),
+            "write_s": round(self.write_seconds, 3),
+            "users_per_sec": round(self.users_per_sec, 1),
+            "errors": list(self.errors),
+        }
+
+
+# -------------------------
+# worker side
+# -------------------------
+_catalog: CatalogSnapshot | None = None
+
+
+def _init_worker(catalog: CatalogSnapshot) -> None:
+    global _catalog
+    _catalog = catalog
+
+
+def _fit_chunk(profiles: list[dict], dates: list[dt.date], existing: set, engine: str, selection: str):
+    """Plan and item rows for the chunk; a user that fails (bad profile data,
+    solver error, ...) is reported as (user_id, message) and skipped."""
+    t0 = time.perf_counter()
+    plan_rows: list[dict] = []
+    item_rows: list[dict] = []
+    failures: list[tuple] = []
+    skipped = 0
+
+    for p in profiles:
+        profile = SimpleNamespace(**p)
+        todo = [d for d in dates if (profile.user_id, d) not in existing]
+        skipped += len(dates) - len(todo)
+        if not todo:
+            continue
+
+        try:
+            target_kcal = calc_target_kcal(profile)
+            budget_kzt = int(profile.budget_kzt_per_day or 10**9)
+            raw_items = build_items(_catalog, target_kcal, budget_kzt, engine, selection)
+            plans = [plan_from_items(profile.user_id, d, target_kcal, raw_items) for d in todo]
+        except PlanBuildError as e:
+            failures.append((profile.user_id, str(e)))
+            continue
+        except Exception as e:
+            failures.append((profile.user_id, f"{type(e).__name__}: {e}"))
+            continue
+
+        for plan_row, rows, _ in plans:
+            plan_rows.append(plan_row)
+            item_rows.extend(rows)
+
+    return plan_rows, item_rows, skipped, failures, time.perf_counter() - t0
+
+
+# -------------------------
+# parent side
+# -------------------------
+def _existing_keys(db, user_ids: list, dates: list[dt.date]) -> set:
+    rows = db.execute(
+        select(MealPlan.user_id, MealPlan.plan_date)
+        .where(MealPlan.user_id.in_(user_ids), MealPlan.plan_date.in_(dates))
+    ).all()
+    return {tuple(r) for r in rows}
+
+
+def pregenerate(
+    start: dt.date,
+    days: int = 1,
+    workers: int | None = None,
+    chunk_size: int = 500,
+    engine: str = "greedy",
+    selection: str = "template",
+    skip_existing: bool = True,
+    progress=None,
+) -> BatchStats:
+    cpus = os.cpu_count() or 1
+    workers = min(workers or cpus, cpus)
+    dates = [start + dt.timedelta(days=i) for i in range(days)]
+    stats = BatchStats()
+
+    read_db = SessionLocal()
+    write_db = SessionLocal()
+    try:
+        catalog = get_catalog(read_db)
+        stream = read_db.execute(
+            select(*PROFILE_COLUMNS).execution_options(yield_per=chunk_size)
+        )
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(catalog,)) as pool:
+            pending: dict = {}
+
+            def drain() -> None:
+                # a failing chunk (worker crash, write error) counts its users
+                # as failed; the run goes on with the next chunk
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    user_ids = pending.pop(fut)
+                    stats.users += len(user_ids)
+                    try:
+                        plan_rows, item_rows, skipped, failures, fit_s = fut.result()
+                    except Exception as e:
+                        logger.exception("pregenerate: chunk of %d users failed", len(user_ids))
+                        for user_id in user_ids:
+                            stats.fail(user_id, f"{type(e).__name__}: {e}")
+                        continue
+                    stats.fit_seconds += fit_s
+                    stats.skipped += skipped
+                    for user_id, message in failures:
+                        stats.fail(user_id, message)
+
+                    t0 = time.perf_counter()
+                    try:
+                        upsert_plans(write_db, plan_rows, item_rows)
+                        write_db.commit()
+                    except Exception as e:
+                        write_db.rollback()
+                        logger.exception("pregenerate: writing %d plans failed", len(plan_rows))
+                        for user_id in dict.fromkeys(r["user_id"] for r in plan_rows):
+                            stats.fail(user_id, f"{type(e).__name__}: {e}")
+                    else:
+                        stats.plans += len(plan_rows)
+                    stats.write_seconds += time.perf_counter() - t0
+                    if progress:
+                        progress(stats)
+
+            for chunk in stream.partitions():
+                profiles = [r._asdict() for r in chunk]
+                existing = (
+                    _existing_keys(write_db, [p["user_id"] for p in profiles], dates) if skip_existing else set()
+                )
+                pending[pool.submit(_fit_chunk, profiles, dates, existing, engine, selection)] = [
+                    p["user_id"] for p in profiles
+                ]
+
+                # keep at most two chunks per worker in flight
+                while len(pending) >= workers * 2:
+                    drain()
+
+            while pending:
+                drain()
+    finally:
+        write_db.close()
+        read_db.close()
+
+    return stats
+
+
+def spawn(
+    start: dt.date,
+    days: int = 1,
+    workers: int | None = None,
+    chunk_size: int = 500,
+    engine: str = "greedy",
+    selection: str = "template",
+    skip_existing: bool = True,
+) -> subprocess.Popen:
+    """Run the CLI below in a new interpreter and return without waiting.
+
+    A server must not create the process pool itself: its children would be
+    forks of the server (DB pool, event loop state), made from a request
+    thread. Output goes to the server's stdout/stderr.
+    """
+    args = [
+        sys.executable, "-m", "app.planning.batch",
+        "--date", start.isoformat(),
+        "--days", str(days),
+        "--chunk-size", str(chunk_size),
+        "--engine", engine,
+        "--selection", selection,
+    ]
+    if workers:
+        args += ["--workers", str(workers)]
+    if not skip_existing:
+        args.append("--overwrite")
+    return subprocess.Popen(args, cwd=PROJECT_ROOT)
+
+
+def _print_progress(stats: BatchStats) -> None:
+    s = stats.as_dict()
+    print(
+        f"users={s['users']} plans={s['plans']} skipped={s['skipped']} failed={s['failed']} "
+        f"elapsed={s['elapsed_s']}s ({s['users_per_sec']} users/s)",
+        flush=True,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pre-generate meal plans for all profiles")
+    parser.add_argument("--date", type=dt.date.fromisoformat, default=dt.date.today())
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--engine", choices=["greedy", "optimal"], default="greedy")
+    parser.add_argument("--selection", choices=["template", "index"], default="template")
+    parser.add_argument("--overwrite", action="store_true", help="generate even if a plan exists for the date")
+    args = parser.parse_args()
+
+    stats = pregenerate(
+        args.date,
+        days=args.days,
+        workers=args.workers,
+        chunk_size=max(1, args.chunk_size),
+        engine=args.engine,
+        selection=args.selection,
+        skip_existing=not args.overwrite,
+        progress=_print_progress,
+    )
+    s = stats.as_dict()
+    print(
+        f"done: {s['users']} users, {s['plans']} plans in {s['elapsed_s']}s "
+        f"(fit {s['fit_s']}s, write {s['write_s']}s, {s['users_per_sec']} users/s)"
+    )
+    if s["failed"]:
+        print(f"{s['failed']} users failed")
+    for e in s["errors"]:
+        print(e)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Building a day plan from the catalog: template products, fitted grams,
+and the rows / MealPlanOut for one date. Shared by the endpoints and the
+batch pre-generation workers, so nothing here touches HTTP or the session.
+"""
+import datetime as dt
+import uuid
+from uuid import UUID
+
+from app.catalog.snapshot import CatalogProduct, CatalogSnapshot
+from app.infrastructure.models import Product, Profile
+from app.planning.cache import plan_cache
+from app.planning.engine import fit_plan
+from app.planning.solver import fit_plan_optimal
+from app.schemas.meal_plans import MealPlanItemOut, MealPlanOut
+
+# (name, grams, role); role picks a stand-in from the catalog index when the
+# name is not in the catalog (or for selection="index"), see app/catalog/index.py
+PLAN_TEMPLATE = [
+    ("breakfast", [("Oats", 80, "starch"), ("Banana", 120, "produce"), ("Kefir 2.5%", 250, "light")]),
+    ("lunch",     [("Chicken breast (raw)", 200, "protein"), ("Rice (dry)", 90, "starch")]),
+    ("snack",     [("Cottage cheese 5%", 200, "protein"), ("Apple", 200, "produce")]),
+    ("dinner",    [("Lentils (dry)", 80, "starch"), ("Buckwheat (dry)", 80, "starch")]),
+]
+TEMPLATE_KEY = tuple((meal_type, tuple(parts)) for meal_type, parts in PLAN_TEMPLATE)
+
+
+class PlanBuildError(Exception):
+    """No plan can be built from the catalog (empty, or no template products)."""
+
+
+def kcal_for(product: Product, grams: int) -> int:
+    return int(round((grams / 100.0) * float(product.kcal_per_100g)))
+
+
+def cost_for(product: Product, grams: int) -> float:
+    return round((grams / 100.0) * float(product.price_kzt_per_100g), 2)
+
+
+def calc_target_kcal(profile: Profile) -> int:
+    w = float(profile.weight_kg)
+    h = float(profile.height_cm)
+    a = int(profile.age)
+
+    sex = (profile.sex or "").lower()
+    if sex == "male":
+        bmr = 10 * w + 6.25 * h - 5 * a + 5
+    else:
+        bmr = 10 * w + 6.25 * h - 5 * a - 161
+
+    activity = (profile.activity_level or "medium").lower()
+    mult = {"low": 1.2, "medium": 1.55, "high": 1.725}.get(activity, 1.55)
+
+    tdee = bmr * mult
+
+    goal = (profile.goal or "maintain").lower()
+    if goal == "lose_fat":
+        target = tdee - 400
+    elif goal == "gain":
+        target = tdee + 250
+    else:
+        target = tdee
+
+    target = max(1400, min(3200, target))
+    return int(round(target))
+
+
+def select_products(catalog: CatalogSnapshot, selection: str) -> list[dict]:
+    """Template slots -> catalog products, each product used at most once.
+
+    template: exact name, then same base name ("Oats" -> "Oats (dry)"), then
+    the best product of the slot's role. index: best product of the role.
+    """
+    slots = [(meal_type, name, grams, role) for meal_type, parts in PLAN_TEMPLATE for name, grams, role in parts]
+    index = catalog.index
+    picks: list[int | None] = [None] * len(slots)
+    used: set[int] = set()
+
+    if selection == "template":
+        for n, (_, name, _, _) in enumerate(slots):
+            i = catalog.by_name.get(name)
+            if i is not None and i not in used:
+                picks[n] = i
+                used.add(i)
+        for n, (_, name, _, role) in enumerate(slots):
+            if picks[n] is None:
+                picks[n] = index.match_name(name, role, exclude=used)
+                if picks[n] is not None:
+                    used.add(picks[n])
+
+    for n, (_, _, _, role) in enumerate(slots):
+        if picks[n] is None:
+            top = index.top(role, 1, exclude=used)
+            if top:
+                picks[n] = top[0]
+                used.add(top[0])
+
+    return [
+        {"meal_type": meal_type, "product": catalog.product(i), "grams": grams}
+        for (meal_type, _, grams, _), i in zip(slots, picks)
+        if i is not None
+    ]
+
+
+def build_items(
+    catalog: CatalogSnapshot, target_kcal: int, budget_kzt: int, engine: str, selection: str = "template"
+) -> list[dict]:
+    if not len(catalog):
+        raise PlanBuildError("No products in database. Add products first.")
+
+    key = (target_kcal, budget_kzt, TEMPLATE_KEY, engine, selection)
+    cached = plan_cache.lookup(key, catalog.version)
+    if cached is not None:
+        return [{"meal_type": m, "product": p, "grams": g} for m, p, g in cached]
+
+    raw_items = select_products(catalog, selection)
+
+    if not raw_items:
+        raise PlanBuildError("Could not build plan: required products not found.")
+
+    fit = fit_plan_optimal if engine == "optimal" else fit_plan
+    raw_items = fit(raw_items, target_kcal=target_kcal, budget_kzt=budget_kzt)
+
+    plan_cache.store(key, catalog.version, tuple((x["meal_type"], x["product"], x["grams"]) for x in raw_items))
+    return raw_items
+
+
+def plan_from_items(
+    user_id: UUID, plan_date: dt.date, target_kcal: int, raw_items: list[dict]
+) -> tuple[dict, list[dict], MealPlanOut]:
+    plan_id = uuid.uuid4()
+    item_rows: list[dict] = []
+    items_out: list[MealPlanItemOut] = []
+    total_kcal = 0
+    total_cost = 0.0
+    protein = fat = carbs = 0.0
+
+    for x in raw_items:
+        prod: CatalogProduct = x["product"]
+        grams: int = int(x["grams"])
+        meal_type: str = x["meal_type"]
+
+        kcal = kcal_for(prod, grams)
+        cost = cost_for(prod, grams)
+
+        item_id = uuid.uuid4()
+        item_rows.append(
+            {
+                "id": item_id,
+                "meal_plan_id": plan_id,
+                "meal_type": meal_type,
+                "product_id": prod.id,
+                "grams": grams,
+                "kcal": kcal,
+                "cost_kzt": cost,
+            }
+        )
+        items_out.append(
+            MealPlanItemOut(
+                id=item_id,
+                meal_type=meal_type,
+                product_id=prod.id,
+                name=prod.name,
+                grams=grams,
+                kcal=kcal,
+                cost_kzt=cost,
+            )
+        )
+
+        total_kcal += kcal
+        total_cost = round(total_cost + cost, 2)
+        protein += grams / 100.0 * float(prod.protein_per_100g)
+        fat += grams / 100.0 * float(prod.fat_per_100g)
+        carbs += grams / 100.0 * float(prod.carbs_per_100g)
+
+    totals = {
+        "total_kcal": total_kcal,
+        "total_cost_kzt": total_cost,
+        "total_protein_g": round(protein, 2),
+        "total_fat_g": round(fat, 2),
+        "total_carbs_g": round(carbs, 2),
+    }
+    plan_row = {
+        "id": plan_id,
+        "user_id": user_id,
+        "plan_date": plan_date,
+        "target_kcal": target_kcal,
+        **totals,
+    }
+    return plan_row, item_rows, MealPlanOut(
+        id=plan_id,
+        user_id=user_id,
+        plan_date=plan_date,
+        target_kcal=target_kcal,
+        items=items_out,
+        **totals,
+    )
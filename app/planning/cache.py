@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "4096"))
+PLAN_CACHE_TTL_SECONDS = float(os.getenv("PLAN_CACHE_TTL_SECONDS", "3600"))
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class PlanCache(TTLCache):
+    """Fitted items keyed by (target_kcal, budget, template, catalog version,
+    engine). Entries for an older catalog version are dropped as soon as a
+    lookup with a newer version comes in; lookups with an older version
+    than that miss without touching the cache."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize, ttl)
+        self._catalog_version: int | None = None
+
+    def lookup(self, key: tuple, catalog_version: int) -> Any | None:
+        current = self._catalog_version
+        if current is not None and catalog_version < current:
+            # a request still on an older snapshot: neither served nor cached
+            return None
+        if catalog_version != current:
+            with self._lock:
+                if self._catalog_version is None or catalog_version > self._catalog_version:
+                    self._data.clear()
+                    self._catalog_version = catalog_version
+        return self.get(key + (catalog_version,))
+
+    def store(self, key: tuple, catalog_version: int, value: Any) -> None:
+        if catalog_version == self._catalog_version:
+            self.put(key + (catalog_version,), value)
+
+
+plan_cache = PlanCache(PLAN_CACHE_SIZE, PLAN_CACHE_TTL_SECONDS)
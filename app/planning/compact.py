@@ -0,0 +1,70 @@
+"""Delete duplicate meal plans, keeping the newest per (user_id, plan_date).
+
+    python -m app.planning.compact --batch-size 1000
+
+Runs in batches with a commit after each one, so it can be used on a live
+table before the unique (user_id, plan_date) constraint is added.
+"""
+import argparse
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.infrastructure.db import SessionLocal
+
+DUPLICATE_IDS = text("""
+    SELECT id FROM (
+        SELECT id,
+               row_number() OVER (
+                   PARTITION BY user_id, plan_date
+                   ORDER BY created_at DESC, id DESC
+               ) AS rn
+        FROM meal_plans
+    ) ranked
+    WHERE rn > 1
+    LIMIT :batch_size
+""")
+
+
+def compact_duplicate_plans(db: Session, batch_size: int = 1000, progress=None) -> tuple[int, int]:
+    plans_deleted = items_deleted = 0
+    while True:
+        ids = db.execute(DUPLICATE_IDS, {"batch_size": batch_size}).scalars().all()
+        if not ids:
+            break
+
+        items_deleted += db.execute(
+            text("DELETE FROM meal_plan_items WHERE meal_plan_id = ANY(:ids)"), {"ids": ids}
+        ).rowcount
+        plans_deleted += db.execute(
+            text("DELETE FROM meal_plans WHERE id = ANY(:ids)"), {"ids": ids}
+        ).rowcount
+        db.commit()
+
+        if progress:
+            progress(plans_deleted, items_deleted)
+
+    return plans_deleted, items_deleted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compact duplicate meal plans")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        plans, items = compact_duplicate_plans(
+            db,
+            batch_size=args.batch_size,
+            progress=lambda p, i: print(f"deleted plans={p} items={i}", flush=True),
+        )
+    finally:
+        db.close()
+    print(f"done: {plans} plans, {items} items removed in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import numpy as np
+
+NO_KCAL_COST = 10**9
+
+
+def _item_cents(grams: int, price100: float) -> int:
+    # same rounding as cost_for(): round(grams / 100 * price, 2), kept as integer cents
+    return int(round(round((grams / 100.0) * price100, 2) * 100))
+
+
+def _item_kcal(grams: int, kcal100: float) -> int:
+    return int(round((grams / 100.0) * kcal100))
+
+
+class PlanEngine:
+    """Array-based version of the greedy fitter.
+
+    Grams, kcal/100g and price/100g live in NumPy arrays; per-item kcal and
+    cost (in cents) are cached so totals are updated incrementally instead of
+    being re-summed on every loop step. Results match the dict-based
+    fitter it replaced (legacy_fit in tests/legacy_fitter.py, checked by
+    tests/test_plan_engine.py).
+    """
+
+    def __init__(self, grams, kcal_per_100g, price_per_100g, cost_per_kcal=None):
+        self.grams = np.asarray(grams, dtype=np.int64).copy()
+        self.kcal100 = np.asarray(kcal_per_100g, dtype=np.float64)
+        self.price100 = np.asarray(price_per_100g, dtype=np.float64)
+
+        if cost_per_kcal is None:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cost_per_kcal = np.where(self.kcal100 > 0, self.price100 / self.kcal100, NO_KCAL_COST)
+        self.cpk = np.asarray(cost_per_kcal, dtype=np.float64)
+
+        self.item_kcal = np.zeros(len(self.grams), dtype=np.int64)
+        self.item_cents = np.zeros(len(self.grams), dtype=np.int64)
+        self._recompute_all()
+
+    @classmethod
+    def from_items(cls, items: list[dict]) -> "PlanEngine":
+        # catalog products carry cost_per_kcal (generated column on products)
+        cpk = [getattr(x["product"], "cost_per_kcal", None) for x in items]
+        return cls(
+            [x["grams"] for x in items],
+            [float(x["product"].kcal_per_100g) for x in items],
+            [float(x["product"].price_kzt_per_100g) for x in items],
+            None if None in cpk else cpk,
+        )
+
+    def __len__(self) -> int:
+        return len(self.grams)
+
+    # -------------------------
+    # totals
+    # -------------------------
+    def _recompute_all(self) -> None:
+        self.item_kcal[:] = np.rint((self.grams / 100.0) * self.kcal100).astype(np.int64)
+        self.item_cents[:] = [_item_cents(int(g), float(p)) for g, p in zip(self.grams, self.price100)]
+        self.total_kcal = int(self.item_kcal.sum())
+        self.total_cents = int(self.item_cents.sum())
+
+    def _set_grams(self, i: int, grams: int) -> None:
+        kcal = _item_kcal(grams, float(self.kcal100[i]))
+        cents = _item_cents(grams, float(self.price100[i]))
+        self.total_kcal += kcal - int(self.item_kcal[i])
+        self.total_cents += cents - int(self.item_cents[i])
+        self.grams[i] = grams
+        self.item_kcal[i] = kcal
+        self.item_cents[i] = cents
+
+    @property
+    def total_cost(self) -> float:
+        return self.total_cents / 100
+
+    def totals(self) -> tuple[int, float]:
+        return self.total_kcal, self.total_cost
+
+    # -------------------------
+    # fitting steps
+    # -------------------------
+    def scale_to_target(self, target_kcal: int) -> None:
+        if self.total_kcal <= 0:
+            return
+        scale = target_kcal / self.total_kcal
+        scale = max(0.6, min(1.8, scale))
+        self.grams = np.maximum(20, np.rint(self.grams * scale / 10).astype(np.int64) * 10)
+        self._recompute_all()
+
+    def reduce_cost(self, budget_kzt: int) -> None:
+        cheap = int(np.argmin(self.cpk))
+        exp = int(np.argmax(self.cpk))
+        budget_cents = budget_kzt * 100
+        kcal_per_g = float(self.kcal100[cheap]) / 100.0
+
+        for _ in range(50):
+            if self.total_cents <= budget_cents:
+                break
+            if self.grams[exp] <= 50:
+                break
+
+            old_kcal = int(self.item_kcal[exp])
+            self._set_grams(exp, max(50, int(self.grams[exp]) - 20))
+            removed_kcal = max(0, old_kcal - int(self.item_kcal[exp]))
+
+            if kcal_per_g > 0 and removed_kcal > 0:
+                add_g = int(round((removed_kcal / kcal_per_g) / 10)) * 10
+                self._set_grams(cheap, int(self.grams[cheap]) + max(10, add_g))
+
+    def top_up_to_target(self, target_kcal: int, budget_kzt: int) -> None:
+        cheap = int(np.argmin(self.cpk))
+        floor_kcal = int(target_kcal * 0.95)
+        budget_cents = budget_kzt * 100
+
+        for _ in range(20):
+            if self.total_kcal >= floor_kcal:
+                break
+            if self.total_cents >= budget_cents:
+                break
+            self._set_grams(cheap, int(self.grams[cheap]) + 10)
+
+    def fit(self, target_kcal: int, budget_kzt: int) -> np.ndarray:
+        if len(self) == 0:
+            return self.grams
+        self.scale_to_target(target_kcal)
+        self.reduce_cost(budget_kzt)
+        self.top_up_to_target(target_kcal, budget_kzt)
+        return self.grams
+
+
+def fit_plan(items: list[dict], target_kcal: int, budget_kzt: int) -> list[dict]:
+    if not items:
+        return items
+
+    engine = PlanEngine.from_items(items)
+    grams = engine.fit(target_kcal, budget_kzt)
+    for x, g in zip(items, grams):
+        x["grams"] = int(g)
+    return items
@@ -0,0 +1,135 @@
+import datetime as dt
+import logging
+import os
+import queue
+import threading
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from fastapi import HTTPException
+
+from app.planning.cache import TTLCache
+
+PLAN_JOB_WORKERS = int(os.getenv("PLAN_JOB_WORKERS", "2"))
+PLAN_JOB_QUEUE_SIZE = int(os.getenv("PLAN_JOB_QUEUE_SIZE", "100"))
+PLAN_JOB_PER_USER = int(os.getenv("PLAN_JOB_PER_USER", "2"))
+# finished jobs stay pollable this long
+PLAN_JOB_TTL_SECONDS = float(os.getenv("PLAN_JOB_TTL_SECONDS", "3600"))
+
+logger = logging.getLogger(__name__)
+
+
+class JobRejected(Exception):
+    """Queue full or the user already has too many jobs pending."""
+
+
+@dataclass
+class Job:
+    id: uuid.UUID
+    user_id: uuid.UUID
+    fn: Callable[[], Any]
+    status: str = "queued"  # queued -> running -> done | failed
+    created_at: dt.datetime = field(default_factory=dt.datetime.utcnow)
+    started_at: dt.datetime | None = None
+    finished_at: dt.datetime | None = None
+    result: Any = None
+    error: str | None = None
+    status_code: int | None = None
+
+
+class JobQueue:
+    """Bounded in-process queue served by a small pool of daemon threads.
+
+    Expensive work (week generation) runs on at most `workers` threads
+    instead of the server's request threads, so a burst of it can't starve
+    cheap endpoints. submit() rejects instead of blocking when the queue is
+    full or the user already has per_user jobs queued or running. Queued and
+    running jobs are held until they finish (the queue bounds them); only
+    then do they move to a TTL cache and can expire. Jobs live in memory
+    only: they are lost on restart and visible to this process only.
+    """
+
+    def __init__(self, workers: int, maxsize: int, per_user: int, ttl: float):
+        self.workers = workers
+        self.per_user = per_user
+        self._queue: queue.Queue[Job] = queue.Queue(maxsize=maxsize)
+        self._pending: dict[uuid.UUID, Job] = {}  # queued or running
+        self._finished = TTLCache(maxsize=max(maxsize * 10, 1), ttl=ttl)
+        self._active: dict[uuid.UUID, int] = {}
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+
+    def submit(self, user_id: uuid.UUID, fn: Callable[[], Any]) -> Job:
+        job = Job(id=uuid.uuid4(), user_id=user_id, fn=fn)
+        with self._lock:
+            if self._active.get(user_id, 0) >= self.per_user:
+                raise JobRejected(f"Too many pending jobs for this user (limit {self.per_user})")
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise JobRejected("Job queue is full, try again later") from None
+            self._active[user_id] = self._active.get(user_id, 0) + 1
+            self._pending[job.id] = job
+            self._start_workers()
+        return job
+
+    def get(self, job_id: uuid.UUID) -> Job | None:
+        with self._lock:
+            job = self._pending.get(job_id)
+        return job if job is not None else self._finished.get(job_id)
+
+    def _start_workers(self) -> None:
+        # lazily, so importing the module doesn't spawn threads
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._work, name=f"plan-job-{len(self._threads)}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            job.status = "running"
+            job.started_at = dt.datetime.utcnow()
+            try:
+                job.result = job.fn()
+                job.status = "done"
+            except HTTPException as e:
+                job.error, job.status_code = str(e.detail), e.status_code
+                job.status = "failed"
+            except Exception as e:
+                logger.exception("plan job %s failed", job.id)
+                job.error, job.status_code = str(e) or type(e).__name__, 500
+                job.status = "failed"
+            finally:
+                job.fn = None  # drop the closure (payload, user) once run
+                job.finished_at = dt.datetime.utcnow()
+                with self._lock:
+                    left = self._active.get(job.user_id, 1) - 1
+                    if left > 0:
+                        self._active[job.user_id] = left
+                    else:
+                        self._active.pop(job.user_id, None)
+                    # the TTL counts from completion
+                    self._finished.put(job.id, job)
+                    del self._pending[job.id]
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        with self._lock:
+            active = sum(self._active.values())
+            users = len(self._active)
+            pending = len(self._pending)
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "maxsize": self._queue.maxsize,
+            "active": active,
+            "active_users": users,
+            "per_user": self.per_user,
+            "pending": pending,
+            "finished": len(self._finished),
+        }
+
+
+plan_jobs = JobQueue(PLAN_JOB_WORKERS, PLAN_JOB_QUEUE_SIZE, PLAN_JOB_PER_USER, PLAN_JOB_TTL_SECONDS)
@@ -0,0 +1,142 @@
+import time
+
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, milp
+
+from app.planning.engine import fit_plan
+
+GRAM_STEP = 10
+KCAL_BAND = 0.05
+TIME_LIMIT_MS = 200
+MAX_GRAMS_FACTOR = 3
+# per-nutrient shortlist size when the candidate set is large (whole catalog)
+SHORTLIST = 24
+
+# share of target kcal coming from each macro (4/9/4 kcal per gram)
+MACRO_SHARES = {
+    "protein": (0.15, 0.35),
+    "fat": (0.20, 0.35),
+    "carbs": (0.40, 0.65),
+}
+KCAL_PER_GRAM = {"protein": 4.0, "fat": 9.0, "carbs": 4.0}
+
+
+def _solve(c, rows, lo, hi, max_units, time_limit_ms):
+    res = milp(
+        c=c,
+        constraints=LinearConstraint(np.vstack(rows), lo, hi),
+        integrality=np.ones(len(c)),
+        bounds=Bounds(0, max_units),
+        options={"time_limit": time_limit_ms / 1000.0, "disp": False},
+    )
+    if res.x is None:
+        return None
+    return np.rint(res.x).astype(np.int64)
+
+
+def _shortlist(cost, kcal, macros) -> np.ndarray:
+    # the optimum only uses the cheapest sources of each nutrient, so keep the
+    # SHORTLIST best kcal/protein/fat/carbs per tenge and drop the rest
+    keep = set()
+    for value in (kcal, *macros.values()):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            per_cost = np.where(cost > 0, value / cost, np.where(value > 0, np.inf, 0.0))
+        k = min(SHORTLIST, len(per_cost))
+        keep.update(np.argpartition(-per_cost, k - 1)[:k].tolist())
+    return np.array(sorted(keep), dtype=np.int64)
+
+
+def solve_plan(
+    kcal_per_100g,
+    price_per_100g,
+    protein_per_100g,
+    fat_per_100g,
+    carbs_per_100g,
+    max_grams,
+    target_kcal: int,
+    budget_kzt: int,
+    time_limit_ms: int = TIME_LIMIT_MS,
+) -> np.ndarray | None:
+    """Cheapest grams per candidate (multiples of 10 g) as an integer program.
+
+    Calories must land within +/-5% of target_kcal, cost at or under the
+    budget and macro kcal within MACRO_SHARES. Constraints are relaxed in
+    order (macros, then budget) when the strict problem is infeasible.
+    Returns None if HiGHS finds no solution within time_limit_ms (shared by
+    all attempts).
+    """
+    deadline = time.perf_counter() + time_limit_ms / 1000.0
+    unit = GRAM_STEP / 100.0
+    kcal = np.asarray(kcal_per_100g, dtype=np.float64) * unit
+    cost = np.asarray(price_per_100g, dtype=np.float64) * unit
+    macros = {
+        "protein": np.asarray(protein_per_100g, dtype=np.float64) * unit,
+        "fat": np.asarray(fat_per_100g, dtype=np.float64) * unit,
+        "carbs": np.asarray(carbs_per_100g, dtype=np.float64) * unit,
+    }
+    max_units = np.floor(np.asarray(max_grams, dtype=np.float64) / GRAM_STEP)
+
+    n = len(kcal)
+    if n == 0:
+        return None
+
+    idx = np.arange(n)
+    if n > SHORTLIST * 4:
+        idx = _shortlist(cost, kcal, macros)
+        kcal, cost, max_units = kcal[idx], cost[idx], max_units[idx]
+        macros = {m: v[idx] for m, v in macros.items()}
+
+    kcal_rows = ([kcal], [target_kcal * (1 - KCAL_BAND)], [target_kcal * (1 + KCAL_BAND)])
+    budget_rows = ([cost], [-np.inf], [float(budget_kzt)])
+    macro_rows = (
+        [macros[m] * KCAL_PER_GRAM[m] for m in MACRO_SHARES],
+        [target_kcal * MACRO_SHARES[m][0] for m in MACRO_SHARES],
+        [target_kcal * MACRO_SHARES[m][1] for m in MACRO_SHARES],
+    )
+
+    for groups in (
+        (kcal_rows, budget_rows, macro_rows),
+        (kcal_rows, budget_rows),
+        (kcal_rows,),
+    ):
+        rows = [r for g in groups for r in g[0]]
+        lo = [v for g in groups for v in g[1]]
+        hi = [v for g in groups for v in g[2]]
+        left_ms = (deadline - time.perf_counter()) * 1000.0
+        if left_ms <= 0:
+            break
+        units = _solve(cost, rows, lo, hi, max_units, left_ms)
+        if units is not None:
+            grams = np.zeros(n, dtype=np.int64)
+            grams[idx] = units * GRAM_STEP
+            return grams
+
+    return None
+
+
+def fit_plan_optimal(items: list[dict], target_kcal: int, budget_kzt: int) -> list[dict]:
+    """Same contract as engine.fit_plan; falls back to the greedy fitter when
+    the solver gives up. Items that end up at 0 g are dropped."""
+    if not items:
+        return items
+
+    prods = [x["product"] for x in items]
+    grams = solve_plan(
+        [float(p.kcal_per_100g) for p in prods],
+        [float(p.price_kzt_per_100g) for p in prods],
+        [float(p.protein_per_100g or 0) for p in prods],
+        [float(p.fat_per_100g or 0) for p in prods],
+        [float(p.carbs_per_100g or 0) for p in prods],
+        [x["grams"] * MAX_GRAMS_FACTOR for x in items],
+        target_kcal=target_kcal,
+        budget_kzt=budget_kzt,
+    )
+    if grams is None:
+        return fit_plan(items, target_kcal=target_kcal, budget_kzt=budget_kzt)
+
+    out = []
+    for x, g in zip(items, grams):
+        if g > 0:
+            x["grams"] = int(g)
+            out.append(x)
+    return out
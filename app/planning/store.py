@@ -0,0 +1,63 @@
+import uuid
+
+from sqlalchemy import delete, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.infrastructure.models import MealPlan, MealPlanItem
+
+
+def upsert_plans(db: Session, plans: list[dict], items: list[dict]) -> dict[uuid.UUID, uuid.UUID]:
+    """Write generated plans and their items; one plan per (user_id, plan_date).
+
+    Plans go in with a single executemany INSERT ... ON CONFLICT DO UPDATE
+    RETURNING. When a date already had a plan, the existing row keeps its id,
+    its old items are deleted and the new items are attached to it. Ids are
+    generated client-side (uuid4), so nothing is flushed or refreshed.
+    Returns {client plan id: stored plan id} for the ids that changed.
+    The caller commits.
+    """
+    if not plans:
+        return {}
+
+    stmt = insert(MealPlan)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MealPlan.user_id, MealPlan.plan_date],
+        set_={
+            "target_kcal": stmt.excluded.target_kcal,
+            "total_cost_kzt": stmt.excluded.total_cost_kzt,
+            "total_kcal": stmt.excluded.total_kcal,
+            "total_protein_g": stmt.excluded.total_protein_g,
+            "total_fat_g": stmt.excluded.total_fat_g,
+            "total_carbs_g": stmt.excluded.total_carbs_g,
+            "created_at": stmt.excluded.created_at,
+        },
+    ).returning(MealPlan.id, MealPlan.user_id, MealPlan.plan_date)
+
+    stored = {(user_id, plan_date): pid for pid, user_id, plan_date in db.execute(stmt, plans)}
+    remap = {
+        p["id"]: stored[(p["user_id"], p["plan_date"])]
+        for p in plans
+        if stored[(p["user_id"], p["plan_date"])] != p["id"]
+    }
+
+    if remap:
+        db.execute(delete(MealPlanItem).where(MealPlanItem.meal_plan_id.in_(list(remap.values()))))
+        items = [{**it, "meal_plan_id": remap.get(it["meal_plan_id"], it["meal_plan_id"])} for it in items]
+
+    if items:
+        db.execute(insert(MealPlanItem), items)
+
+    return remap
+
+
+def lock_plan_date(db: Session, user_id: uuid.UUID, plan_date) -> None:
+    """Transaction-scoped advisory lock on (user_id, plan_date).
+
+    Serializes generation of the same plan across workers; released on the
+    commit that writes the plan (or on rollback).
+    """
+    db.execute(
+        text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+        {"key": f"meal_plan:{user_id}:{plan_date.isoformat()}"},
+    )
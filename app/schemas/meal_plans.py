@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from uuid import UUID
 import datetime as dt
 
@@ -12,8 +12,14 @@ class MealPlanGenerateIn(BaseModel):
     target_kcal: Optional[int] = None
     budget_kzt: Optional[int] = None
 
+    # greedy = fit_plan heuristic, optimal = integer program (app/planning/solver.py)
+    engine: Literal["greedy", "optimal"] = "greedy"
+    # template = PLAN_TEMPLATE names (missing ones filled by role), index = best by role only
+    selection: Literal["template", "index"] = "template"
+
 
 class MealPlanItemOut(BaseModel):
+    id: Optional[UUID] = None
     meal_type: str
     product_id: UUID
     name: str
@@ -29,8 +35,23 @@ class MealPlanOut(BaseModel):
     target_kcal: int
     total_kcal: int
     total_cost_kzt: float
+    total_protein_g: float = 0
+    total_fat_g: float = 0
+    total_carbs_g: float = 0
     items: List[MealPlanItemOut]
 
+
+class MealPlanSummaryOut(BaseModel):
+    # plan without items, answered from meal_plans alone
+    id: UUID
+    plan_date: dt.date
+    target_kcal: int
+    total_kcal: int
+    total_cost_kzt: float
+    total_protein_g: float
+    total_fat_g: float
+    total_carbs_g: float
+
 class ShoppingItemOut(BaseModel):
     product_id: UUID
     name: str
@@ -39,11 +60,43 @@ class ShoppingItemOut(BaseModel):
     total_cost_kzt: float
 
 
+class ShoppingListOut(BaseModel):
+    user_id: UUID
+    start_date: dt.date
+    end_date: dt.date
+    total_kcal: int
+    total_cost_kzt: float
+    items: List[ShoppingItemOut]
+
+
+class SubstituteOut(BaseModel):
+    # grams are chosen so the swap keeps the item's kcal
+    product_id: UUID
+    name: str
+    grams: int
+    kcal: int
+    cost_kzt: float
+    saving_kzt: float
+    distance: float
+
+
+class ItemSubstitutesOut(BaseModel):
+    item_id: UUID
+    product_id: UUID
+    name: str
+    grams: int
+    kcal: int
+    cost_kzt: float
+    substitutes: List[SubstituteOut]
+
+
 class MealPlanWeekGenerateIn(BaseModel):
     user_id: UUID
     start_date: Optional[dt.date] = None
     days: int = 7
     reuse_existing: bool = True  # если уже есть план на дату — не перегенерить
+    engine: Literal["greedy", "optimal"] = "greedy"
+    selection: Literal["template", "index"] = "template"
 
 
 class MealPlanWeekOut(BaseModel):
@@ -54,3 +107,40 @@ class MealPlanWeekOut(BaseModel):
     total_week_cost_kzt: float
     plans: List[MealPlanOut]
     shopping_list: List[ShoppingItemOut]
+
+
+class MealPlanStreamSummaryOut(BaseModel):
+    # last NDJSON record of /me/generate-week/stream
+    user_id: UUID
+    start_date: dt.date
+    end_date: dt.date
+    total_kcal: int
+    total_cost_kzt: float
+    shopping_list: List[ShoppingItemOut]
+
+
+class PregenerateIn(BaseModel):
+    start_date: Optional[dt.date] = None
+    days: int = Field(1, ge=1, le=14)
+    workers: Optional[int] = Field(None, ge=1, le=64, description="at most the CPU count")
+    chunk_size: int = Field(500, ge=1, le=10_000)
+    engine: Literal["greedy", "optimal"] = "greedy"
+    selection: Literal["template", "index"] = "template"
+    overwrite: bool = False
+
+
+class PregenerateOut(BaseModel):
+    status: str
+    start_date: dt.date
+    days: int
+
+
+class PlanJobOut(BaseModel):
+    id: UUID
+    status: Literal["queued", "running", "done", "failed"]
+    created_at: dt.datetime
+    started_at: Optional[dt.datetime] = None
+    finished_at: Optional[dt.datetime] = None
+    result: Optional[MealPlanWeekOut] = None  # when done
+    error: Optional[str] = None  # when failed
+    status_code: Optional[int] = None  # HTTP status the sync endpoint would have returned
@@ -12,3 +12,11 @@ class ProductCreate(BaseModel):
 
 class ProductOut(ProductCreate):
     id: UUID
+    # derived, generated by the database
+    cost_per_kcal: Optional[float] = None
+    kcal_per_g: Optional[float] = None
+    protein_per_kzt: Optional[float] = None
+
+class ProductSearchHit(ProductCreate):
+    id: UUID
+    score: float  # share of the query's trigrams found in the name, 0..1
@@ -0,0 +1,411 @@
+"""HTTP load test for the main user flow.
+
+    python -m benchmarks.loadtest --users 200 --concurrency 32 --iterations 2000
+    python -m benchmarks.loadtest --embedded /tmp/mealmind-pg --duration 60
+    python -m benchmarks.loadtest --uvicorn --port 8001 --db-mode async
+
+Seeds N users with profiles (and the seed products if the catalog is empty)
+into DATABASE_URL, then runs the scenario
+
+    POST /auth/login -> GET /profiles/me -> GET /products -> POST /meal-plans/me/generate-week
+
+from --concurrency virtual users, either in-process through httpx's ASGI
+transport (default) or through a local uvicorn (--uvicorn). Reports latency
+histograms, p50/p90/p99, DB queries per request and error rates per route.
+
+--embedded DIR starts a throwaway PostgreSQL with the optional `pgserver`
+package instead of using DATABASE_URL; the schema is then created from the
+models. Use --create-schema to do the same on an empty DATABASE_URL.
+"""
+import argparse
+import asyncio
+import contextvars
+import datetime as dt
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+ROUTES = {
+    "login": ("POST", "/auth/login"),
+    "profile": ("GET", "/profiles/me"),
+    "products": ("GET", "/products"),
+    "generate-week": ("POST", "/meal-plans/me/generate-week"),
+}
+EMAIL = "loadtest-{}@example.com"
+PASSWORD = "loadtest-password"
+QUERIES_HEADER = "x-db-queries"
+START_DATE = dt.date(2030, 1, 1)
+HIST_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+_queries: contextvars.ContextVar[list | None] = contextvars.ContextVar("loadtest_queries", default=None)
+
+
+# -------------------------
+# database
+# -------------------------
+def start_embedded(path: str) -> str:
+    try:
+        import pgserver
+    except ImportError:
+        sys.exit("--embedded needs the optional pgserver package (pip install pgserver)")
+
+    server = pgserver.get_server(path, cleanup_mode="stop")
+    server.psql("DROP DATABASE IF EXISTS loadtest WITH (FORCE);")
+    server.psql("CREATE DATABASE loadtest;")
+    return server.get_uri("loadtest").replace("postgresql://", "postgresql+psycopg://", 1)
+
+
+def create_schema(engine) -> None:
+    from sqlalchemy import text
+
+    from app.infrastructure.db import Base
+    import app.infrastructure.models  # noqa: F401
+
+    Base.metadata.create_all(engine)
+    # refresh_tokens lives outside the models (see alembic/versions)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS refresh_tokens ("
+            " id serial PRIMARY KEY, user_id uuid NOT NULL,"
+            " jti varchar(36) NOT NULL UNIQUE, token_hash varchar(64) NOT NULL UNIQUE,"
+            " expires_at timestamptz NOT NULL, revoked_at timestamptz, created_at timestamptz NOT NULL)"
+        ))
+
+
+def seed(n_users: int, rng: random.Random) -> list[tuple[str, str, str]]:
+    """Returns (user_id, email, access token) for loadtest users 0..n_users-1."""
+    from sqlalchemy import func, insert, select
+
+    from app.api.v1.endpoints.products import _seed_products
+    from app.auth.security import create_access_token, get_password_hash
+    from app.infrastructure.db import SessionLocal
+    from app.infrastructure.models import Product, Profile, User
+
+    emails = [EMAIL.format(i) for i in range(n_users)]
+    with SessionLocal() as db:
+        if not db.execute(select(func.count()).select_from(Product)).scalar_one():
+            print(f"seeded products: {_seed_products(db).inserted}", file=sys.stderr)
+
+        existing = dict(db.execute(select(User.email, User.id).where(User.email.in_(emails))).all())
+        missing = [e for e in emails if e not in existing]
+        if missing:
+            password_hash = get_password_hash(PASSWORD)
+            users = [{"id": uuid.uuid4(), "email": e, "password_hash": password_hash} for e in missing]
+            db.execute(insert(User), users)
+            db.execute(insert(Profile), [
+                {
+                    "id": uuid.uuid4(),
+                    "user_id": u["id"],
+                    "sex": rng.choice(["male", "female"]),
+                    "age": rng.randint(18, 70),
+                    "height_cm": rng.randint(150, 200),
+                    "weight_kg": rng.randint(45, 130),
+                    "goal": rng.choice(["lose_fat", "maintain", "gain"]),
+                    "activity_level": rng.choice(["low", "medium", "high"]),
+                    "budget_kzt_per_day": rng.randint(1500, 6000),
+                }
+                for u in users
+            ])
+            db.commit()
+            existing.update((u["email"], u["id"]) for u in users)
+        print(f"users: {len(emails)} ({len(missing)} new)", file=sys.stderr)
+
+    return [(str(existing[e]), e, create_access_token(str(existing[e]))) for e in emails]
+
+
+# -------------------------
+# query counting
+# -------------------------
+def count_queries(engines) -> None:
+    from sqlalchemy import event
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter = _queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+
+
+class QueryCountMiddleware:
+    """Adds the number of DB round trips made by the request as a header.
+
+    The counter is a contextvar, so it follows the request into the
+    threadpool (sync routes) and into run_sync greenlets (async routes).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        counter = [0]
+        token = _queries.set(counter)
+
+        async def send_with_count(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (QUERIES_HEADER.encode(), str(counter[0]).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _queries.reset(token)
+
+
+# -------------------------
+# load
+# -------------------------
+@dataclass
+class RouteStats:
+    latencies_ms: list[float] = field(default_factory=list)
+    queries: list[int] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    errors: int = 0
+
+    def add(self, ms: float, status: int | str, queries: int | None) -> None:
+        self.latencies_ms.append(ms)
+        self.statuses[status] += 1
+        if not (isinstance(status, int) and status < 400):
+            self.errors += 1
+        if queries is not None:
+            self.queries.append(queries)
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+
+async def run_load(client, users, routes, args) -> tuple[dict[str, RouteStats], float]:
+    stats: dict[str, RouteStats] = defaultdict(RouteStats)
+    next_iteration = 0
+    deadline = time.perf_counter() + args.duration if args.duration else None
+
+    def take() -> int | None:
+        nonlocal next_iteration
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        if deadline is None and next_iteration >= args.iterations:
+            return None
+        next_iteration += 1
+        return next_iteration - 1
+
+    async def call(route, **kwargs):
+        method, path = ROUTES[route]
+        t0 = time.perf_counter()
+        try:
+            r = await client.request(method, args.prefix + path, **kwargs)
+        except Exception as e:  # count transport errors instead of aborting the run
+            stats[route].add((time.perf_counter() - t0) * 1000, type(e).__name__, None)
+            return None
+        q = r.headers.get(QUERIES_HEADER)
+        stats[route].add((time.perf_counter() - t0) * 1000, r.status_code, int(q) if q is not None else None)
+        return r
+
+    async def worker():
+        while (i := take()) is not None:
+            user_id, email, token = users[i % len(users)]
+            if "login" in routes:
+                r = await call("login", json={"email": email, "password": PASSWORD})
+                if r is not None and r.status_code == 200:
+                    token = r.json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            if "profile" in routes:
+                await call("profile", headers=headers)
+            if "products" in routes:
+                await call("products")
+            if "generate-week" in routes:
+                await call("generate-week", headers=headers, json={
+                    "user_id": user_id,
+                    "start_date": (START_DATE + dt.timedelta(days=i % 28)).isoformat(),
+                    "days": args.days,
+                    "engine": args.engine,
+                })
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return stats, time.perf_counter() - t0
+
+
+# -------------------------
+# report
+# -------------------------
+def summarize(stats: dict[str, RouteStats], elapsed: float) -> dict:
+    out = {}
+    for route, s in stats.items():
+        lat = sorted(s.latencies_ms)
+        hist = Counter()
+        for ms in lat:
+            hist[next((b for b in HIST_BOUNDS_MS if ms < b), math.inf)] += 1
+        out[route] = {
+            "requests": len(lat),
+            "errors": s.errors,
+            "error_rate": round(s.errors / len(lat), 4) if lat else 0.0,
+            "rps": round(len(lat) / elapsed, 2),
+            "mean_ms": round(sum(lat) / len(lat), 2) if lat else 0.0,
+            "p50_ms": round(percentile(lat, 50), 2),
+            "p90_ms": round(percentile(lat, 90), 2),
+            "p99_ms": round(percentile(lat, 99), 2),
+            "max_ms": round(lat[-1], 2) if lat else 0.0,
+            "queries_mean": round(sum(s.queries) / len(s.queries), 2) if s.queries else None,
+            "queries_max": max(s.queries) if s.queries else None,
+            "statuses": {str(k): v for k, v in s.statuses.items()},
+            "histogram_ms": {("inf" if b == math.inf else str(b)): hist[b] for b in (*HIST_BOUNDS_MS, math.inf) if hist[b]},
+        }
+    return out
+
+
+def print_report(summary: dict, elapsed: float) -> None:
+    print(f"\n{'route':<15} {'reqs':>7} {'err%':>6} {'rps':>8} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9} {'q/req':>6} {'q max':>6}")
+    for route in ROUTES:
+        s = summary.get(route)
+        if not s:
+            continue
+        qm = "-" if s["queries_mean"] is None else f"{s['queries_mean']:.1f}"
+        qx = "-" if s["queries_max"] is None else s["queries_max"]
+        print(
+            f"{route:<15} {s['requests']:>7} {s['error_rate'] * 100:>5.1f}% {s['rps']:>8.1f} "
+            f"{s['p50_ms']:>8.1f}ms {s['p90_ms']:>7.1f}ms {s['p99_ms']:>7.1f}ms {s['max_ms']:>7.1f}ms {qm:>6} {qx:>6}"
+        )
+
+    for route in ROUTES:
+        s = summary.get(route)
+        if not s:
+            continue
+        print(f"\n{route} latency (ms), statuses {s['statuses']}")
+        top = max(s["histogram_ms"].values())
+        lower = 0
+        for bound in (*HIST_BOUNDS_MS, math.inf):
+            key = "inf" if bound == math.inf else str(bound)
+            n = s["histogram_ms"].get(key, 0)
+            if n:
+                label = f"{lower}-{bound}" if bound != math.inf else f">={lower}"
+                print(f"  {label:>10} {n:>7} {'#' * max(1, round(40 * n / top))}")
+            lower = bound
+    print(f"\nelapsed {elapsed:.1f}s")
+
+
+# -------------------------
+# entry point
+# -------------------------
+def start_uvicorn(app, host: str, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            sys.exit("uvicorn failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+async def main_async(args) -> dict:
+    import httpx
+
+    rng = random.Random(args.seed)
+    users = seed(args.users, rng)
+
+    from app.infrastructure.db import DB_MODE, engine
+    from app.main import app
+
+    engines = [engine]
+    if DB_MODE == "async":
+        from app.infrastructure.async_db import async_engine
+        engines.append(async_engine.sync_engine)
+    count_queries(engines)
+    wrapped = QueryCountMiddleware(app)
+
+    routes = set(args.routes.split(","))
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    server = None
+    if args.uvicorn:
+        server, thread = start_uvicorn(wrapped, args.host, args.port)
+        client = httpx.AsyncClient(base_url=f"http://{args.host}:{args.port}", limits=limits, timeout=args.timeout)
+    else:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=wrapped), base_url="http://loadtest", timeout=args.timeout)
+
+    print(f"running: {args.concurrency} virtual users, db_mode={DB_MODE}, {'uvicorn' if args.uvicorn else 'asgi'}", file=sys.stderr)
+    try:
+        async with client:
+            stats, elapsed = await run_load(client, users, routes, args)
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join()
+
+    summary = summarize(stats, elapsed)
+    print_report(summary, elapsed)
+    return {
+        "ts": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "db_mode": DB_MODE,
+        "transport": "uvicorn" if args.uvicorn else "asgi",
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "days": args.days,
+        "engine": args.engine,
+        "elapsed_s": round(elapsed, 2),
+        "routes": summary,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HTTP load test for the MealMind API")
+    parser.add_argument("--users", type=int, default=100, help="seeded users with profiles")
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users running at once")
+    parser.add_argument("--iterations", type=int, default=500, help="scenario runs in total")
+    parser.add_argument("--duration", type=float, default=None, help="run for N seconds instead of --iterations")
+    parser.add_argument("--routes", default=",".join(ROUTES), help="subset of " + ",".join(ROUTES))
+    parser.add_argument("--days", type=int, default=7, help="days per generate-week call")
+    parser.add_argument("--engine", choices=["greedy", "optimal"], default="greedy")
+    parser.add_argument("--db-mode", choices=["sync", "async"], default=None, help="overrides DB_MODE")
+    parser.add_argument("--embedded", metavar="DIR", default=None, help="throwaway PostgreSQL via pgserver")
+    parser.add_argument("--create-schema", action="store_true", help="create tables from the models first")
+    parser.add_argument("--uvicorn", action="store_true", help="serve over a local uvicorn instead of ASGI transport")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--prefix", default="/api/v1")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", type=Path, default=None, help="append the summary as one JSON line")
+    args = parser.parse_args()
+
+    unknown = set(args.routes.split(",")) - set(ROUTES)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+
+    # everything under app/ reads its settings at import time
+    if args.embedded:
+        os.environ["DATABASE_URL"] = start_embedded(args.embedded)
+        args.create_schema = True
+    if args.db_mode:
+        os.environ["DB_MODE"] = args.db_mode
+    os.environ.setdefault("JWT_SECRET_KEY", "loadtest")
+
+    if args.create_schema:
+        from app.infrastructure.db import engine
+        create_schema(engine)
+
+    result = asyncio.run(main_async(args))
+    if args.json:
+        with args.json.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""Offline micro-benchmarks for the plan engine.
+
+    python -m benchmarks.plan_engine
+    python -m benchmarks.plan_engine --sizes 100,10000 --only fit,shopping
+    python -m benchmarks.plan_engine --compare 6c3f98e
+
+No database is touched: catalogs, profiles and plans are synthetic. Every
+run appends one JSON line per benchmark to benchmarks/results.jsonl, tagged
+with the current git commit, so runs from different commits can be compared
+with --compare.
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+# the endpoint modules build an engine on import; it never connects here
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg://bench@localhost/bench")
+
+import numpy as np
+
+from app.api.v1.endpoints.meal_plans import _shopping_from_plans
+from app.api.v1.endpoints.products import build_seed_products
+from app.catalog.index import CandidateIndex
+from app.catalog.neighbors import NutrientNeighbors
+from app.catalog.search import TrigramIndex
+from app.catalog.snapshot import CatalogSnapshot
+from app.infrastructure.models import Profile
+from app.planning.builder import PLAN_TEMPLATE, calc_target_kcal, plan_from_items, select_products
+from app.planning.engine import fit_plan
+from app.planning.solver import MAX_GRAMS_FACTOR, fit_plan_optimal, solve_plan
+from app.schemas.products import ProductCreate
+from tests.legacy_fitter import legacy_fit
+
+RESULTS = Path(__file__).with_name("results.jsonl")
+DEFAULT_SIZES = (100, 10_000, 1_000_000)
+MIN_TIME_S = 0.5
+SEED = 42
+
+
+@dataclass
+class Bench:
+    name: str
+    fn: Callable[[], object]
+    ops: int = 1  # operations done by one fn() call
+    size: int | None = None
+
+
+# -------------------------
+# synthetic data
+# -------------------------
+def synthetic_rows(n: int, rng: np.random.Generator) -> list[tuple]:
+    """Catalog rows in CatalogSnapshot order; template products come first."""
+    names = [name for _, parts in PLAN_TEMPLATE for name, _, _ in parts]
+    names += [f"Product #{i}" for i in range(max(0, n - len(names)))]
+    names = names[:n]
+
+    kcal = rng.integers(15, 900, n)
+    protein = np.round(rng.uniform(0, 35, n), 1)
+    fat = np.round(rng.uniform(0, 40, n), 1)
+    carbs = np.round(rng.uniform(0, 80, n), 1)
+    price = np.round(rng.uniform(30, 1500, n), 0)
+
+    return [
+        (uuid.uuid4(), name, int(k), float(p), float(f), float(c), float(pr))
+        for name, k, p, f, c, pr in zip(names, kcal, protein, fat, carbs, price)
+    ]
+
+
+def synthetic_profiles(n: int, rng: np.random.Generator) -> list[Profile]:
+    return [
+        Profile(
+            user_id=uuid.uuid4(),
+            sex=str(rng.choice(["male", "female"])),
+            age=int(rng.integers(18, 70)),
+            height_cm=int(rng.integers(150, 200)),
+            weight_kg=int(rng.integers(45, 130)),
+            goal=str(rng.choice(["lose_fat", "maintain", "gain"])),
+            activity_level=str(rng.choice(["low", "medium", "high"])),
+            budget_kzt_per_day=int(rng.integers(1500, 6000)),
+        )
+        for _ in range(n)
+    ]
+
+
+# -------------------------
+# benchmarks
+# -------------------------
+def engine_benches(rng: np.random.Generator) -> list[Bench]:
+    catalog = CatalogSnapshot(1, synthetic_rows(100, rng))
+    profiles = synthetic_profiles(1000, rng)
+    targets = [(calc_target_kcal(p), p.budget_kzt_per_day) for p in profiles[:100]]
+    base = select_products(catalog, "template")
+    user_id = uuid.uuid4()
+    today = dt.date.today()
+
+    def fresh():
+        return [dict(x) for x in base]
+
+    def fit_all(fit):
+        def run():
+            for target, budget in targets:
+                fit(fresh(), target_kcal=target, budget_kzt=budget)
+        return run
+
+    fitted = fit_plan(fresh(), target_kcal=targets[0][0], budget_kzt=targets[0][1])
+    week = [plan_from_items(user_id, today + dt.timedelta(days=d), targets[0][0], fitted)[2] for d in range(7)]
+    month = [plan_from_items(user_id, today + dt.timedelta(days=d), targets[0][0], fitted)[2] for d in range(30)]
+
+    return [
+        Bench("calc_target_kcal", lambda: [calc_target_kcal(p) for p in profiles], ops=len(profiles)),
+        Bench("fit_plan.legacy", fit_all(legacy_fit), ops=len(targets)),
+        Bench("fit_plan.greedy", fit_all(fit_plan), ops=len(targets)),
+        Bench("fit_plan.optimal", fit_all(fit_plan_optimal), ops=len(targets)),
+        Bench("plan_from_items", lambda: plan_from_items(user_id, today, targets[0][0], fitted)),
+        Bench("shopping_from_plans.7d", lambda: _shopping_from_plans(week)),
+        Bench("shopping_from_plans.30d", lambda: _shopping_from_plans(month)),
+        Bench("seed.build_seed_products", build_seed_products),
+    ]
+
+
+def catalog_benches(size: int, rng: np.random.Generator) -> list[Bench]:
+    rows = synthetic_rows(size, rng)
+    catalog = CatalogSnapshot(1, rows)
+    payloads = [
+        {
+            "name": r[1],
+            "kcal_per_100g": r[2],
+            "protein_per_100g": r[3],
+            "fat_per_100g": r[4],
+            "carbs_per_100g": r[5],
+            "price_kzt_per_100g": r[6],
+        }
+        for r in rows
+    ]
+    validated = [ProductCreate.model_validate(x) for x in payloads]
+    lookups = [rows[i][1] for i in rng.integers(0, size, 1000)]
+    max_grams = np.full(size, 100 * MAX_GRAMS_FACTOR)
+    neighbors = NutrientNeighbors(catalog)
+    probe = catalog.ids[int(rng.integers(0, size))]
+    search = TrigramIndex(catalog)
+    queries = ["chic", "oats (d", "product #12", "prodcut 99", "greek yog", "x"]
+
+    def solve():
+        solve_plan(
+            catalog.kcal, catalog.price, catalog.protein, catalog.fat, catalog.carbs,
+            max_grams, target_kcal=2200, budget_kzt=3000,
+        )
+
+    return [
+        Bench("catalog.snapshot_build", lambda: CatalogSnapshot(1, rows), size=size),
+        Bench("catalog.get_by_name", lambda: [catalog.get_by_name(n) for n in lookups], ops=len(lookups), size=size),
+        Bench(
+            "catalog.index_build",
+            lambda: CandidateIndex(catalog),
+            size=size,
+        ),
+        Bench("catalog.select_index", lambda: select_products(catalog, "index"), size=size),
+        Bench("catalog.select_template", lambda: select_products(catalog, "template"), size=size),
+        Bench("neighbors.build", lambda: NutrientNeighbors(catalog), size=size),
+        Bench("neighbors.scan", lambda: neighbors._scan(neighbors.row_by_id[probe]), size=size),
+        Bench("neighbors.cached", lambda: neighbors.cheaper_neighbors(probe, 5), size=size),
+        Bench("search.build", lambda: TrigramIndex(catalog), size=size),
+        Bench("search.query", lambda: [search.search(q) for q in queries], ops=len(queries), size=size),
+        Bench("solver.whole_catalog", solve, size=size),
+        Bench("seed.validate", lambda: [ProductCreate.model_validate(x) for x in payloads], ops=size, size=size),
+        Bench("seed.upsert_params", lambda: [p.model_dump() for p in validated], ops=size, size=size),
+    ]
+
+
+# -------------------------
+# runner
+# -------------------------
+def measure(b: Bench, min_time: float) -> dict:
+    b.fn()  # warm-up
+
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time or calls == 0:
+        b.fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    b.fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ops = calls * b.ops
+    return {
+        "bench": b.name,
+        "size": b.size,
+        "calls": calls,
+        "ops_per_sec": round(ops / elapsed, 2),
+        "us_per_op": round(elapsed / ops * 1e6, 3),
+        "peak_kib": round((peak - base) / 1024, 1),
+        "retained_kib": round((current - base) / 1024, 1),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent,
+        )
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True, text=True, cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() + ("-dirty" if dirty else "")
+
+
+def load_results(path: Path, commit: str) -> dict[tuple, dict]:
+    # latest result per (bench, size) for the given commit prefix
+    out = {}
+    if not path.exists():
+        return out
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            r = json.loads(line)
+            if (r.get("commit") or "").startswith(commit):
+                out[(r["bench"], r["size"])] = r
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline plan engine micro-benchmarks")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES), help="catalog sizes, comma separated")
+    parser.add_argument("--only", default=None, help="comma separated benchmark name prefixes")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME_S, help="seconds per benchmark")
+    parser.add_argument("--out", type=Path, default=RESULTS)
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--compare", default=None, metavar="COMMIT", help="show speedup vs results of COMMIT")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(SEED)
+    only = tuple(args.only.split(",")) if args.only else None
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+
+    commit = git_commit()
+    baseline = load_results(args.out, args.compare) if args.compare else {}
+    run = {
+        "commit": commit,
+        "ts": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+    def groups():
+        yield engine_benches(rng)
+        for size in sizes:
+            print(f"building synthetic catalog of {size} products...", file=sys.stderr)
+            yield catalog_benches(size, rng)
+
+    results = []
+    print(f"{'bench':<28} {'size':>9} {'ops/s':>14} {'us/op':>12} {'peak KiB':>10}  vs base")
+    for benches in groups():
+        for b in benches:
+            if only and not b.name.startswith(only):
+                continue
+            r = measure(b, args.min_time)
+            results.append({**run, **r})
+
+            ref = baseline.get((r["bench"], r["size"]))
+            delta = f"x{r['ops_per_sec'] / ref['ops_per_sec']:.2f}" if ref else ""
+            size = "" if r["size"] is None else r["size"]
+            print(f"{r['bench']:<28} {size:>9} {r['ops_per_sec']:>14,.1f} {r['us_per_op']:>12,.2f} {r['peak_kib']:>10,.1f}  {delta}")
+
+    if not args.no_save:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        with args.out.open("a", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(r) + "\n")
+        print(f"saved {len(results)} results to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+# the app modules build an engine on import; it is never connected. Tests
+# that need Postgres take the `db` or `client` fixture, which use
+# TEST_DATABASE_URL (a scratch database: its tables are dropped and
+# recreated) and are skipped when it is not set.
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg://test@localhost/test")
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.fixture(scope="session")
+def pg_engine():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from sqlalchemy import create_engine
+
+    import app.infrastructure.models  # noqa: F401  (registers the tables)
+    from app.infrastructure.db import Base
+
+    engine = create_engine(TEST_DATABASE_URL)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(pg_engine):
+    from sqlalchemy import text
+    from sqlalchemy.orm import Session
+
+    # catalog_meta is kept: the process-wide catalog caches never go back
+    # to a lower version
+    with pg_engine.begin() as conn:
+        conn.execute(text("TRUNCATE products CASCADE"))
+    with Session(pg_engine, autoflush=False) as session:
+        yield session
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+
+    from app.infrastructure.session import get_db
+    from app.main import app
+
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_db, None)
@@ -0,0 +1,82 @@
+"""The dict-based fitter PlanEngine replaced.
+
+tests/test_plan_engine.py checks fit_plan against it; benchmarks/plan_engine.py
+times it as the fit_plan.legacy baseline.
+"""
+from app.infrastructure.models import Product
+from app.planning.builder import cost_for, kcal_for
+
+
+def totals(items: list[dict]) -> tuple[int, float]:
+    kcal = sum(kcal_for(x["product"], x["grams"]) for x in items)
+    cost = round(sum(cost_for(x["product"], x["grams"]) for x in items), 2)
+    return kcal, cost
+
+def cost_per_kcal(prod: Product) -> float:
+    kcal100 = float(prod.kcal_per_100g)
+    if kcal100 <= 0:
+        return 10**9
+    return float(prod.price_kzt_per_100g) / kcal100
+
+def scale_to_target(items: list[dict], target_kcal: int) -> None:
+    total_kcal, _ = totals(items)
+    if total_kcal <= 0:
+        return
+    scale = target_kcal / total_kcal
+    scale = max(0.6, min(1.8, scale))
+    for x in items:
+        x["grams"] = max(20, int(round(x["grams"] * scale / 10)) * 10)
+
+def reduce_cost(items: list[dict], budget_kzt: int) -> None:
+    cheapest = min((x["product"] for x in items), key=cost_per_kcal)
+
+    for _ in range(50):
+        _, total_cost = totals(items)
+        if total_cost <= budget_kzt:
+            break
+
+        most_exp = max((x["product"] for x in items), key=cost_per_kcal)
+        exp_item = next((x for x in items if x["product"].id == most_exp.id), None)
+        cheap_item = next((x for x in items if x["product"].id == cheapest.id), None)
+
+        if not exp_item:
+            break
+
+        if not cheap_item:
+            cheap_item = {"meal_type": "dinner", "product": cheapest, "grams": 0}
+            items.append(cheap_item)
+
+        if exp_item["grams"] <= 50:
+            break
+
+        old_kcal = kcal_for(exp_item["product"], exp_item["grams"])
+        exp_item["grams"] = max(50, exp_item["grams"] - 20)
+        new_kcal = kcal_for(exp_item["product"], exp_item["grams"])
+        removed_kcal = max(0, old_kcal - new_kcal)
+
+        kcal_per_g = float(cheapest.kcal_per_100g) / 100.0
+        if kcal_per_g > 0 and removed_kcal > 0:
+            add_g = int(round((removed_kcal / kcal_per_g) / 10)) * 10
+            cheap_item["grams"] += max(10, add_g)
+
+def top_up_to_target(items: list[dict], target_kcal: int, budget_kzt: int) -> None:
+    cheapest = min((x["product"] for x in items), key=cost_per_kcal)
+
+    for _ in range(20):
+        total_kcal, total_cost = totals(items)
+        if total_kcal >= int(target_kcal * 0.95):
+            break
+        if total_cost >= budget_kzt:
+            break
+
+        cheap_item = next((x for x in items if x["product"].id == cheapest.id), None)
+        if not cheap_item:
+            cheap_item = {"meal_type": "dinner", "product": cheapest, "grams": 0}
+            items.append(cheap_item)
+        cheap_item["grams"] += 10
+
+def legacy_fit(items: list[dict], target_kcal: int, budget_kzt: int) -> list[dict]:
+    scale_to_target(items, target_kcal)
+    reduce_cost(items, budget_kzt)
+    top_up_to_target(items, target_kcal, budget_kzt)
+    return items
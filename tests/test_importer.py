@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from app.catalog.importer import ImportStats, iter_batches, iter_lines, iter_records
+
+HEADER = "name,kcal_per_100g,protein_per_100g,fat_per_100g,carbs_per_100g,price_kzt_per_100g"
+
+
+def _chunks(data: bytes, size: int) -> list[bytes]:
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _csv(*rows: str, newline: str = "\n", final_newline: bool = True) -> bytes:
+    text = newline.join([HEADER, *rows])
+    return (text + newline if final_newline else text).encode()
+
+
+def _records(data: bytes, fmt: str = "csv", chunk_size: int = 1 << 16) -> tuple[list[tuple[int, dict]], ImportStats]:
+    stats = ImportStats()
+    return list(iter_records(iter_lines(_chunks(data, chunk_size)), fmt, stats)), stats
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1 << 16])
+def test_cr_inside_quoted_field(chunk_size):
+    data = _csv('"Oats\rrolled",370,13,7,60,120', '"Rice\r\nwhite",360,7,1,80,90')
+    records, stats = _records(data, chunk_size=chunk_size)
+    assert [rec["name"] for _, rec in records] == ["Oats\rrolled", "Rice\r\nwhite"]
+    assert stats.invalid == 0
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 1 << 16])
+def test_crlf_input(chunk_size):
+    data = _csv("Oats,370,13,7,60,120", "Rice,360,7,1,80,90", newline="\r\n")
+    lines = list(iter_lines(_chunks(data, chunk_size)))
+    assert all(line.endswith("\r\n") for line in lines)
+
+    records, _ = _records(data, chunk_size=chunk_size)
+    assert [rec for _, rec in records] == [
+        {"name": "Oats", "kcal_per_100g": "370", "protein_per_100g": "13", "fat_per_100g": "7",
+         "carbs_per_100g": "60", "price_kzt_per_100g": "120"},
+        {"name": "Rice", "kcal_per_100g": "360", "protein_per_100g": "7", "fat_per_100g": "1",
+         "carbs_per_100g": "80", "price_kzt_per_100g": "90"},
+    ]
+
+    ndjson = b"\r\n".join(json.dumps({"name": n}).encode() for n in ("Oats", "Rice")) + b"\r\n"
+    records, stats = _records(ndjson, "ndjson", chunk_size)
+    assert [(n, rec["name"]) for n, rec in records] == [(1, "Oats"), (2, "Rice")]
+    assert stats.invalid == 0
+
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+@pytest.mark.parametrize("chunk_size", [1, 4, 1 << 16])
+def test_final_line_without_newline(fmt, chunk_size):
+    if fmt == "csv":
+        data = _csv("Oats,370,13,7,60,120", "Rice,360,7,1,80,90", final_newline=False)
+    else:
+        data = b'{"name": "Oats"}\n{"name": "Rice"}'
+    assert list(iter_lines(_chunks(data, chunk_size)))[-1].endswith("Rice\"}" if fmt == "ndjson" else "90")
+
+    records, stats = _records(data, fmt, chunk_size)
+    assert [rec["name"] for _, rec in records] == ["Oats", "Rice"]
+    assert stats.rows == 2
+
+
+def test_multibyte_characters_split_across_chunks():
+    data = "\ufeff".encode() + _csv("Гречка,343,13,3,68,95")  # with a UTF-8 BOM
+    for size in (1, 2, 3):
+        records, _ = _records(data, chunk_size=size)
+        assert [rec["name"] for _, rec in records] == ["Гречка"]
+
+
+@pytest.mark.parametrize("rows,size,expected", [(6, 3, [3, 3]), (6, 6, [6]), (7, 3, [3, 3, 1]), (2, 5, [2])])
+def test_batch_sizes(rows, size, expected):
+    data = _csv(*(f"Product {i},100,10,5,5,500" for i in range(rows)))
+    records, stats = _records(data)
+    batches = list(iter_batches(records, size, stats))
+    assert [len(b) for b in batches] == expected
+    assert [p.name for b in batches for p in b] == [f"Product {i}" for i in range(rows)]
+
+
+def test_invalid_rows_are_counted_per_batch():
+    data = _csv("Oats,370,13,7,60,120", "Bad,lots,13,7,60,120", "Rice,360,7,1,80,90", "Worse,x,1,1,1,1")
+    records, stats = _records(data)
+    batches = list(iter_batches(records, 2, stats))
+    assert [[p.name for p in b] for b in batches] == [["Oats"], ["Rice"]]
+    assert stats.rows == 4
+    assert stats.invalid == 2
+    assert [e.split(":")[0] for e in stats.errors] == ["line 3", "line 5"]
@@ -0,0 +1,86 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+from app.planning.jobs import JobQueue, JobRejected
+
+
+def _wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def gate():
+    # jobs block on it; set at teardown so no worker stays stuck
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def test_per_user_limit(gate):
+    jobs = JobQueue(workers=1, maxsize=10, per_user=2, ttl=60)
+    alice, bob = uuid.uuid4(), uuid.uuid4()
+
+    first = jobs.submit(alice, gate.wait)
+    jobs.submit(alice, gate.wait)
+    with pytest.raises(JobRejected):
+        jobs.submit(alice, gate.wait)
+    jobs.submit(bob, gate.wait)  # the limit is per user
+
+    gate.set()
+    _wait_for(lambda: jobs.stats()["active"] == 0)
+    assert jobs.get(first.id).status == "done"
+    jobs.submit(alice, lambda: None)  # finished jobs free the slots
+
+
+def test_queue_full(gate):
+    jobs = JobQueue(workers=1, maxsize=1, per_user=10, ttl=60)
+    user = uuid.uuid4()
+
+    running = jobs.submit(user, gate.wait)
+    _wait_for(lambda: running.status == "running")
+    jobs.submit(user, gate.wait)  # fills the queue
+    with pytest.raises(JobRejected):
+        jobs.submit(uuid.uuid4(), gate.wait)
+    assert jobs.stats()["pending"] == 2
+
+
+def test_pending_jobs_do_not_expire(gate):
+    ttl = 0.05
+    jobs = JobQueue(workers=1, maxsize=10, per_user=10, ttl=ttl)
+    user = uuid.uuid4()
+
+    running = jobs.submit(user, lambda: gate.wait() and "result")
+    queued = jobs.submit(user, lambda: "queued result")
+    _wait_for(lambda: running.status == "running")
+    time.sleep(ttl * 3)
+    assert jobs.get(running.id) is running
+    assert jobs.get(queued.id) is queued
+    assert queued.status == "queued"
+
+    gate.set()
+    _wait_for(lambda: queued.status == "done")
+    assert jobs.get(running.id).result == "result"
+    assert jobs.get(queued.id).result == "queued result"
+
+    # the TTL counts from completion
+    time.sleep(ttl * 3)
+    assert jobs.get(running.id) is None
+    assert jobs.get(queued.id) is None
+
+
+def test_failed_job_records_the_error():
+    jobs = JobQueue(workers=1, maxsize=10, per_user=10, ttl=60)
+
+    def boom():
+        raise ValueError("boom")
+
+    job = jobs.submit(uuid.uuid4(), boom)
+    _wait_for(lambda: jobs.stats()["active"] == 0)
+    assert jobs.get(job.id) is job
+    assert (job.status, job.error, job.status_code) == ("failed", "boom", 500)
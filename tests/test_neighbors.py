@@ -0,0 +1,80 @@
+import uuid
+
+import numpy as np
+import pytest
+
+from app.catalog.neighbors import K_MAX, NutrientNeighbors
+from app.catalog.snapshot import CatalogSnapshot
+
+N = 300
+
+
+@pytest.fixture
+def rows() -> list[tuple]:
+    rng = np.random.default_rng(7)
+    return [
+        (uuid.uuid4(), f"Product {i}", int(rng.integers(50, 900)), float(rng.uniform(0, 30)),
+         float(rng.uniform(0, 40)), float(rng.uniform(0, 80)), float(rng.uniform(30, 1500)))
+        for i in range(N)
+    ]
+
+
+def _lookup_all(neighbors: NutrientNeighbors, ids) -> dict:
+    return {pid: neighbors.cheaper_neighbors(pid, K_MAX) for pid in ids}
+
+
+def _ids(catalog: CatalogSnapshot, hits) -> list[uuid.UUID]:
+    return [catalog.ids[i] for i, _ in hits]
+
+
+def test_carry_over_keeps_unchanged_entries(rows):
+    old = NutrientNeighbors(CatalogSnapshot(1, rows))
+    _lookup_all(old, [r[0] for r in rows])
+    assert len(old._cache) == N
+
+    changed = rows[10]
+    removed = rows[20]
+    new_rows = [r for r in rows if r is not removed and r is not changed]
+    new_rows.append((changed[0], changed[1], changed[2] + 100, *changed[3:]))
+    catalog = CatalogSnapshot(2, new_rows)
+    new = NutrientNeighbors(catalog, old)
+
+    # changed and removed products lose their entries, and so do the lists
+    # holding them; everything else is carried over
+    gone = {changed[0], removed[0]}
+    holders = {pid for pid, hits in old._cache.items() if any(h in gone for h, _ in hits)}
+    assert holders
+    assert new._cache.keys() == old._cache.keys() - gone - holders
+
+    # and every answer matches a cold instance
+    fresh = NutrientNeighbors(catalog)
+    for pid in catalog.ids:
+        got, want = new.cheaper_neighbors(pid, K_MAX), fresh.cheaper_neighbors(pid, K_MAX)
+        assert _ids(catalog, got) == _ids(catalog, want), pid
+        assert [d for _, d in got] == pytest.approx([d for _, d in want])
+
+
+def test_new_product_joins_cached_lists(rows):
+    old = NutrientNeighbors(CatalogSnapshot(1, rows))
+    before = _lookup_all(old, [r[0] for r in rows])
+
+    # the cheapest product there is, right next to the priciest one
+    target = max(rows, key=lambda r: r[6] / r[2])
+    twin = (uuid.uuid4(), "Twin", target[2], *target[3:6], 1.0)
+    catalog = CatalogSnapshot(2, rows + [twin])
+    new = NutrientNeighbors(catalog, old)
+
+    assert len(new._cache) == N
+    hits = new.cheaper_neighbors(target[0], K_MAX)
+    assert catalog.ids[hits[0][0]] == twin[0]
+    assert hits[0][1] == pytest.approx(0.0)
+    assert _ids(catalog, hits[1:]) == [rows[i][0] for i, _ in before[target[0]][: K_MAX - 1]]
+
+
+def test_too_many_changes_drop_the_cache(rows, monkeypatch):
+    monkeypatch.setattr("app.catalog.neighbors.MAX_PATCH", 5)
+    old = NutrientNeighbors(CatalogSnapshot(1, rows))
+    _lookup_all(old, [r[0] for r in rows[:10]])
+
+    new_rows = [(r[0], r[1], r[2] + 1, *r[3:]) if i < 6 else r for i, r in enumerate(rows)]
+    assert NutrientNeighbors(CatalogSnapshot(2, new_rows), old)._cache == {}
@@ -0,0 +1,22 @@
+from app.planning.cache import PlanCache
+
+
+def test_newer_version_drops_older_entries():
+    cache = PlanCache(maxsize=10, ttl=60)
+    assert cache.lookup(("k",), 1) is None
+    cache.store(("k",), 1, "v1")
+    assert cache.lookup(("k",), 1) == "v1"
+
+    assert cache.lookup(("k",), 2) is None
+    assert len(cache) == 0
+
+
+def test_older_version_neither_clears_nor_caches():
+    cache = PlanCache(maxsize=10, ttl=60)
+    cache.lookup(("k",), 2)
+    cache.store(("k",), 2, "v2")
+
+    assert cache.lookup(("k",), 1) is None
+    cache.store(("k",), 1, "v1")
+    assert cache.lookup(("k",), 2) == "v2"
+    assert len(cache) == 1
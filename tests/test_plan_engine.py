@@ -0,0 +1,36 @@
+import uuid
+
+import pytest
+
+from app.api.v1.endpoints.products import build_seed_products
+from app.catalog.snapshot import CatalogSnapshot
+from app.planning.builder import select_products
+from app.planning.engine import fit_plan
+from legacy_fitter import legacy_fit
+
+TARGETS = range(1400, 3201, 50)  # calc_target_kcal clamps to 1400..3200
+BUDGETS = (300, 800, 1200, 1500, 2000, 2500, 3000, 4000, 6000, 10000)
+
+
+@pytest.fixture(scope="module")
+def seed_items() -> list[dict]:
+    rows = [
+        (uuid.uuid4(), p.name, p.kcal_per_100g, p.protein_per_100g, p.fat_per_100g, p.carbs_per_100g, p.price_kzt_per_100g)
+        for p in sorted(build_seed_products(), key=lambda p: p.name)
+    ]
+    return select_products(CatalogSnapshot(1, rows), "template")
+
+
+@pytest.mark.parametrize("budget", BUDGETS)
+def test_plan_engine_matches_legacy_fitter(seed_items, budget):
+    for target in TARGETS:
+        expected = legacy_fit([dict(x) for x in seed_items], target, budget)
+        got = fit_plan([dict(x) for x in seed_items], target_kcal=target, budget_kzt=budget)
+        assert [(x["product"].id, x["grams"]) for x in got] == [(x["product"].id, x["grams"]) for x in expected], (
+            target,
+            budget,
+        )
+
+
+def test_fit_plan_empty():
+    assert fit_plan([], target_kcal=2000, budget_kzt=1000) == []
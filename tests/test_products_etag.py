@@ -0,0 +1,92 @@
+import uuid
+
+import pytest
+from sqlalchemy import event, text
+
+from app.catalog import snapshot
+
+P = "/api/v1/products"
+
+
+@pytest.fixture
+def seeded(client):
+    assert client.post(f"{P}/seed").status_code == 200
+    return client
+
+
+@pytest.fixture
+def queries(pg_engine):
+    count = [0]
+
+    def on_execute(*args):
+        count[0] += 1
+
+    event.listen(pg_engine, "before_cursor_execute", on_execute)
+    yield count
+    event.remove(pg_engine, "before_cursor_execute", on_execute)
+
+
+def _first_id(client) -> str:
+    return client.get(P, params={"limit": 1}).json()[0]["id"]
+
+
+def test_get_product_304_200_404(seeded):
+    pid = _first_id(seeded)
+    r = seeded.get(f"{P}/{pid}")
+    assert r.status_code == 200
+    etag = r.headers["etag"]
+    assert r.headers["cache-control"] == "no-cache"
+
+    assert seeded.get(f"{P}/{pid}", headers={"If-None-Match": etag}).status_code == 304
+    assert seeded.get(f"{P}/{pid}", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert seeded.get(f"{P}/{pid}", headers={"If-Modified-Since": r.headers["last-modified"]}).status_code == 304
+    assert seeded.get(f"{P}/{pid}", headers={"If-None-Match": '"0"'}).status_code == 200
+
+    # a gone id is 404 even with a current validator
+    missing = f"{P}/{uuid.uuid4()}"
+    assert seeded.get(missing).status_code == 404
+    assert seeded.get(missing, headers={"If-None-Match": etag}).status_code == 404
+    assert seeded.get(missing, headers={"If-None-Match": "*"}).status_code == 404
+
+
+def test_write_makes_the_etag_stale(seeded):
+    pid = _first_id(seeded)
+    etag = seeded.get(f"{P}/{pid}").headers["etag"]
+
+    r = seeded.post(P, json={
+        "name": "Bison jerky",
+        "kcal_per_100g": 300,
+        "protein_per_100g": 50,
+        "fat_per_100g": 5,
+        "carbs_per_100g": 10,
+        "price_kzt_per_100g": 900,
+    })
+    assert r.status_code == 200
+    r = seeded.get(f"{P}/{pid}", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+
+
+def test_304_query_cost(seeded, db, queries, monkeypatch):
+    pid = _first_id(seeded)
+    etag = seeded.get(f"{P}/{pid}").headers["etag"]
+
+    # within the version TTL: no query at all
+    monkeypatch.setattr(snapshot, "CATALOG_VERSION_TTL_SECONDS", 3600)
+    monkeypatch.setattr(snapshot, "_version_expires", 0)
+    snapshot.catalog_version(db)  # re-cached with the long TTL
+    queries[0] = 0
+    assert seeded.get(f"{P}/{pid}", headers={"If-None-Match": etag}).status_code == 304
+    assert queries[0] == 0
+
+    # after it: one catalog_meta read
+    monkeypatch.setattr(snapshot, "_version_expires", 0)
+    queries[0] = 0
+    assert seeded.get(f"{P}/{pid}", headers={"If-None-Match": etag}).status_code == 304
+    assert queries[0] == 1
+
+    # a version moved by another process is seen then, and the copy is stale
+    db.execute(text(snapshot.BUMP_VERSION_SQL))
+    db.commit()
+    monkeypatch.setattr(snapshot, "_version_expires", 0)
+    assert seeded.get(f"{P}/{pid}", headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,121 @@
+import base64
+import json
+import uuid
+
+import pytest
+
+ORDERS = [
+    (order_by, order)
+    for order_by in ("name", "cost_per_kcal", "kcal_per_g", "protein_per_kzt")
+    for order in ("asc", "desc")
+]
+
+
+def _product(name: str, kcal: int, protein: float, price: float) -> dict:
+    return {
+        "name": name,
+        "kcal_per_100g": kcal,
+        "protein_per_100g": protein,
+        "fat_per_100g": 0,
+        "carbs_per_100g": 0,
+        "price_kzt_per_100g": price,
+    }
+
+
+@pytest.fixture
+def catalog(client):
+    assert client.post("/api/v1/products/seed").status_code == 200
+    # NULL metrics (zero kcal, zero price) and equal values for the tie-break
+    extra = [_product("Zero kcal", 0, 1, 30), _product("Free food", 100, 5, 0)]
+    extra += [_product(f"Tie {i}", 200, 10, 100) for i in range(5)]
+    assert client.post("/api/v1/products/bulk", json=extra).status_code == 200
+    return client
+
+
+def _pages(client, params: dict, limit: int) -> list[dict]:
+    out, cursor = [], None
+    while True:
+        page = {**params, "limit": limit, **({"cursor": cursor} if cursor else {})}
+        r = client.get("/api/v1/products", params=page)
+        assert r.status_code == 200
+        assert len(r.json()) <= limit
+        out += r.json()
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            return out
+
+
+@pytest.mark.parametrize("order_by,order", ORDERS)
+def test_pages_add_up_to_the_unpaged_list(catalog, order_by, order):
+    params = {"order_by": order_by, "order": order}
+    full = catalog.get("/api/v1/products", params=params)
+    assert full.status_code == 200
+    assert "x-next-cursor" not in full.headers
+    rows = full.json()
+    assert len(rows) == 107
+
+    assert [p["id"] for p in _pages(catalog, params, 7)] == [p["id"] for p in rows]
+    assert [p["id"] for p in _pages(catalog, params, 107)] == [p["id"] for p in rows]
+
+    if order_by != "name":
+        values = [p[order_by] for p in rows]
+        present = [v for v in values if v is not None]
+        assert values[len(present):] == [None] * (len(values) - len(present))  # NULLs last
+        assert present == sorted(present, reverse=order == "desc")
+    # equal values go by name in the same direction
+    ties = [p["name"] for p in rows if p["name"].startswith("Tie ")]
+    assert ties == sorted(ties, reverse=order == "desc")
+
+
+def test_cursor_without_limit_pages_by_default(catalog):
+    first = catalog.get("/api/v1/products", params={"limit": 5})
+    rest = catalog.get("/api/v1/products", params={"cursor": first.headers["x-next-cursor"]})
+    assert rest.status_code == 200
+    assert len(rest.json()) == 100
+    assert rest.headers.get("x-next-cursor")
+
+
+def _cursor(*parts) -> str:
+    raw = json.dumps(list(parts), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def test_cursor_round_trip(catalog):
+    first = catalog.get("/api/v1/products", params={"order_by": "cost_per_kcal", "limit": 3})
+    cursor = first.headers["x-next-cursor"]
+    raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    last = first.json()[-1]
+    assert raw == ["cost_per_kcal", "asc", last["cost_per_kcal"], last["name"], last["id"]]
+
+
+PID = str(uuid.uuid4())
+
+
+@pytest.mark.parametrize(
+    "params,cursor",
+    [
+        ({}, "not base64 json!"),
+        ({}, _cursor("name", "asc", "Apple", "not-a-uuid")),
+        ({}, _cursor("name", "asc", "Apple", {})),
+        ({}, _cursor("name", "asc", {}, PID)),
+        ({}, _cursor("name", "asc", 1, PID)),
+        ({"order_by": "cost_per_kcal"}, _cursor("cost_per_kcal", "asc", {}, "x", PID)),
+        ({"order_by": "cost_per_kcal"}, _cursor("cost_per_kcal", "asc", "0.5", "x", PID)),
+        ({"order_by": "cost_per_kcal"}, _cursor("cost_per_kcal", "asc", True, "x", PID)),
+        ({"order_by": "cost_per_kcal"}, _cursor("cost_per_kcal", "asc", 0.5, None, PID)),
+        ({"order_by": "cost_per_kcal"}, _cursor("cost_per_kcal", "asc", 0.5, PID)),
+        ({"order_by": "cost_per_kcal"}, _cursor("name", "asc", "Apple", PID)),
+        ({"order_by": "name", "order": "desc"}, _cursor("name", "asc", "Apple", PID)),
+    ],
+)
+def test_bad_cursor_is_400(catalog, params, cursor):
+    r = catalog.get("/api/v1/products", params={**params, "cursor": cursor})
+    assert r.status_code == 400
+
+
+def test_cursor_at_null_values(catalog):
+    # zero kcal products have no cost_per_kcal; a cursor in that tail works
+    cursor = _cursor("cost_per_kcal", "asc", None, "", PID)
+    r = catalog.get("/api/v1/products", params={"order_by": "cost_per_kcal", "cursor": cursor})
+    assert r.status_code == 200
+    assert [p["name"] for p in r.json()] == ["Zero kcal"]
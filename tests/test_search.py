@@ -0,0 +1,132 @@
+import datetime as dt
+import uuid
+
+import pytest
+
+from app.catalog import search
+from app.catalog.search import TrigramIndex, patch_search_index
+from app.catalog.snapshot import CatalogSnapshot, CatalogVersion
+
+NAMES = ["Chicken breast", "Chicken thigh", "Greek yogurt", "Oats (dry)", "Rice"]
+NAMES += [f"Product #{i}" for i in range(200)]
+QUERIES = ["chic", "chicken br", "greek yog", "oats", "product #12", "prodcut 99", "turkey", "x"]
+
+
+def _snapshot(version: int, products: dict[uuid.UUID, str]) -> CatalogSnapshot:
+    rows = sorted(products.items(), key=lambda p: p[1])
+    return CatalogSnapshot(version, [(pid, name, 100, 10, 5, 5, 500) for pid, name in rows])
+
+
+def _version(v: int) -> CatalogVersion:
+    return CatalogVersion(v, dt.datetime.now(dt.timezone.utc))
+
+
+@pytest.fixture
+def products() -> dict[uuid.UUID, str]:
+    return {uuid.uuid4(): name for name in NAMES}
+
+
+@pytest.fixture
+def no_rebuild(monkeypatch):
+    """Installs an index as the current one; any rebuild fails the test."""
+
+    def install(index: TrigramIndex) -> None:
+        monkeypatch.setattr(search, "_current", index)
+
+    def fail(catalog):
+        pytest.fail("search index rebuilt")
+
+    monkeypatch.setattr(search, "_start_build", fail)
+    return install
+
+
+def _ids(index: TrigramIndex, q: str, **kw) -> list[uuid.UUID]:
+    return [pid for pid, _ in index.search(q, **kw)]
+
+
+@pytest.mark.parametrize("min_score", [0.3, 0.05])  # sparse and dense counting
+def test_patched_matches_a_fresh_build(products, min_score):
+    index = TrigramIndex(_snapshot(1, products))
+    by_name = {name: pid for pid, name in products.items()}
+    renamed = {by_name["Chicken thigh"]: "Turkey thigh", by_name["Product #12"]: "Product #1200"}
+    created = {uuid.uuid4(): "Chicken wings", uuid.uuid4(): "Turkey breast"}
+    removed = [by_name["Chicken breast"], by_name["Product #99"]]
+
+    patched = index.patched(2, {**renamed, **created}.items(), removed)
+    products = {**products, **renamed, **created}
+    for pid in removed:
+        del products[pid]
+    fresh = TrigramIndex(_snapshot(2, products))
+
+    assert len(patched) == len(fresh) == len(products)
+    for q in QUERIES:
+        for limit in (1, 3, 50):
+            assert patched.search(q, limit, min_score) == fresh.search(q, limit, min_score), (q, limit)
+    # the previous index is untouched
+    assert by_name["Chicken breast"] in _ids(index, "chicken br")
+
+
+def test_patched_unchanged_name_is_a_no_op(products):
+    index = TrigramIndex(_snapshot(1, products))
+    patched = index.patched(2, list(products.items())[:3], [uuid.uuid4()])
+    assert patched.version == 2
+    assert patched.ids is index.ids
+    assert len(patched.dead) == 0
+
+
+def test_writes_are_searchable_without_rebuild(products, no_rebuild):
+    no_rebuild(TrigramIndex(_snapshot(1, products)))
+    by_name = {name: pid for pid, name in products.items()}
+
+    created = uuid.uuid4()
+    patch_search_index(_version(2), [(created, "Turkey breast")])
+    assert _ids(search._current, "turkey") == [created]
+
+    thigh = by_name["Chicken thigh"]
+    patch_search_index(_version(3), [(thigh, "Turkey thigh")])
+    assert _ids(search._current, "turkey thigh")[0] == thigh
+    assert thigh not in _ids(search._current, "chicken", limit=50)
+
+    patch_search_index(_version(4), removed=[created])
+    assert created not in _ids(search._current, "turkey", limit=50)
+    assert search._current.version == 4
+
+
+def test_version_gap_keeps_the_index_version(products, monkeypatch):
+    monkeypatch.setattr(search, "_current", TrigramIndex(_snapshot(1, products)))
+    created = uuid.uuid4()
+    patch_search_index(_version(3), [(created, "Turkey breast")])  # version 2 missing
+    assert _ids(search._current, "turkey") == [created]
+    assert search._current.version == 1  # the next search schedules a rebuild
+
+    patch_search_index(_version(1), [(uuid.uuid4(), "Turkey wings")])  # not newer
+    assert _ids(search._current, "turkey") == [created]
+
+
+def test_many_dead_docs_keep_the_index_version(products, monkeypatch):
+    monkeypatch.setattr(search, "_current", TrigramIndex(_snapshot(1, products)))
+    gone = list(products)[: len(products) // 3]
+    patch_search_index(_version(2), removed=gone)
+    assert search._current.version == 1
+    assert not set(gone) & set(_ids(search._current, "product", limit=50))
+
+
+def test_created_product_is_searchable(client, db, no_rebuild):
+    from app.catalog.snapshot import get_catalog
+
+    assert client.post("/api/v1/products/seed").status_code == 200
+    no_rebuild(TrigramIndex(get_catalog(db)))
+
+    r = client.post("/api/v1/products", json={
+        "name": "Bison jerky",
+        "kcal_per_100g": 135,
+        "protein_per_100g": 30,
+        "fat_per_100g": 1,
+        "carbs_per_100g": 0,
+        "price_kzt_per_100g": 400,
+    })
+    assert r.status_code == 200
+
+    hits = client.get("/api/v1/products/search", params={"q": "bison"})
+    assert hits.status_code == 200
+    assert [h["id"] for h in hits.json()] == [r.json()["id"]]
@@ -0,0 +1,74 @@
+import uuid
+
+import pytest
+
+from app.api.v1.endpoints.products import build_seed_products
+from app.catalog.index import base_name
+from app.catalog.snapshot import CatalogSnapshot
+from app.planning.builder import PLAN_TEMPLATE, PlanBuildError, build_items, select_products
+
+SLOTS = [(meal_type, name, role) for meal_type, parts in PLAN_TEMPLATE for name, _, role in parts]
+# kcal, protein, fat, carbs per 100 g that land in each role (app/catalog/index.py)
+ROLE_NUTRIENTS = {
+    "protein": (120, 25, 2, 0),
+    "starch": (350, 10, 2, 70),
+    "produce": (60, 1, 0, 14),
+    "light": (50, 3.5, 2.5, 4),
+}
+
+
+def _row(name: str, role: str, price: float) -> tuple:
+    return (uuid.uuid4(), name, *ROLE_NUTRIENTS[role], price)
+
+
+def _catalog(rows: list[tuple]) -> CatalogSnapshot:
+    return CatalogSnapshot(1, sorted(rows, key=lambda r: r[1]))
+
+
+def _names(items: list[dict]) -> list[tuple[str, str]]:
+    return [(x["meal_type"], x["product"].name) for x in items]
+
+
+def test_template_uses_seed_products():
+    rows = [
+        (uuid.uuid4(), p.name, p.kcal_per_100g, p.protein_per_100g, p.fat_per_100g, p.carbs_per_100g, p.price_kzt_per_100g)
+        for p in build_seed_products()
+    ]
+    items = select_products(_catalog(rows), "template")
+    assert len(items) == len(SLOTS)
+    assert len({x["product"].id for x in items}) == len(items)
+    # names missing from the seed ("Oats", "Kefir 2.5%") match on base name
+    assert [base_name(name) for _, name in _names(items)] == [base_name(name) for _, name, _ in SLOTS]
+
+
+def test_template_falls_back_to_the_role():
+    rows = [_row(name, role, 100) for _, name, role in SLOTS if name != "Banana"]
+    rows += [_row("Mango", "produce", 300), _row("Plum", "produce", 50)]
+    items = select_products(_catalog(rows), "template")
+    # Banana is missing: the cheapest produce not already used stands in
+    assert _names(items) == [(meal_type, "Plum" if name == "Banana" else name) for meal_type, name, _ in SLOTS]
+
+
+def test_index_selection_skips_slots_it_cannot_fill():
+    # no light product, and two starches for four starch slots
+    rows = [_row("Chicken", "protein", 200), _row("Curd", "protein", 150)]
+    rows += [_row("Rice", "starch", 40), _row("Oats", "starch", 30)]
+    rows += [_row("Apple", "produce", 50), _row("Pear", "produce", 60)]
+    items = select_products(_catalog(rows), "index")
+    # slots take the best unused product of their role in template order;
+    # Kefir (light) and both dinner starches are left out
+    assert _names(items) == [
+        ("breakfast", "Oats"),
+        ("breakfast", "Apple"),
+        ("lunch", "Curd"),
+        ("lunch", "Rice"),
+        ("snack", "Chicken"),
+        ("snack", "Pear"),
+    ]
+
+
+def test_no_role_filled_is_a_build_error():
+    catalog = _catalog([(uuid.uuid4(), "Water", 0, 0, 0, 0, 10)])
+    assert select_products(catalog, "index") == []
+    with pytest.raises(PlanBuildError):
+        build_items(catalog, 2000, 3000, engine="greedy", selection="index")
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.planning.singleflight import AsyncSingleFlight, SingleFlight
+
+N = 8
+
+
+def _wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_concurrent_callers_share_one_run():
+    sf = SingleFlight()
+    runs = []
+
+    def fn():
+        runs.append(1)
+        _wait_for(lambda: sf.shared == N - 1)  # every other caller is waiting
+        return object()
+
+    with ThreadPoolExecutor(N) as pool:
+        results = list(pool.map(lambda _: sf.do("k", fn), range(N)))
+
+    assert len(runs) == 1
+    assert all(r is results[0] for r in results)
+    assert sf._calls == {}
+
+
+def test_error_reaches_every_waiter():
+    sf = SingleFlight()
+    runs = []
+
+    def fn():
+        runs.append(1)
+        _wait_for(lambda: sf.shared == N - 1)
+        raise ValueError("boom")
+
+    def call(_):
+        try:
+            sf.do("k", fn)
+        except ValueError as e:
+            return e
+
+    with ThreadPoolExecutor(N) as pool:
+        errors = list(pool.map(call, range(N)))
+
+    assert len(runs) == 1
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert sf._calls == {}
+    assert sf.do("k", lambda: "again") == "again"
+
+
+def test_different_keys_run_separately():
+    sf = SingleFlight()
+    both = threading.Barrier(2, timeout=5)
+
+    def fn(key):
+        both.wait()  # deadlocks if the second key waited on the first
+        return key
+
+    with ThreadPoolExecutor(2) as pool:
+        assert list(pool.map(lambda k: sf.do(k, lambda: fn(k)), ["a", "b"])) == ["a", "b"]
+    assert sf.shared == 0
+
+
+def test_async_concurrent_callers_share_one_run():
+    sf = AsyncSingleFlight()
+    runs = []
+
+    async def fn():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return object()
+
+    async def main():
+        return await asyncio.gather(*(sf.do("k", fn) for _ in range(N)))
+
+    results = asyncio.run(main())
+    assert len(runs) == 1
+    assert sf.shared == N - 1
+    assert all(r is results[0] for r in results)
+    assert sf._calls == {}
+
+
+def test_async_error_reaches_every_waiter():
+    sf = AsyncSingleFlight()
+    runs = []
+
+    async def fn():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        results = await asyncio.gather(*(sf.do("k", fn) for _ in range(N)), return_exceptions=True)
+        return results, await sf.do("k", lambda: asyncio.sleep(0, "again"))
+
+    results, again = asyncio.run(main())
+    assert len(runs) == 1
+    assert all(isinstance(e, ValueError) for e in results)
+    assert again == "again"
+    assert sf._calls == {}
+
+
+def test_async_cancelled_caller_does_not_cancel_the_run():
+    sf = AsyncSingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        leader = asyncio.ensure_future(sf.do("k", fn))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(sf.do("k", fn))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "done"
+    assert sf._calls == {}
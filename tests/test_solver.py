@@ -0,0 +1,57 @@
+import uuid
+
+import pytest
+
+from app.api.v1.endpoints.products import build_seed_products
+from app.catalog.snapshot import CatalogSnapshot
+from app.planning import solver
+from app.planning.builder import cost_for, kcal_for, select_products
+from app.planning.engine import fit_plan
+from app.planning.solver import GRAM_STEP, KCAL_BAND, MAX_GRAMS_FACTOR, fit_plan_optimal, solve_plan
+
+
+@pytest.fixture(scope="module")
+def seed_items() -> list[dict]:
+    rows = [
+        (uuid.uuid4(), p.name, p.kcal_per_100g, p.protein_per_100g, p.fat_per_100g, p.carbs_per_100g, p.price_kzt_per_100g)
+        for p in sorted(build_seed_products(), key=lambda p: p.name)
+    ]
+    return select_products(CatalogSnapshot(1, rows), "template")
+
+
+def _totals(items: list[dict]) -> tuple[int, float]:
+    return sum(kcal_for(x["product"], x["grams"]) for x in items), sum(cost_for(x["product"], x["grams"]) for x in items)
+
+
+@pytest.mark.parametrize("target", [1400, 2000, 2600, 3200])
+@pytest.mark.parametrize("budget", [1500, 3000, 10000])
+def test_optimal_stays_within_budget_and_kcal_band(seed_items, target, budget):
+    max_grams = {x["product"].id: x["grams"] * MAX_GRAMS_FACTOR for x in seed_items}
+    items = fit_plan_optimal([dict(x) for x in seed_items], target_kcal=target, budget_kzt=budget)
+
+    kcal, cost = _totals(items)
+    assert target * (1 - KCAL_BAND) - 1 <= kcal <= target * (1 + KCAL_BAND) + 1
+    assert cost <= budget + 0.01
+    for x in items:
+        assert 0 < x["grams"] <= max_grams[x["product"].id]
+        assert x["grams"] % GRAM_STEP == 0
+
+
+def test_budget_is_relaxed_before_kcal(seed_items):
+    target = 2000
+    items = fit_plan_optimal([dict(x) for x in seed_items], target_kcal=target, budget_kzt=10)
+    kcal, cost = _totals(items)
+    assert abs(kcal - target) <= target * KCAL_BAND + 1
+    assert cost > 10
+
+
+def test_solve_plan_infeasible_kcal_is_none():
+    # 100 g at most of a 100 kcal product can't reach 2000 kcal
+    assert solve_plan([100], [50], [10], [1], [5], [100], target_kcal=2000, budget_kzt=1000) is None
+
+
+def test_falls_back_to_greedy_when_the_solver_gives_up(seed_items, monkeypatch):
+    monkeypatch.setattr(solver, "solve_plan", lambda *a, **kw: None)
+    got = fit_plan_optimal([dict(x) for x in seed_items], target_kcal=2200, budget_kzt=2500)
+    want = fit_plan([dict(x) for x in seed_items], target_kcal=2200, budget_kzt=2500)
+    assert [(x["product"].id, x["grams"]) for x in got] == [(x["product"].id, x["grams"]) for x in want]